@@ -1,23 +1,46 @@
 #!/usr/bin/env python
 
 import sys
+import os
+import json
+import argparse
+import time
+from contextlib import redirect_stdout
+from multiprocessing import Pool
 
 import libnochmal
 
+# the checks in the order they are printed
+CHECKS = [libnochmal.CHECK_COLOR_DISTRIBUTION, libnochmal.CHECK_COLUMNS, libnochmal.CHECK_COMPONENTS,
+          libnochmal.CHECK_STARS_PER_COLOR]
 
-if len(sys.argv) != 2:
-    print("Usage: {} <board_file>".format(sys.argv[0]))
-    sys.exit(1)
+EXIT_VALID = 0
+EXIT_INVALID = 1
+EXIT_UNREADABLE = 2
 
-boardFileName = sys.argv[1]
-board = libnochmal.read_board_from_file(boardFileName)
 
-if not board:
-    print("Board could not be read from file, exiting.")
-    sys.exit(2)
+def main():
+    cli_parser = argparse.ArgumentParser(description='Check if boards for the game "Noch mal!" are valid. A single board '
+                                                     'file is checked with a readable report, everything else is '
+                                                     'checked in batch mode, which writes one json line per board.')
+    cli_parser.add_argument('--json', action='store_true',
+                            help='Use the batch mode even for a single board file')
+    cli_parser.add_argument('-j', '--jobs', type=int, default=1, metavar='<number_of_processes>',
+                            help='The number of processes checking the files in batch mode (default is 1)')
+    cli_parser.add_argument('--first-invalid', action='store_true',
+                            help='Stop at the first invalid or unreadable board in batch mode, the boards are only '
+                                 'checked up to their first error')
+    cli_parser.add_argument('paths', nargs='+', metavar='<path>',
+                            help='Board, collection or packed collection files, directories (all .dat and .nmb files '
+                                 'in them and their subdirectories) or glob patterns')
+    args = cli_parser.parse_args()
+
+    if len(args.paths) == 1 and os.path.isfile(args.paths[0]) and not args.json and \
+            not libnochmal.is_packed_collection(args.paths[0]):
+        sys.exit(check_board_file(args.paths[0]))
+
+    sys.exit(check_in_batch(libnochmal.find_board_files(args.paths), args.jobs, args.first_invalid))
 
-print(repr(board))
-print()
 
 # now check the board
 # - 21 tiles of each color
@@ -26,45 +49,115 @@ print()
 # - each column contains exactly one star
 # - each color consists of 6 connected components which contain 1, 2, 3, 4, 5 and 6 tiles
 # - each color has exactly 3 stars
+def check_board_file(filename: str) -> int:
+    board = libnochmal.read_board_from_file(filename)
+
+    if not board:
+        print("Board could not be read from file, exiting.")
+        return EXIT_UNREADABLE
+
+    print(repr(board))
+    print()
+
+    result = libnochmal.validate(board)
+
+    for check in CHECKS:
+        print("Checking {} ...".format(check), end="", flush=True)
+        if len(result.errors_of(check)) == 0:
+            print(" successful.", flush=True)
+        else:
+            print(" failed.", flush=True)
+
+    # finally print all accumulated error messages
+    if not result.valid:
+        print("\nError messages:")
+        for check in CHECKS:
+            for error in result.errors_of(check):
+                print(error.message)
+        return EXIT_INVALID
 
-error_msgs = []
-
-print("Checking color distribution ...", end="", flush=True)
-msgs = libnochmal.check_color_distribution(board)
-if len(msgs) == 0:
-    print(" successful.", flush=True)
-else:
-    error_msgs.extend(msgs)
-    print(" failed.", flush=True)
-
-print("Checking columns ...", end="", flush=True)
-msgs = libnochmal.check_columns(board)
-if len(msgs) == 0:
-    print(" successful.", flush=True)
-else:
-    error_msgs.extend(msgs)
-    print(" failed.", flush=True)
-
-print("Checking color components ...", end="", flush=True)
-msgs = libnochmal.check_components(board)
-if len(msgs) == 0:
-    print(" successful.", flush=True)
-else:
-    error_msgs.extend(msgs)
-    print(" failed.", flush=True)
-
-print("Checking stars per color ...", end="", flush=True)
-msgs = libnochmal.check_stars_per_color(board)
-if len(msgs) == 0:
-    print(" successful.", flush=True)
-else:
-    error_msgs.extend(msgs)
-    print(" failed.", flush=True)
-
-# finally print all accumulated error messages
-if len(error_msgs) > 0:
-    print("\nError messages:")
-    for msg in error_msgs:
-        print(msg)
-else:
     print("\nOH YEAH! A valid Board!")
+    return EXIT_VALID
+
+
+# --- batch mode ---
+
+# writes a json line for every board of the files as soon as it is checked, the results are written in the order of the
+# files, a summary follows on stderr
+def check_in_batch(files, jobs: int, first_invalid: bool) -> int:
+    started = time.perf_counter()
+    counts = {'valid': 0, 'invalid': 0, 'unreadable': 0}
+
+    pool = Pool(jobs) if jobs > 1 else None
+    try:
+        tasks = [(filename, first_invalid) for filename in files]
+        results = pool.imap(_check_file, tasks, chunksize=16) if pool is not None else map(_check_file, tasks)
+        stopped = False
+        for records in results:
+            for record in records:
+                if 'error' in record:
+                    counts['unreadable'] += 1
+                elif record['valid']:
+                    counts['valid'] += 1
+                else:
+                    counts['invalid'] += 1
+                print(json.dumps(record), flush=True)
+
+                if first_invalid and not record.get('valid', False):
+                    stopped = True
+                    break
+            if stopped:
+                break
+    except KeyboardInterrupt:
+        print("Aborted", file=sys.stderr)
+        stopped = True
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    checked = counts['valid'] + counts['invalid'] + counts['unreadable']
+    print("{} board(s) checked in {:.2f}s: {} valid, {} invalid, {} unreadable{}"
+          .format(checked, time.perf_counter() - started, counts['valid'], counts['invalid'], counts['unreadable'],
+                  ", stopped early" if stopped else ""), file=sys.stderr)
+
+    if counts['unreadable'] > 0 or checked == 0:
+        return EXIT_UNREADABLE
+    if counts['invalid'] > 0:
+        return EXIT_INVALID
+    return EXIT_VALID
+
+
+# checks every board of a board or collection file, returns a record for every board or one for a file that could not
+# be read, a lazy check stops at the first error of a board
+def _check_file(task):
+    (filename, lazy) = task
+    records = []
+    try:
+        # the parser reports unrecognized colors on stdout, which only has json lines in batch mode
+        with redirect_stdout(sys.stderr):
+            boards = list(libnochmal.read_boards_from_collection(filename))
+
+        for (index, board) in enumerate(boards):
+            if board is None:
+                records.append({'path': filename, 'board': index, 'error': 'Unrecognized color'})
+                continue
+
+            started = time.perf_counter()
+            result = libnochmal.validate(board, lazy)
+            duration = time.perf_counter() - started
+            records.append({'path': filename, 'board': index, 'valid': result.valid,
+                            'errors': [{'check': error.check, 'code': error.code, 'message': error.message,
+                                        'details': error.details} for error in result.errors],
+                            'time_ms': round(duration * 1000, 3)})
+    except (OSError, ValueError, IndexError) as e:
+        records.append({'path': filename, 'error': str(e)})
+        return records
+
+    if len(records) == 0:
+        records.append({'path': filename, 'error': 'The file contains no board'})
+    return records
+
+
+if __name__ == "__main__":
+    main()
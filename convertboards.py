@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import argparse
+from contextlib import closing
+
+import libnochmal as ln
+
+
+def main():
+    cli_parser = argparse.ArgumentParser(description='Convert boards between board files and packed collection files.')
+    commands = cli_parser.add_subparsers(dest='command', required=True)
+
+    pack_parser = commands.add_parser('pack', help='Write the boards of board and collection files to a packed '
+                                                   'collection file')
+    pack_parser.add_argument('--index', type=str, default=None, metavar='<index_file>',
+                             help='Leave out the boards that are already in this fingerprint index, also mirrored or '
+                                  'with other colors, and add the packed boards to it')
+    pack_parser.add_argument('outfile', help='The packed collection file ({})'.format(ln.PACKED_EXTENSION))
+    pack_parser.add_argument('paths', nargs='+', metavar='<path>',
+                             help='Board or collection files, directories (all .dat and {} files in them and their '
+                                  'subdirectories) or glob patterns'.format(ln.PACKED_EXTENSION))
+
+    unpack_parser = commands.add_parser('unpack', help='Write the boards of a packed collection file to board files')
+    unpack_parser.add_argument('--first', type=int, default=0, metavar='<board_number>',
+                               help='The first board to write, starting at 0 (default is 0)')
+    unpack_parser.add_argument('--count', type=int, default=None, metavar='<boards>',
+                               help='The number of boards to write (default is all from the first one)')
+    unpack_parser.add_argument('infile', help='The packed collection file')
+    unpack_parser.add_argument('out', help='A directory to write a board file per board to or the collection file to '
+                                           'write all boards to')
+
+    args = cli_parser.parse_args()
+    if args.command == 'unpack' and args.first < 0:
+        cli_parser.error('--first cannot be negative')
+    if args.command == 'unpack' and args.count is not None and args.count < 0:
+        cli_parser.error('--count cannot be negative')
+
+    index = None
+    try:
+        if args.command == 'pack':
+            if args.index is not None:
+                index = ln.FingerprintIndex(args.index)
+            pack(args.outfile, ln.find_board_files(args.paths), index)
+        else:
+            unpack(args.infile, args.out, args.first, args.count)
+    except (OSError, ValueError, IndexError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+    finally:
+        if index is not None:
+            index.close()
+
+
+# with an index, boards that are already in it (also boards of the same run) are left out
+def pack(outfile: str, files, index: ln.FingerprintIndex = None):
+    if len(files) == 0:
+        raise ValueError("No board files found")
+
+    # all boards of a packed collection have the size of the first one, the generator is closed right away, so a packed
+    # collection it reads from is unmapped
+    with closing(ln.read_boards_from_collection(files[0])) as boards:
+        first = next(boards, None)
+    if first is None:
+        raise ValueError("'{}' contains no board".format(files[0]))
+
+    duplicates = []
+    count = ln.write_packed_boards(outfile, _read_boards(files, index, duplicates), first.width, first.height)
+    print("{} board(s) of {} file(s) written to {}{}"
+          .format(count, len(files), outfile,
+                  ", {} duplicate(s) left out".format(len(duplicates)) if index is not None else ""))
+
+
+def _read_boards(files, index: ln.FingerprintIndex, duplicates: list):
+    for filename in files:
+        for (n, board) in enumerate(ln.read_boards_from_collection(filename)):
+            if board is None:
+                raise ValueError("The board no. {} of '{}' could not be read".format(n, filename))
+            if index is not None and not index.add_board(board):
+                duplicates.append((filename, n))
+                print("The board no. {} of '{}' is already in the index, it is left out".format(n, filename))
+                continue
+            yield board
+
+
+def unpack(infile: str, out: str, first: int, count: int):
+    with ln.PackedBoardCollection(infile) as collection:
+        last = len(collection) if count is None else min(len(collection), first + count)
+        boards = range(first, last)
+
+        if os.path.isdir(out):
+            digits = len(str(len(collection) - 1))
+            for n in boards:
+                filename = os.path.join(out, "board-{:0>{}}.dat".format(n, digits))
+                ln.write_board_to_file(collection[n], filename, "Board no. {} of {}".format(n, infile))
+        else:
+            with open(out, 'w') as file:
+                for n in boards:
+                    ln.append_board_to_collection(collection[n], file, "Board no. {} of {}".format(n, infile))
+
+    print("{} board(s) written to {}".format(len(boards), out))
+
+
+if __name__ == "__main__":
+    main()
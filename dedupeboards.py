@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import argparse
+from contextlib import closing
+
+import libnochmal as ln
+
+
+def main():
+    cli_parser = argparse.ArgumentParser(description='Find boards that are the same as an earlier board, also when '
+                                                     'they are mirrored or have other colors.')
+    cli_parser.add_argument('--index', type=str, default=None, metavar='<index_file>',
+                            help='Also report the boards in this fingerprint index as duplicates and add the new '
+                                 'boards to it')
+    cli_parser.add_argument('--with-stars', action='store_true',
+                            help='Boards with the same colors but other stars are no duplicates')
+    cli_parser.add_argument('--delete', action='store_true',
+                            help='Delete the board files of the duplicates (.dat files with a single board), boards in '
+                                 'collection and packed collection files are only reported')
+    cli_parser.add_argument('paths', nargs='+', metavar='<path>',
+                            help='Board, collection or packed collection files, directories (all .dat and .nmb files '
+                                 'in them and their subdirectories) or glob patterns')
+    args = cli_parser.parse_args()
+
+    index = None
+    try:
+        if args.index is not None:
+            index = ln.FingerprintIndex(args.index, args.with_stars)
+        dedupe(ln.find_board_files(args.paths), index, args.with_stars, args.delete)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+    finally:
+        if index is not None:
+            index.close()
+
+
+# reads the files one after another and writes a line for every duplicate, only the fingerprints and the locations of
+# the first boards with them are kept
+def dedupe(files, index: ln.FingerprintIndex, with_stars: bool, delete: bool):
+    first_locations = {}
+    counts = {'boards': 0, 'duplicates': 0, 'deleted': 0}
+
+    for filename in files:
+        try:
+            # the boards are streamed, a board is only handled when the next one was read, so it is known whether it is
+            # the only board of its file
+            previous = None
+            with closing(ln.read_boards_from_collection(filename)) as boards:
+                for (n, board) in enumerate(boards):
+                    if previous is not None:
+                        _dedupe_board(filename, previous[0], previous[1], False, first_locations, counts, index,
+                                      with_stars, delete)
+                    previous = (n, board)
+        except (OSError, ValueError, IndexError) as e:
+            print("{}: could not be read ({})".format(filename, e), file=sys.stderr)
+            continue
+
+        if previous is not None:
+            _dedupe_board(filename, previous[0], previous[1], previous[0] == 0, first_locations, counts, index,
+                          with_stars, delete)
+
+    print("{} board(s) in {} file(s): {} unique, {} duplicate(s){}"
+          .format(counts['boards'], len(files), counts['boards'] - counts['duplicates'], counts['duplicates'],
+                  ", {} file(s) deleted".format(counts['deleted']) if delete else ""))
+
+
+def _dedupe_board(filename: str, n: int, board: ln.Board, only_board: bool, first_locations: dict, counts: dict,
+                  index: ln.FingerprintIndex, with_stars: bool, delete: bool):
+    if board is None:
+        print("{}: the board no. {} could not be read".format(filename, n), file=sys.stderr)
+        return
+
+    counts['boards'] += 1
+    location = filename if only_board else "{}#{}".format(filename, n)
+    fingerprint = ln.board_fingerprint(board, with_stars)
+    if fingerprint in first_locations:
+        original = first_locations[fingerprint]
+    elif index is not None and not index.add(fingerprint):
+        original = "a board in the index"
+    else:
+        first_locations[fingerprint] = location
+        return
+
+    counts['duplicates'] += 1
+    if delete and _is_board_file(filename, only_board):
+        os.remove(filename)
+        counts['deleted'] += 1
+        print("{}: duplicate of {}, deleted".format(location, original), flush=True)
+    else:
+        print("{}: duplicate of {}".format(location, original), flush=True)
+
+
+# only board files are deleted: .dat files with a single board, collections and packed collections are kept even if
+# they hold a single board
+def _is_board_file(filename: str, only_board: bool) -> bool:
+    return only_board and filename.endswith('.dat') and not ln.is_packed_collection(filename)
+
+
+if __name__ == "__main__":
+    main()
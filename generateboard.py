@@ -3,9 +3,13 @@
 import sys
 from random import Random
 from threading import Event
-from datetime import datetime
+from datetime import datetime, timedelta
+import os
 import signal
 import argparse
+import gzip
+import json
+from multiprocessing import Pool
 from typing import List, Tuple
 
 import libnochmal as ln
@@ -14,13 +18,23 @@ import libnochmal as ln
 ARGS: argparse.Namespace
 BOARD = ln.Board()
 STATE = ln.BacktrackingState()
-ORDER = ['', '']
+COMPONENTS: List[Tuple[ln.Color, int]] = []
 STARTED: datetime
 FINISHED: datetime
+LAST_CHECKPOINT: datetime
+STEP_WRITER: ln.StepImageWriter = None
+TRACE: ln.GenerationTrace = None
+INDEX: ln.FingerprintIndex = None
+DUPLICATE = False
+
+CHECKPOINT_VERSION = 1
+# the arguments a resumed run takes from its checkpoint, the other ones are taken from the command line
+RESUMED_ARGS = ['seed', 'limit_free_space', 'line6', 'multiple_comp_per_col', 'no_forward_checking', 'order', 'restarts',
+                'restart_budget', 'restart_factor', 'max_attempts']
 
 
 def main():
-    global ARGS, ORDER, STARTED, FINISHED
+    global ARGS, COMPONENTS, STARTED, FINISHED, LAST_CHECKPOINT, STEP_WRITER, TRACE, INDEX, DUPLICATE
 
     cli_parser = argparse.ArgumentParser(description='Generate a board for the game "Noch mal!".')
     cli_parser.add_argument('-s', '--seed', type=int, default=0, metavar='<seed_as_integer>',
@@ -32,64 +46,147 @@ def main():
     cli_parser.add_argument('-p', '--write-pngs', action='store_true',
                             help='Write every placement step to a png file (Requires PyPNG to be installed) (WARNING: '
                                  'can create huge amount of files!)')
+    cli_parser.add_argument('--png-every', type=int, default=1, metavar='<n>',
+                            help='With --write-pngs, only write every <n>th step (default is 1)')
+    cli_parser.add_argument('--png-new-max-level', action='store_true',
+                            help='With --write-pngs, only write steps that reach a level no earlier step reached')
+    cli_parser.add_argument('--png-output', type=str, default='folder', choices=ln.STEP_IMAGE_OUTPUTS,
+                            help='With --write-pngs, write the steps to a folder of png files, a zip archive of them, '
+                                 'a single animated png or an animated gif (default is folder)')
+    cli_parser.add_argument('--trace', type=str, default=None, metavar='<trace_file>',
+                            help='Record every placement and undo of the generation in this file, replaytrace.py '
+                                 'rebuilds the boards, renders the steps and prints statistics from it')
     cli_parser.add_argument('--line6', action='store_true',
                             help='This deactivates the line6-constraint and allows components of size 6 to be placed '
                                  'in a horizontal line')
     cli_parser.add_argument('--multiple-comp-per-col', action='store_true',
                             help='This deactivates the only-one-color-component-per-column-constraint and allows '
                                  'multiple components of the same color to be present in one column')
-    cli_parser.add_argument('--order', type=str, default='RFCI', choices=['RFCI', 'RAND', 'DESC'],
+    cli_parser.add_argument('--debug-counters', action='store_true',
+                            help='Cross-check the per column counters of the generator against full scans of the board '
+                                 'after every placement and undo (slow, for debugging only)')
+    cli_parser.add_argument('--no-forward-checking', action='store_true',
+                            help='Do not check after every placement if the remaining components can still be placed, '
+                                 'this only makes the search slower, but allows to measure the effect of the checks')
+    cli_parser.add_argument('--order', type=str, default='RFCI', choices=['RFCI', 'RAND', 'DESC', 'MRV'],
                             help='This controls the order in which the components are placed on the board.\n  RFCI: '
                                  'Random with fixed color interval. RAND: completely random. DESC: Ordered from big to '
-                                 'small component size with default color order. (default is RFCI)')
+                                 'small component size with default color order. MRV: The component with the fewest '
+                                 'possible placements is placed next, ties are broken by a random order. It counts the '
+                                 'placements at every level, so a placement costs a few times as much. '
+                                 '(default is RFCI)')
+    cli_parser.add_argument('--seeds', type=parse_seed_range, metavar='<first>-<last>',
+                            help='Generate a board for every seed in this range (inclusive) instead of a single seed. '
+                                 'Every finished board is written to its own file, the seed is inserted into the file '
+                                 'name (or replaces "{seed}" in it)')
+    cli_parser.add_argument('-j', '--jobs', type=int, default=1, metavar='<number_of_processes>',
+                            help='The number of processes generating boards for different seeds in parallel')
+    cli_parser.add_argument('--first-success', action='store_true',
+                            help='Stop all processes as soon as the first board was generated successfully')
+    cli_parser.add_argument('--search-processes', type=int, default=1, metavar='<number_of_processes>',
+                            help='Search for the board of a single seed with multiple processes, the result is the '
+                                 'same board the search with one process would find')
+    cli_parser.add_argument('--any-solution', action='store_true',
+                            help='With --search-processes, take the first board any process finds instead of the one '
+                                 'the search with one process would find')
+    cli_parser.add_argument('--restarts', type=str, default='none', choices=ln.RESTART_POLICIES,
+                            help='Give up the search after a budget of placements and start again with a new component '
+                                 'order. The budget of the attempts follows the Luby sequence (1, 1, 2, 1, 1, 2, 4, ...) '
+                                 'or grows geometrically. (default is none)')
+    cli_parser.add_argument('--restart-budget', type=int, default=10000, metavar='<placements>',
+                            help='The placements of the first attempt with --restarts (default is 10000)')
+    cli_parser.add_argument('--restart-factor', type=float, default=2.0, metavar='<factor>',
+                            help='The growth of the budget per attempt with --restarts geometric (default is 2.0)')
+    cli_parser.add_argument('--max-attempts', type=int, default=None, metavar='<attempts>',
+                            help='Stop after this many attempts with --restarts')
+    cli_parser.add_argument('--checkpoint', type=str, default=None, metavar='<checkpoint_file>',
+                            help='Write the position of the search to this file regularly, so the generation can be '
+                                 'continued with --resume after it was interrupted')
+    cli_parser.add_argument('--checkpoint-interval', type=int, default=300, metavar='<seconds>',
+                            help='The time between two checkpoints (default is 300)')
+    cli_parser.add_argument('--resume', type=str, default=None, metavar='<checkpoint_file>',
+                            help='Continue the generation where the checkpoint was written, the settings of the search '
+                                 'are taken from the checkpoint. New checkpoints are written to the same file, unless '
+                                 '--checkpoint is given')
+    cli_parser.add_argument('--count', type=int, default=None, metavar='<boards>',
+                            help='Go on searching after the first board and write the first <boards> boards found for '
+                                 'the seed to the output file, one after another separated by empty lines')
+    cli_parser.add_argument('--index', type=str, default=None, metavar='<index_file>',
+                            help='Do not write boards whose colors are already in this fingerprint index, also not '
+                                 'mirrored or with other colors, and add the new boards to it')
     cli_parser.add_argument('outfile', help='The file name to save the generated board to')
     ARGS = cli_parser.parse_args()
 
+    if ARGS.restarts != 'none' and ARGS.search_processes > 1:
+        cli_parser.error('--restarts cannot be combined with --search-processes')
+    # the processes of --seeds and -j can't start the processes of another search
+    if ARGS.search_processes > 1 and (ARGS.seeds is not None or ARGS.jobs > 1):
+        cli_parser.error('--search-processes cannot be combined with --seeds or -j')
+    if (ARGS.checkpoint is not None or ARGS.resume is not None) and \
+            (ARGS.seeds is not None or ARGS.jobs > 1 or ARGS.search_processes > 1):
+        cli_parser.error('--checkpoint and --resume only work with a single seed and a single search process')
+    if ARGS.resume is not None and ARGS.checkpoint is None:
+        ARGS.checkpoint = ARGS.resume
+    if ARGS.count is not None and (ARGS.seeds is not None or ARGS.jobs > 1 or ARGS.search_processes > 1 or
+                                   ARGS.restarts != 'none' or ARGS.checkpoint is not None):
+        cli_parser.error('--count only works with a single seed, a single search process and without restarts or '
+                         'checkpoints')
+    if ARGS.trace is not None and (ARGS.seeds is not None or ARGS.jobs > 1 or ARGS.search_processes > 1):
+        cli_parser.error('--trace only works with a single seed and a single search process')
+
+    if ARGS.index is not None:
+        INDEX = ln.FingerprintIndex(ARGS.index)
+    if ARGS.trace is not None:
+        TRACE = ln.GenerationTrace(ARGS.trace, BOARD)
+    if ARGS.seeds is not None or ARGS.jobs > 1:
+        generate_in_parallel()
+        return
+    if ARGS.count is not None:
+        generate_collection()
+        return
+
+    if ARGS.write_pngs:
+        STEP_WRITER = create_step_writer()
+
     # set the signal handlers
     signal.signal(signal.SIGINT, conclude_generation)
     signal.signal(signal.SIGUSR1, print_board)
 
     rng = Random(ARGS.seed)
+    resume = None
+    elapsed = timedelta()
+    if ARGS.resume is not None:
+        (resume, elapsed) = read_checkpoint(ARGS.resume, rng, STATE)
 
     # setup timer to print status
     stop_flag = Event()
-    thread = ln.PerpetualTimer(stop_flag, lambda: print("\relapsed time: {}, lvl. {:0>2}, placement no. {}"
-                                                        .format((datetime.now() - STARTED), STATE.level,
-                                                                STATE.placements), end=""), 0.1)
+    thread = ln.PerpetualTimer(stop_flag, lambda: print("\relapsed time: {}, attempt {}, lvl. {:0>2}, placement no. {}"
+                                                        .format((datetime.now() - STARTED), STATE.attempts,
+                                                                STATE.level, STATE.placements), end=""), 0.1)
     thread.start()
 
-    components: List[Tuple[ln.Color, int]]
-    if ARGS.order == 'DESC':
-        components = ln.create_descending_component_order()
-    elif ARGS.order == 'RFCI':
-        components = ln.create_random_fixed_color_interval_component_order(rng)
+    # with MRV this is only the initial order, it is changed in place during the generation
+    if resume is not None:
+        COMPONENTS = list(resume['position'].components)
+        print("Resuming attempt {} at placement no. {}".format(STATE.attempts, STATE.placements))
     else:
-        components = ln.create_descending_component_order()
-        rng.shuffle(components)
+        COMPONENTS = create_component_order(ARGS.order, rng)
 
-    ORDER = ['', '']
-    for i in range(len(components)):
-        print("{:0>2}".format(i), end=" ")
-        ORDER[0] += "{:0>2} ".format(i)
-    print()
-    ORDER[0] = ORDER[0].strip()
-
-    for (c, n) in components:
-        print("{}{}".format(c.value.upper(), n), end=" ")
-        ORDER[1] += "{}{} ".format(c.value.upper(), n)
-    print()
-    ORDER[1] = ORDER[1].strip()
+    order = format_component_order(COMPONENTS)
+    print(order[0])
+    print(order[1])
 
-    STARTED = datetime.now()
+    STARTED = datetime.now() - elapsed
+    LAST_CHECKPOINT = datetime.now()
 
     # actually generate the board
-    success = ln.fill_smart(BOARD, STATE, components, write_pngs=ARGS.write_pngs,
-                            free_space_limit=ARGS.limit_free_space, no_line6=(not ARGS.line6),
-                            only_one_comp_per_col=(not ARGS.multiple_comp_per_col))
+    success = generate_board(BOARD, STATE, rng, COMPONENTS, step_writer=STEP_WRITER, resume=resume, trace=TRACE)
     if not success:
         print("\nFailed to generate a board with seed {}.".format(ARGS.seed))
     else:
-        ln.distribute_stars(BOARD, rng)
+        for error_msg in ln.distribute_stars(BOARD, rng):
+            print("\n{}".format(error_msg), file=sys.stderr)
+        DUPLICATE = INDEX is not None and not INDEX.add_board(BOARD)
 
     # this will stop the timer
     stop_flag.set()
@@ -104,38 +201,161 @@ def conclude_generation(signum, frame):
 
     # the result
     print("\nFinal amount of placements: {}, final level: {}".format(STATE.placements, STATE.level))
+    print("Propagation prunes: {}".format(format_prunes(STATE)))
     print(BOARD)
 
+    if STEP_WRITER is not None:
+        print("Writing the remaining step images to {}".format(STEP_WRITER.path))
+        STEP_WRITER.close()
+        print("Step images: {} written, {} dropped".format(STEP_WRITER.written, STEP_WRITER.dropped))
+
+    if TRACE is not None:
+        TRACE.close()
+        print("Trace: {} events written to {}".format(TRACE.events, TRACE.filename))
+
     aborted = False
     if signum != -1:
         aborted = True
 
     # create generated board comment
-    comment = "This board was generated using nochmaltools generateboard\n" \
-              "Generation started:  {}\n" \
-              "Generation {}{}\n" \
-              "Duration:            {}\n" \
-              "Seed:                {}\n" \
-              "Component order:     {}\n" \
-              "                     {}\n" \
-              "Comp. order setting: {}\n" \
-              "Free space limit:    {}\n" \
-              "line6-constraint:    {}\n" \
-              "mul-comp-constraint: {}\n" \
-              "Total placements:    {}\n" \
-              "Final level:         {}".format(STARTED, "aborted:  " if aborted else "finished: ", FINISHED,
-                                               (FINISHED - STARTED), ARGS.seed, ORDER[0], ORDER[1], ARGS.order,
-                                               ARGS.limit_free_space,
-                                               "DEACTIVATED" if ARGS.line6 else "ACTIVATED",
-                                               "DEACTIVATED" if ARGS.multiple_comp_per_col else "ACTIVATED",
-                                               STATE.placements, STATE.level)
+    comment = create_comment(ARGS, ARGS.seed, STARTED, FINISHED, aborted, format_component_order(COMPONENTS), STATE)
 
     # write the board to file
-    ln.write_board_to_file(BOARD, ARGS.outfile, comment)
+    if DUPLICATE:
+        print("The board is already in the index {}, it is not written".format(ARGS.index))
+    else:
+        ln.write_board_to_file(BOARD, ARGS.outfile, comment)
 
     sys.exit(1)
 
 
+# runs the attempts of the restart policy until one succeeds, the first attempt uses the given components, for every
+# further one the board is cleared and the components are replaced in place by a new order from the rng
+# a resumed run continues the attempt of its checkpoint with the rest of its budget
+def generate_board(board: ln.Board, state: ln.BacktrackingState, rng: Random, components: List[Tuple[ln.Color, int]],
+                   step_writer: ln.StepImageWriter = None, resume: dict = None, trace: ln.GenerationTrace = None) -> bool:
+    budgets = ln.iter_restart_budgets(ARGS.restarts, ARGS.restart_budget, ARGS.restart_factor)
+    if resume is not None:
+        for _ in range(state.attempts):
+            next(budgets, None)
+        if _run_attempt(board, state, rng, components, resume['max_placements'], step_writer, trace,
+                        resume['position']):
+            return True
+
+    for budget in budgets:
+        if ARGS.max_attempts is not None and state.attempts >= ARGS.max_attempts:
+            break
+        if state.attempts > 0:
+            board.clear()
+            components[:] = create_component_order(ARGS.order, rng)
+            state.level = 0
+            if trace is not None:
+                trace.restart()
+        state.inc_attempts()
+
+        if _run_attempt(board, state, rng, components, None if budget is None else state.placements + budget,
+                        step_writer, trace):
+            return True
+
+    return False
+
+
+def _run_attempt(board: ln.Board, state: ln.BacktrackingState, rng: Random, components: List[Tuple[ln.Color, int]],
+                 max_placements: int, step_writer: ln.StepImageWriter, trace: ln.GenerationTrace,
+                 resume_from: ln.SearchPosition = None) -> bool:
+    if ARGS.search_processes > 1:
+        return ln.fill_smart_parallel(board, state, components, processes=ARGS.search_processes,
+                                      any_solution=ARGS.any_solution, free_space_limit=ARGS.limit_free_space,
+                                      no_line6=(not ARGS.line6),
+                                      only_one_comp_per_col=(not ARGS.multiple_comp_per_col),
+                                      forward_checking=(not ARGS.no_forward_checking),
+                                      most_constrained_first=(ARGS.order == 'MRV'))
+
+    checkpoint = None
+    if ARGS.checkpoint is not None:
+        def checkpoint(position: ln.SearchPosition):
+            global LAST_CHECKPOINT
+            now = datetime.now()
+            if (now - LAST_CHECKPOINT).total_seconds() >= ARGS.checkpoint_interval:
+                write_checkpoint(ARGS.checkpoint, position, state, rng, max_placements, now - STARTED)
+                LAST_CHECKPOINT = now
+
+    return ln.fill_smart(board, state, components, step_writer=step_writer, free_space_limit=ARGS.limit_free_space,
+                         no_line6=(not ARGS.line6), only_one_comp_per_col=(not ARGS.multiple_comp_per_col),
+                         debug_counters=ARGS.debug_counters, forward_checking=(not ARGS.no_forward_checking),
+                         most_constrained_first=(ARGS.order == 'MRV'), max_placements=max_placements,
+                         checkpoint=checkpoint, resume_from=resume_from, trace=trace)
+
+
+# one writer for all attempts of the generation, it is closed when the generation is concluded
+def create_step_writer():
+    if ln.png is None and ARGS.png_output not in ('apng', 'gif'):
+        print("You don't have the PyPNG module installed. To write out steps of the generation process this module "
+              "is required.", file=sys.stderr)
+        return None
+
+    path = "gen-board-steps-{}".format(datetime.now())
+    if ARGS.png_output == 'zip':
+        path += '.zip'
+    elif ARGS.png_output == 'apng':
+        path += '.png'
+    elif ARGS.png_output == 'gif':
+        path += '.gif'
+    return ln.StepImageWriter(path, ARGS.png_output, every=ARGS.png_every, new_max_level_only=ARGS.png_new_max_level)
+
+
+# a checkpoint is a gzipped json file with the settings of the search, the state of the rng, the counters, the budget of
+# the current attempt and the position of the search, it is replaced atomically, so an interruption while writing it
+# leaves the previous one
+def write_checkpoint(filename: str, position: ln.SearchPosition, state: ln.BacktrackingState, rng: Random,
+                     max_placements: int, elapsed: timedelta):
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'args': {name: getattr(ARGS, name) for name in RESUMED_ARGS},
+        'elapsed': elapsed.total_seconds(),
+        'rng_state': rng.getstate(),
+        'counters': {'level': state.level, 'placements': state.placements, 'steps': state.steps,
+                     'attempts': state.attempts, 'prunes': state.prunes},
+        'max_placements': max_placements,
+        'color_masks': position.color_masks,
+        'components': [[color.name, size] for (color, size) in position.components],
+        'positions': position.positions,
+    }
+
+    tmp_filename = filename + '.tmp'
+    with gzip.open(tmp_filename, 'wt') as f:
+        json.dump(checkpoint, f, separators=(',', ':'))
+    os.replace(tmp_filename, filename)
+
+
+# restores the settings, the rng and the counters of a checkpoint, returns what generate_board needs to continue the
+# attempt and the time the generation took so far
+def read_checkpoint(filename: str, rng: Random, state: ln.BacktrackingState) -> Tuple[dict, timedelta]:
+    with gzip.open(filename, 'rt') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError("'{}' is not a checkpoint of this version of generateboard".format(filename))
+
+    for name, value in checkpoint['args'].items():
+        setattr(ARGS, name, value)
+
+    (version, internal_state, gauss_next) = checkpoint['rng_state']
+    rng.setstate((version, tuple(internal_state), gauss_next))
+
+    counters = checkpoint['counters']
+    state.level = counters['level']
+    state.placements = counters['placements']
+    state.steps = counters['steps']
+    state.attempts = counters['attempts']
+    state.prunes.update(counters['prunes'])
+
+    position = ln.SearchPosition(checkpoint['color_masks'],
+                                 [(ln.Color[name], size) for (name, size) in checkpoint['components']],
+                                 checkpoint['positions'])
+    return {'position': position, 'max_placements': checkpoint['max_placements']}, \
+        timedelta(seconds=checkpoint['elapsed'])
+
+
 def print_board(signum, frame):
     print("\n\nIntermediary result after {}: placements: {}, level: {}"
           .format(datetime.now() - STARTED, STATE.placements, STATE.level))
@@ -143,5 +363,202 @@ def print_board(signum, frame):
     print()
 
 
+def parse_seed_range(value: str) -> List[int]:
+    try:
+        if '-' in value:
+            first, last = value.split('-', 1)
+            seeds = list(range(int(first), int(last) + 1))
+        else:
+            seeds = [int(value)]
+    except ValueError:
+        raise argparse.ArgumentTypeError("'{}' is not a seed range like 0-999".format(value))
+
+    if len(seeds) == 0:
+        raise argparse.ArgumentTypeError("The seed range '{}' is empty".format(value))
+    return seeds
+
+
+def create_component_order(order: str, rng: Random) -> List[Tuple[ln.Color, int]]:
+    if order == 'DESC':
+        return ln.create_descending_component_order()
+    elif order == 'RFCI':
+        return ln.create_random_fixed_color_interval_component_order(rng)
+    else:
+        # the order of MRV is only used to break ties
+        components = ln.create_descending_component_order()
+        rng.shuffle(components)
+        return components
+
+
+# returns the component indices and the components as two lines of the same layout
+def format_component_order(components: List[Tuple[ln.Color, int]]) -> List[str]:
+    return [" ".join("{:0>2}".format(i) for i in range(len(components))),
+            " ".join("{}{}".format(c.value.upper(), n) for (c, n) in components)]
+
+
+def create_comment(args: argparse.Namespace, seed: int, started: datetime, finished: datetime, aborted: bool,
+                   order: List[str], state: ln.BacktrackingState) -> str:
+    return "This board was generated using nochmaltools generateboard\n" \
+           "Generation started:  {}\n" \
+           "Generation {}{}\n" \
+           "Duration:            {}\n" \
+           "Seed:                {}\n" \
+           "Component order:     {}\n" \
+           "                     {}\n" \
+           "Comp. order setting: {}\n" \
+           "Free space limit:    {}\n" \
+           "line6-constraint:    {}\n" \
+           "mul-comp-constraint: {}\n" \
+           "Restarts:            {}\n" \
+           "Attempts:            {}\n" \
+           "Total placements:    {}\n" \
+           "Propagation prunes:  {}\n" \
+           "Final level:         {}".format(started, "aborted:  " if aborted else "finished: ", finished,
+                                            (finished - started), seed, order[0], order[1], args.order,
+                                            args.limit_free_space,
+                                            "DEACTIVATED" if args.line6 else "ACTIVATED",
+                                            "DEACTIVATED" if args.multiple_comp_per_col else "ACTIVATED",
+                                            format_restarts(args), state.attempts, state.placements,
+                                            format_prunes(state), state.level)
+
+
+def format_restarts(args: argparse.Namespace) -> str:
+    if args.restarts == 'none':
+        return 'none'
+    elif args.restarts == 'geometric':
+        return "geometric, budget {}, factor {}".format(args.restart_budget, args.restart_factor)
+    return "{}, budget {}".format(args.restarts, args.restart_budget)
+
+
+def format_prunes(state: ln.BacktrackingState) -> str:
+    return ", ".join("{} {}".format(reason, state.prunes[reason]) for reason in ln.PRUNE_REASONS)
+
+
+# the file name for the board of a seed, when generating boards for multiple seeds
+def outfile_for_seed(outfile: str, seed: int) -> str:
+    if '{seed}' in outfile:
+        return outfile.replace('{seed}', str(seed))
+
+    root, ext = os.path.splitext(outfile)
+    return "{}-seed{}{}".format(root, seed, ext)
+
+
+# --- collections ---
+
+def generate_collection():
+    rng = Random(ARGS.seed)
+    components = create_component_order(ARGS.order, rng)
+    order = format_component_order(components)
+    print(order[0])
+    print(order[1])
+
+    started = datetime.now()
+    found = 0
+    duplicates = 0
+    with open(ARGS.outfile, 'w') as file:
+        try:
+            for board in ln.iter_boards(components, rng, state=STATE, free_space_limit=ARGS.limit_free_space,
+                                        no_line6=(not ARGS.line6),
+                                        only_one_comp_per_col=(not ARGS.multiple_comp_per_col),
+                                        forward_checking=(not ARGS.no_forward_checking),
+                                        most_constrained_first=(ARGS.order == 'MRV'), trace=TRACE):
+                if INDEX is not None and not INDEX.add_board(board):
+                    duplicates += 1
+                    continue
+
+                found += 1
+                comment = "Board no. {} of the collection\n".format(found) + \
+                          create_comment(ARGS, ARGS.seed, started, datetime.now(), False, order, STATE)
+                ln.append_board_to_collection(board, file, comment)
+                print("Board no. {} found after {} placements in {}".format(found, STATE.placements,
+                                                                            datetime.now() - started), flush=True)
+                if found == ARGS.count:
+                    break
+        except KeyboardInterrupt:
+            print("\nAborted")
+
+    print("{} board(s) written to {} in {}{}".format(found, ARGS.outfile, datetime.now() - started,
+                                                    ", {} duplicate(s) skipped".format(duplicates)
+                                                    if INDEX is not None else ""))
+    if TRACE is not None:
+        TRACE.close()
+        print("Trace: {} events written to {}".format(TRACE.events, TRACE.filename))
+    sys.exit(0 if found > 0 else 1)
+
+
+# --- parallel generation ---
+
+def generate_in_parallel():
+    seeds = ARGS.seeds if ARGS.seeds is not None else [ARGS.seed]
+    jobs = max(1, min(ARGS.jobs, len(seeds)))
+    print("Generating boards for {} seed(s) ({} to {}) with {} process(es)".format(len(seeds), seeds[0], seeds[-1],
+                                                                                   jobs))
+
+    started = datetime.now()
+    successful = 0
+    duplicates = 0
+    finished = 0
+    pool = Pool(jobs, initializer=_init_worker, initargs=(ARGS,))
+    try:
+        # the results are streamed in the order the seeds finish, the boards are written here, so the index is only
+        # used by this process
+        for (seed, success, placements, duration, board, comment) in pool.imap_unordered(_generate_seed, seeds):
+            finished += 1
+            if success and INDEX is not None and not INDEX.add_board(board):
+                duplicates += 1
+                print("Seed {}: board generated after {} placements in {}, but it is already in the index"
+                      .format(seed, placements, duration), flush=True)
+                continue
+            if success:
+                successful += 1
+                filename = outfile_for_seed(ARGS.outfile, seed)
+                ln.write_board_to_file(board, filename, comment)
+                print("Seed {}: board generated after {} placements in {}, written to {}"
+                      .format(seed, placements, duration, filename), flush=True)
+            else:
+                print("Seed {}: failed after {} placements in {}".format(seed, placements, duration), flush=True)
+
+            if success and ARGS.first_success:
+                print("Stopping the remaining processes after the first success")
+                break
+    except KeyboardInterrupt:
+        print("\nAborted, stopping the remaining processes")
+    finally:
+        pool.terminate()
+        pool.join()
+
+    print("\n{} of {} seed(s) finished, {} board(s) generated in {}{}"
+          .format(finished, len(seeds), successful, datetime.now() - started,
+                  ", {} duplicate(s) not written".format(duplicates) if INDEX is not None else ""))
+    sys.exit(0 if successful > 0 else 1)
+
+
+def _init_worker(args: argparse.Namespace):
+    global ARGS
+    ARGS = args
+
+    # the main process handles SIGINT and terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _generate_seed(seed: int):
+    rng = Random(seed)
+    components = create_component_order(ARGS.order, rng)
+    board = ln.Board()
+    state = ln.BacktrackingState()
+
+    started = datetime.now()
+    success = generate_board(board, state, rng, components)
+    finished = datetime.now()
+
+    comment = None
+    if success:
+        for error_msg in ln.distribute_stars(board, rng):
+            print("Seed {}: {}".format(seed, error_msg), file=sys.stderr)
+        comment = create_comment(ARGS, seed, started, finished, False, format_component_order(components), state)
+
+    return seed, success, state.placements, finished - started, board if success else None, comment
+
+
 if __name__ == "__main__":
     main()
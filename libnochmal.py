@@ -1,10 +1,22 @@
+import hashlib
+import heapq
+import io
+import mmap
+import multiprocessing
 import os
+import queue
 import random
+import signal
+import struct
 import sys
+import zipfile
+import zlib
 from enum import Enum
+from functools import lru_cache
 from math import factorial
 from threading import Thread
 import datetime
+import glob
 
 from typing import Tuple, List
 
@@ -13,6 +25,11 @@ try:
 except ImportError:
     png = None
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 OFFSETS = [
     (0, -1),
     (1, 0),
@@ -74,6 +91,10 @@ class Color(Enum):
         return self.value < other.value
 
 
+# index of every color in the color masks of a board, this is also the order of the palette
+COLOR_INDICES = {Color.RED: 0, Color.ORANGE: 1, Color.YELLOW: 2, Color.GREEN: 3, Color.BLUE: 4}
+COLORS_BY_INDEX = [Color.RED, Color.ORANGE, Color.YELLOW, Color.GREEN, Color.BLUE]
+
 class Tile:
     def __init__(self, color=Color.UNINITIALIZED, star=False):
         self._color = color
@@ -96,15 +117,135 @@ class Tile:
         self._star = value
 
 
+# a tile that does not hold any state itself, but reads from and writes to the bitmasks of its board
+class BoardTile(Tile):
+    def __init__(self, board, x, y):
+        self._board = board
+        self._x = x
+        self._y = y
+
+    @property
+    def color(self):
+        return self._board.get_color_at(self._x, self._y)
+
+    @property
+    def star(self):
+        return self._board.get_star_at(self._x, self._y)
+
+    @color.setter
+    def color(self, value):
+        self._board.set_color_at(self._x, self._y, value)
+
+    @star.setter
+    def star(self, value):
+        self._board.set_star_at(self._x, self._y, value)
+
+
+# the bitmasks of a board use one bit per tile, the bit of the tile at (x, y) is x * height + y
+# so the bits of a column are consecutive and ascending bits follow the column-major order of the generator
+class BoardGeometry:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.full_mask = (1 << self.size) - 1
+
+        self.coords = [(bit // height, bit % height) for bit in range(self.size)]
+        self.column_masks = [((1 << height) - 1) << (x * height) for x in range(width)]
+        self.row_masks = [sum(1 << (x * height + y) for x in range(width)) for y in range(height)]
+        self.not_first_row_mask = self.full_mask & ~self.row_masks[0]
+        self.not_last_row_mask = self.full_mask & ~self.row_masks[-1]
+
+        # neighbour bits of every bit in the order of OFFSETS and the same as a mask
+        self.neighbours = []
+        self.neighbour_masks = []
+        for (x, y) in self.coords:
+            neighbours = [self.to_bit(x + ox, y + oy) for (ox, oy) in OFFSETS
+                          if 0 <= x + ox < width and 0 <= y + oy < height]
+            self.neighbours.append(neighbours)
+            self.neighbour_masks.append(sum(1 << n for n in neighbours))
+
+    def to_bit(self, x, y):
+        return x * self.height + y
+
+    def to_mask(self, coords):
+        mask = 0
+        for (x, y) in coords:
+            mask |= 1 << (x * self.height + y)
+        return mask
+
+    def to_coords(self, mask):
+        return [self.coords[bit] for bit in iter_bits(mask)]
+
+    # returns the mask grown by all orthogonal neighbours of its bits
+    def dilate(self, mask):
+        return (mask | ((mask & self.not_first_row_mask) >> 1) | ((mask & self.not_last_row_mask) << 1)
+                | (mask >> self.height) | (mask << self.height)) & self.full_mask
+
+    # returns all bits of region that are connected to the bits of seed
+    def flood(self, seed, region):
+        component = seed & region
+        while True:
+            grown = self.dilate(component) & region
+            if grown == component:
+                return component
+            component = grown
+
+    def is_connected(self, mask):
+        if mask == 0:
+            return True
+        return self.flood(mask & -mask, mask) == mask
+
+    # returns the index of the first set bit in row-major order (x + y * width)
+    def first_row_major_index(self, mask):
+        for y in range(self.height):
+            row = mask & self.row_masks[y]
+            if row:
+                return y * self.width + lowest_bit(row) // self.height
+        return -1
+
+
+@lru_cache(maxsize=None)
+def get_geometry(width=DEFAULT_BOARD_WIDTH, height=DEFAULT_BOARD_HEIGHT) -> BoardGeometry:
+    return BoardGeometry(width, height)
+
+
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:
+    def popcount(mask):
+        return bin(mask).count('1')
+
+
+def lowest_bit(mask):
+    return (mask & -mask).bit_length() - 1
+
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
 class Board:
     def __init__(self, width=DEFAULT_BOARD_WIDTH, height=DEFAULT_BOARD_HEIGHT):
         self._width = width
         self._height = height
-        self._tiles = [Tile() for _ in range(width * height)]
+        self._geometry = get_geometry(width, height)
+        self._color_masks = [0 for _ in range(len(COLOR_INDICES))]
+        self._star_mask = 0
+
+        # the components of the colored tiles, labeled when they are needed for the first time, the color masks can be
+        # changed in place, so the labels are kept as long as the masks are the same as when they were labeled
+        self._labeled_masks = None
+        self._labels = None
+        self._components = None
+        self._component_coords = None
 
     @property
     def tiles(self):
-        return self._tiles
+        return [BoardTile(self, x, y) for y in range(self._height) for x in range(self._width)]
 
     @property
     def width(self):
@@ -114,66 +255,179 @@ class Board:
     def height(self):
         return self._height
 
+    @property
+    def geometry(self):
+        return self._geometry
+
+    # one mask per color in the order of COLOR_INDICES, the generator changes these lists in place
+    @property
+    def color_masks(self):
+        return self._color_masks
+
+    @property
+    def star_mask(self):
+        return self._star_mask
+
+    @star_mask.setter
+    def star_mask(self, mask):
+        self._star_mask = mask
+
+    @property
+    def free_mask(self):
+        masks = self._color_masks
+        return self._geometry.full_mask & ~(masks[0] | masks[1] | masks[2] | masks[3] | masks[4])
+
+    def get_color_mask(self, color):
+        if color == Color.UNINITIALIZED:
+            return self.free_mask
+        return self._color_masks[COLOR_INDICES[color]]
+
     def get_tile_at(self, x, y):
         if self.in_bounds(x, y):
-            return self._tiles[self._to_index(x, y)]
+            return BoardTile(self, x, y)
         else:
             return None
 
     def set_tile_at(self, x, y, tile):
         if self.in_bounds(x, y):
-            self._tiles[self._to_index(x, y)] = tile
+            self.set_color_at(x, y, tile.color)
+            self.set_star_at(x, y, tile.star)
 
     def get_color_at(self, x, y):
         if self.in_bounds(x, y):
-            return self._tiles[self._to_index(x, y)].color
+            return self._color_at_bit(self._geometry.to_bit(x, y))
 
     def set_color_at(self, x, y, color):
         if self.in_bounds(x, y):
-            self._tiles[self._to_index(x, y)].color = color
+            bit = 1 << self._geometry.to_bit(x, y)
+            masks = self._color_masks
+            for i in range(len(masks)):
+                masks[i] &= ~bit
+            if color != Color.UNINITIALIZED:
+                masks[COLOR_INDICES[color]] |= bit
 
     def get_star_at(self, x, y):
         if self.in_bounds(x, y):
-            return self._tiles[self._to_index(x, y)].star
+            return bool(self._star_mask >> self._geometry.to_bit(x, y) & 1)
 
     def set_star_at(self, x, y, value=True):
         if self.in_bounds(x, y):
-            self._tiles[self._to_index(x, y)].star = value
+            bit = 1 << self._geometry.to_bit(x, y)
+            if value:
+                self._star_mask |= bit
+            else:
+                self._star_mask &= ~bit
+
+    def clear_stars(self):
+        self._star_mask = 0
+
+    def clear(self):
+        self._color_masks[:] = [0 for _ in range(len(COLOR_INDICES))]
+        self._star_mask = 0
 
     def in_bounds(self, x, y):
-        return 0 <= x < self._width and 0 <= y < self._height \
-               and self._to_index(x, y) < self._width * self._height
+        return 0 <= x < self._width and 0 <= y < self._height
 
     def _to_index(self, x, y):
         return x + y * self._width
 
-    def get_component_coords(self, x: int, y: int) -> List[Tuple[int, int]]:
-        component_coords = [(x, y)]
-        color = self.get_tile_at(x, y).color
+    def _color_at_bit(self, bit):
+        for i, mask in enumerate(self._color_masks):
+            if mask >> bit & 1:
+                return COLORS_BY_INDEX[i]
+        return Color.UNINITIALIZED
 
-        queue = [(x, y)]
-        while len(queue) > 0:
-            coord = queue.pop(0)
-            for (nx, ny) in get_neighbours(coord):
-                if self.in_bounds(nx, ny) and (nx, ny) not in component_coords and self.get_color_at(nx, ny) == color:
-                    queue.append((nx, ny))
-                    component_coords.append((nx, ny))
+    # the color index and the mask of every component (tiles of the same color connected to each other), in the order
+    # of their lowest bits per color, the index of a component is its id
+    @property
+    def components(self) -> List[Tuple[int, int]]:
+        self._label_components()
+        return self._components
 
-        return component_coords
+    # the id of the component of every bit, -1 for free tiles
+    @property
+    def component_labels(self) -> List[int]:
+        self._label_components()
+        return self._labels
+
+    # returns the id of the component containing (x, y) or -1 for a free tile
+    def get_component_id(self, x: int, y: int) -> int:
+        self._label_components()
+        return self._labels[self._geometry.to_bit(x, y)]
+
+    # returns the mask of the component containing (x, y), free tiles are connected to the free tiles around them
+    def get_component_mask(self, x: int, y: int) -> int:
+        component_id = self.get_component_id(x, y)
+        if component_id < 0:
+            return self._geometry.flood(1 << self._geometry.to_bit(x, y), self.free_mask)
+        return self._components[component_id][1]
+
+    def get_component_size(self, x: int, y: int) -> int:
+        return popcount(self.get_component_mask(x, y))
+
+    # the coordinates are ordered by their distance to the first tile of the component in row-major order
+    def get_component_coords(self, x: int, y: int) -> List[Tuple[int, int]]:
+        component_id = self.get_component_id(x, y)
+        if component_id < 0:
+            return self._to_component_coords(self.get_component_mask(x, y))
+
+        coords = self._component_coords.get(component_id)
+        if coords is None:
+            coords = self._to_component_coords(self._components[component_id][1])
+            self._component_coords[component_id] = coords
+        return coords
+
+    def _label_components(self):
+        color_masks = tuple(self._color_masks)
+        if color_masks == self._labeled_masks:
+            return
+
+        geometry = self._geometry
+        labels = [-1 for _ in range(geometry.size)]
+        components = []
+        for color_index, color_mask in enumerate(color_masks):
+            remaining = color_mask
+            while remaining:
+                component = geometry.flood(remaining & -remaining, color_mask)
+                for bit in iter_bits(component):
+                    labels[bit] = len(components)
+                components.append((color_index, component))
+                remaining &= ~component
+
+        self._labeled_masks = color_masks
+        self._labels = labels
+        self._components = components
+        self._component_coords = {}
+
+    # breadth first search from the first tile of the component in row-major order
+    def _to_component_coords(self, component: int) -> List[Tuple[int, int]]:
+        geometry = self._geometry
+        first = geometry.first_row_major_index(component)
+        start = geometry.to_bit(first % self._width, first // self._width)
+
+        component_bits = [start]
+        visited = 1 << start
+        i = 0
+        while i < len(component_bits):
+            for neighbour in geometry.neighbours[component_bits[i]]:
+                if component >> neighbour & 1 and not visited >> neighbour & 1:
+                    visited |= 1 << neighbour
+                    component_bits.append(neighbour)
+            i += 1
+
+        return [geometry.coords[bit] for bit in component_bits]
 
     def __str__(self):
-        s = ""
-        for y in range(self._height):
-            for x in range(self._width):
-                tile = self.get_tile_at(x, y)
-                if tile.star:
-                    s += tile.color.value.upper()
-                else:
-                    s += tile.color.value
+        geometry = self._geometry
+        chars = [Color.UNINITIALIZED.value for _ in range(geometry.size)]
+        for i, mask in enumerate(self._color_masks):
+            for bit in iter_bits(mask):
+                chars[bit] = COLORS_BY_INDEX[i].value
+        for bit in iter_bits(self._star_mask):
+            chars[bit] = chars[bit].upper()
 
-            if y != self._height - 1:
-                s += '\n'
-        return s
+        return '\n'.join(''.join(chars[x * self._height + y] for x in range(self._width))
+                         for y in range(self._height))
 
     def __repr__(self):
         s = "{}x{} Board:\n".format(self._width, self._height)
@@ -194,11 +448,20 @@ class PerpetualTimer(Thread):
             self.fn()
 
 
+# the reasons for which forward checking can reject a placement right after it was made
+PRUNE_COLUMNS = 'columns'
+PRUNE_COMPONENTS = 'components'
+PRUNE_FREE_SPACE = 'free space'
+PRUNE_REASONS = [PRUNE_COLUMNS, PRUNE_COMPONENTS, PRUNE_FREE_SPACE]
+
+
 class BacktrackingState:
     def __init__(self):
         self.level = 0
         self.placements = 0
         self.steps = 0
+        self.prunes = dict(zip(PRUNE_REASONS, [0 for _ in range(len(PRUNE_REASONS))]))
+        self.attempts = 0
 
     def inc_level(self):
         self.level += 1
@@ -212,46 +475,331 @@ class BacktrackingState:
     def inc_placements(self):
         self.placements += 1
 
+    def inc_prunes(self, reason):
+        self.prunes[reason] += 1
+
+    def inc_attempts(self):
+        self.attempts += 1
+
 
 def read_board_from_file(filename):
     with open(filename, 'r') as file:
-        lines = []
-        for line in file.readlines():
-            if line.strip().startswith('#'):
-                continue
-            lines.append(line)
+        return _parse_board_lines(file.readlines())
 
-        width = int(lines[0].strip())
-        height = int(lines[1].strip())
 
-        board = Board(width, height)
+def _parse_board_lines(lines):
+    lines = [line for line in lines if not line.strip().startswith('#')]
+
+    width = int(lines[0].strip())
+    height = int(lines[1].strip())
 
-        for i in range(2, len(lines)):
-            line = lines[i].strip()
-            for j in range(len(line)):
-                tile = board.get_tile_at(j, i - 2)
-                if line[j].isupper():
-                    tile._star = True
+    board = Board(width, height)
 
-                try:
-                    tile._color = Color(line[j].lower())
-                except ValueError:
-                    print("Unrecognized color '{}' at ({}, {})".format(line[j].lower(), j, i - 2))
-                    return None
+    for i in range(2, len(lines)):
+        line = lines[i].strip()
+        for j in range(len(line)):
+            if line[j].isupper():
+                board.set_star_at(j, i - 2)
 
-        return board
+            try:
+                board.set_color_at(j, i - 2, Color(line[j].lower()))
+            except ValueError:
+                print("Unrecognized color '{}' at ({}, {})".format(line[j].lower(), j, i - 2))
+                return None
+
+    return board
 
 
 def write_board_to_file(board: Board, filename, comment: str = ''):
     with open(filename, 'w') as file:
-        comment_lines = []
-        for cline in comment.splitlines(False):
-            comment_lines.append("# {}\n".format(cline))
-        file.writelines(comment_lines)
+        file.writelines(_format_board_lines(board, comment))
+
+
+def _format_board_lines(board: Board, comment: str = ''):
+    lines = []
+    for cline in comment.splitlines(False):
+        lines.append("# {}\n".format(cline))
+
+    lines.extend(["{}\n".format(board.width), "{}\n".format(board.height)])
+    lines.extend(str(board).splitlines(True))
+    return lines
+
+
+# a collection file holds boards in the format of board files, separated by empty lines, boards are appended to an open
+# collection file, so they can be written as soon as they are found
+def append_board_to_collection(board: Board, file, comment: str = ''):
+    if file.tell() > 0:
+        file.write("\n\n")  # the last row of the previous board has no line break
+    file.writelines(_format_board_lines(board, comment))
+    file.flush()
+
+
+# yields the boards of a collection file in the order they were written, packed collection files are read as well
+def read_boards_from_collection(filename):
+    if is_packed_collection(filename):
+        with PackedBoardCollection(filename) as collection:
+            yield from collection
+        return
+
+    with open(filename, 'r') as file:
+        lines = []
+        for line in file:
+            if line.strip() == '':
+                if lines:
+                    yield _parse_board_lines(lines)
+                lines = []
+            else:
+                lines.append(line)
+        if lines:
+            yield _parse_board_lines(lines)
+
+
+# a packed collection file starts with a header of the magic, the version and the size of its boards, every board
+# follows as a record of the same size: the color of every tile as a 3 bit number (0 for a free tile, the color index + 1
+# otherwise), stored as 3 bit planes, and the star mask, each of them as little endian masks of the board's bits
+PACKED_MAGIC = b'NMPACKED'
+PACKED_VERSION = 1
+PACKED_EXTENSION = '.nmb'
+_PACKED_HEADER = struct.Struct('<8sBBB')
+_PACKED_PLANES = 3
+
+
+def _packed_mask_bytes(width, height):
+    return (width * height + 7) // 8
+
+
+def packed_record_size(width=DEFAULT_BOARD_WIDTH, height=DEFAULT_BOARD_HEIGHT):
+    return (_PACKED_PLANES + 1) * _packed_mask_bytes(width, height)
+
+
+def pack_board(board: Board) -> bytes:
+    planes = [0 for _ in range(_PACKED_PLANES)]
+    for i, mask in enumerate(board.color_masks):
+        code = i + 1
+        for plane in range(_PACKED_PLANES):
+            if code >> plane & 1:
+                planes[plane] |= mask
+
+    mask_bytes = _packed_mask_bytes(board.width, board.height)
+    return b''.join(mask.to_bytes(mask_bytes, 'little') for mask in planes + [board.star_mask])
+
+
+def unpack_board(record, width=DEFAULT_BOARD_WIDTH, height=DEFAULT_BOARD_HEIGHT) -> Board:
+    board = Board(width, height)
+    full_mask = board.geometry.full_mask
+    mask_bytes = _packed_mask_bytes(width, height)
+    planes = [int.from_bytes(record[i * mask_bytes:(i + 1) * mask_bytes], 'little') for i in range(_PACKED_PLANES + 1)]
+
+    # the tiles of a color are the ones whose bits in the planes are the bits of its code
+    color_masks = board.color_masks
+    for i in range(len(color_masks)):
+        code = i + 1
+        mask = full_mask
+        for plane in range(_PACKED_PLANES):
+            mask &= planes[plane] if code >> plane & 1 else ~planes[plane]
+        color_masks[i] = mask
+    board.star_mask = planes[_PACKED_PLANES]
+    return board
+
+
+# writes the boards, which all have to be of the same size, to a packed collection file, returns the number of boards
+def write_packed_boards(filename, boards, width=DEFAULT_BOARD_WIDTH, height=DEFAULT_BOARD_HEIGHT) -> int:
+    count = 0
+    with open(filename, 'wb') as file:
+        file.write(_PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, width, height))
+        for board in boards:
+            if board.width != width or board.height != height:
+                raise ValueError("The board no. {} is {}x{} instead of {}x{}"
+                                 .format(count, board.width, board.height, width, height))
+            file.write(pack_board(board))
+            count += 1
+    return count
+
+
+# a packed collection file mapped into memory, a board is decoded from its offset when it is accessed, an incomplete
+# record at the end is ignored, the collection has to be closed to unmap the file
+class PackedBoardCollection:
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        try:
+            header = self._file.read(_PACKED_HEADER.size)
+            if len(header) < _PACKED_HEADER.size or not header.startswith(PACKED_MAGIC):
+                raise ValueError("'{}' is not a packed board collection".format(filename))
+            (_, version, self.width, self.height) = _PACKED_HEADER.unpack(header)
+            if version != PACKED_VERSION:
+                raise ValueError("'{}' is a packed board collection of version {} instead of {}"
+                                 .format(filename, version, PACKED_VERSION))
+
+            self.record_size = packed_record_size(self.width, self.height)
+            size = os.fstat(self._file.fileno()).st_size
+            self._count = (size - _PACKED_HEADER.size) // self.record_size
+            # an empty file can't be mapped
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._count > 0 else None
+        except BaseException:
+            self._file.close()
+            raise
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, n) -> Board:
+        if n < 0:
+            n += self._count
+        if not 0 <= n < self._count:
+            raise IndexError("The collection has no board no. {}".format(n))
+        return unpack_board(self.record(n), self.width, self.height)
+
+    def __iter__(self):
+        for n in range(self._count):
+            yield unpack_board(self.record(n), self.width, self.height)
+
+    # the bytes of all boards, a view into the mapping
+    def records(self) -> memoryview:
+        if self._mmap is None:
+            return memoryview(b'')
+        return memoryview(self._mmap)[_PACKED_HEADER.size:_PACKED_HEADER.size + self._count * self.record_size]
+
+    # the bytes of board no. n, a view into the mapping
+    def record(self, n) -> memoryview:
+        offset = _PACKED_HEADER.size + n * self.record_size
+        return memoryview(self._mmap)[offset:offset + self.record_size]
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def is_packed_collection(filename) -> bool:
+    with open(filename, 'rb') as file:
+        return file.read(len(PACKED_MAGIC)) == PACKED_MAGIC
+
+
+# the files of the given paths in the given order, directories are searched for board and packed collection files and glob
+# patterns are expanded, both sorted by name
+def find_board_files(paths) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for (root, dirs, names) in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                             if name.endswith('.dat') or name.endswith(PACKED_EXTENSION))
+        elif glob.has_magic(path):
+            files.extend(sorted(name for name in glob.glob(path, recursive=True) if os.path.isfile(name)))
+        else:
+            files.append(path)
+    return files
+
+
+# --- fingerprints ---
+
+FINGERPRINT_SIZE = 16
+
+
+def _mirror_mask(geometry: BoardGeometry, mask):
+    mirrored = 0
+    column = (1 << geometry.height) - 1
+    for x in range(geometry.width):
+        mirrored |= (mask >> (x * geometry.height) & column) << ((geometry.width - 1 - x) * geometry.height)
+    return mirrored
+
+
+# a hash of the board that is the same for its mirror image and for every relabeling of its colors, the stars are only
+# part of it with with_stars
+def board_fingerprint(board: Board, with_stars: bool = False) -> bytes:
+    geometry = board.geometry
+    mask_bytes = (geometry.size + 7) // 8
+    star_mask = board.star_mask if with_stars else 0
+
+    encodings = []
+    for mirror in (False, True):
+        masks = [mask for mask in board.color_masks if mask]
+        stars = star_mask
+        if mirror:
+            masks = [_mirror_mask(geometry, mask) for mask in masks]
+            stars = _mirror_mask(geometry, stars)
+        masks.sort(key=geometry.first_row_major_index)
+        encodings.append(b''.join(mask.to_bytes(mask_bytes, 'little') for mask in masks + [stars]))
+
+    data = struct.pack('<BB', board.width, board.height) + min(encodings)
+    return hashlib.blake2b(data, digest_size=FINGERPRINT_SIZE).digest()
+
+
+FINGERPRINT_INDEX_MAGIC = b'NMFPIDX1'
+_FINGERPRINT_INDEX_HEADER = struct.Struct('<8s?')
+
+
+# the fingerprints of a file kept in a set, a new one is appended to the file right away, so an interrupted run keeps
+# it, only one process may add to an index at a time
+class FingerprintIndex:
 
-        lines = ["{}\n".format(board.width), "{}\n".format(board.height)]
-        lines.extend(str(board).splitlines(True))
-        file.writelines(lines)
+    def __init__(self, filename: str, with_stars: bool = False):
+        self.filename = filename
+        self.with_stars = with_stars
+        self.fingerprints = set()
+
+        if os.path.exists(filename) and os.path.getsize(filename) > 0:
+            with open(filename, 'rb') as f:
+                header = f.read(_FINGERPRINT_INDEX_HEADER.size)
+                if len(header) < _FINGERPRINT_INDEX_HEADER.size or not header.startswith(FINGERPRINT_INDEX_MAGIC):
+                    raise ValueError("'{}' is not a fingerprint index".format(filename))
+                (_, indexed_with_stars) = _FINGERPRINT_INDEX_HEADER.unpack(header)
+                if indexed_with_stars != with_stars:
+                    raise ValueError("The fingerprints of '{}' are made {} the stars".format(
+                        filename, "with" if indexed_with_stars else "without"))
+
+                data = f.read()
+            end = len(data) - len(data) % FINGERPRINT_SIZE
+            self.fingerprints.update(data[i:i + FINGERPRINT_SIZE] for i in range(0, end, FINGERPRINT_SIZE))
+            self.file = open(filename, 'r+b')
+            self.file.truncate(_FINGERPRINT_INDEX_HEADER.size + end)
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.file = open(filename, 'wb')
+            self.file.write(_FINGERPRINT_INDEX_HEADER.pack(FINGERPRINT_INDEX_MAGIC, with_stars))
+            self.file.flush()
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def __contains__(self, fingerprint: bytes):
+        return fingerprint in self.fingerprints
+
+    def fingerprint(self, board: Board) -> bytes:
+        return board_fingerprint(board, self.with_stars)
+
+    def contains_board(self, board: Board) -> bool:
+        return self.fingerprint(board) in self.fingerprints
+
+    # adds the fingerprint, returns False if it was in the index already
+    def add(self, fingerprint: bytes) -> bool:
+        if fingerprint in self.fingerprints:
+            return False
+        self.fingerprints.add(fingerprint)
+        self.file.write(fingerprint)
+        self.file.flush()
+        return True
+
+    def add_board(self, board: Board) -> bool:
+        return self.add(self.fingerprint(board))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
 
 palette = [
@@ -276,15 +824,256 @@ palette = [
 ]
 
 
-def write_board_to_png(board: Board, filename: str):
+def write_board_to_png(board: Board, filename: str, scale: int = 1):
     if png is None:
         return
 
-    lines = str(board).lower().splitlines(False)
-    lines = [[_color_char_to_color_index(c) for c in row] for row in lines]
+    with open(filename, 'wb') as f:
+        _write_png(board, f, scale)
+
+
+def _write_png(board: Board, file, scale: int = 1):
+    lines = _board_to_palette_rows(board, scale)
     w = png.Writer(len(lines[0]), len(lines), palette=palette, bitdepth=4)
-    f = open(filename, 'wb')
-    w.write(f, lines)
+    w.write(file, lines)
+
+
+# one palette index per tile, every tile becomes a square of scale x scale pixels
+def _board_to_palette_rows(board: Board, scale: int = 1):
+    lines = str(board).lower().splitlines(False)
+    rows = []
+    for line in lines:
+        row = [index for c in line for index in [_color_char_to_color_index(c)] * scale]
+        rows.extend(list(row) for _ in range(scale))
+    return rows
+
+
+STEP_IMAGE_OUTPUTS = ['folder', 'zip', 'apng', 'gif']
+
+
+# writes the sampled steps offered by the search as images in a background thread, a step that does not fit into the
+# queue is dropped and counted, the writer has to be closed to write the last images
+class StepImageWriter(Thread):
+
+    def __init__(self, path: str, output: str = 'folder', every: int = 1, new_max_level_only: bool = False,
+                 queue_size: int = 1024, frame_delay: float = 0.1, scale: int = 1, drop_when_full: bool = True):
+        Thread.__init__(self, daemon=True)
+        if output not in STEP_IMAGE_OUTPUTS:
+            raise ValueError("Unknown output '{}' for the step images".format(output))
+        self.path = path
+        self.output = output
+        self.every = every
+        self.new_max_level_only = new_max_level_only
+        self.frame_delay = frame_delay
+        self.scale = scale
+        self.drop_when_full = drop_when_full
+        self.queue = queue.Queue(queue_size)
+        self.steps = 0
+        self.max_level = -1
+        self.written = 0
+        self.dropped = 0
+
+        self._archive = None
+        self._animation = None
+        if output == 'folder':
+            os.mkdir(path)
+        elif output == 'zip':
+            self._archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED)  # png files are compressed already
+        elif output == 'apng':
+            self._animation = _AnimatedPngWriter(path, frame_delay)
+        else:
+            self._animation = _AnimatedGifWriter(path, frame_delay)
+        self.start()
+
+    def offer(self, board: Board, placements: int, level: int):
+        if self.new_max_level_only:
+            if level <= self.max_level:
+                return
+            self.max_level = level
+
+        self.steps += 1
+        if (self.steps - 1) % self.every != 0:
+            return
+
+        try:
+            self.queue.put((board.width, board.height, tuple(board.color_masks), board.star_mask, placements, level),
+                           block=not self.drop_when_full)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self.queue.put(None)
+        self.join()
+        if self._archive is not None:
+            self._archive.close()
+        if self._animation is not None:
+            self._animation.close()
+
+    def run(self):
+        while True:
+            snapshot = self.queue.get()
+            if snapshot is None:
+                return
+
+            (width, height, color_masks, star_mask, placements, level) = snapshot
+            board = Board(width, height)
+            board.color_masks[:] = color_masks
+            for bit in iter_bits(star_mask):
+                board.set_star_at(*board.geometry.coords[bit])
+
+            name = 'try{:0>7}-lvl{:0>2}.png'.format(placements, level)
+            if self.output == 'folder':
+                write_board_to_png(board, os.path.join(self.path, name), self.scale)
+            elif self.output == 'zip':
+                data = io.BytesIO()
+                _write_png(board, data, self.scale)
+                self._archive.writestr(name, data.getvalue())
+            else:
+                self._animation.add_frame(_board_to_palette_rows(board, self.scale))
+            self.written += 1
+
+
+# PyPNG can't write animated pngs, so the chunks are written here: one pixel per tile in the palette of the step images,
+# the number of frames in the animation control chunk is filled in when the writer is closed
+class _AnimatedPngWriter:
+    def __init__(self, filename: str, frame_delay: float):
+        self.file = open(filename, 'wb')
+        self.frame_delay = frame_delay
+        self.frames = 0
+        self.sequence_number = 0
+        self.size = None
+        self.actl_offset = None
+
+    def add_frame(self, rows):
+        if self.size is None:
+            self._write_header(len(rows[0]), len(rows))
+
+        (width, height) = self.size
+        delay = int(round(self.frame_delay * 1000))
+        self._write_chunk(b'fcTL', struct.pack('>IIIIIHHBB', self.sequence_number, width, height, 0, 0, delay, 1000,
+                                               0, 0))
+        self.sequence_number += 1
+
+        data = zlib.compress(b''.join(b'\x00' + bytes(row) for row in rows))
+        if self.frames == 0:
+            self._write_chunk(b'IDAT', data)
+        else:
+            self._write_chunk(b'fdAT', struct.pack('>I', self.sequence_number) + data)
+            self.sequence_number += 1
+        self.frames += 1
+
+    def close(self):
+        if self.size is None:
+            self.add_frame([[_color_char_to_color_index(Color.WHITE.value)]])  # an apng needs at least one frame
+
+        self._write_chunk(b'IEND', b'')
+        self.file.seek(self.actl_offset)
+        self._write_chunk(b'acTL', struct.pack('>II', self.frames, 0))
+        self.file.close()
+
+    def _write_header(self, width, height):
+        self.size = (width, height)
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0))
+        self._write_chunk(b'PLTE', b''.join(bytes(rgb) for rgb in palette))
+        self.actl_offset = self.file.tell()
+        self._write_chunk(b'acTL', struct.pack('>II', 0, 0))
+
+    def _write_chunk(self, kind: bytes, data: bytes):
+        self.file.write(struct.pack('>I', len(data)) + kind + data +
+                        struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+# an animated gif in the palette of the step images, which is padded to the 8 colors of a 3 bit color table, the
+# animation loops forever
+class _AnimatedGifWriter:
+    MIN_CODE_SIZE = 3
+
+    def __init__(self, filename: str, frame_delay: float):
+        self.file = open(filename, 'wb')
+        self.frame_delay = frame_delay
+        self.frames = 0
+        self.size = None
+
+    def add_frame(self, rows):
+        if self.size is None:
+            self._write_header(len(rows[0]), len(rows))
+
+        (width, height) = self.size
+        delay = int(round(self.frame_delay * 100))
+        self.file.write(b'\x21\xf9\x04\x00' + struct.pack('<H', delay) + b'\x00\x00')  # graphic control extension
+        self.file.write(b'\x2c' + struct.pack('<HHHHB', 0, 0, width, height, 0))  # image descriptor
+
+        data = _lzw_encode([index for row in rows for index in row], self.MIN_CODE_SIZE)
+        self.file.write(bytes([self.MIN_CODE_SIZE]))
+        for start in range(0, len(data), 255):
+            block = data[start:start + 255]
+            self.file.write(bytes([len(block)]) + block)
+        self.file.write(b'\x00')
+        self.frames += 1
+
+    def close(self):
+        if self.size is None:
+            self.add_frame([[_color_char_to_color_index(Color.WHITE.value)]])  # a gif needs at least one image
+
+        self.file.write(b'\x3b')
+        self.file.close()
+
+    def _write_header(self, width, height):
+        self.size = (width, height)
+        self.file.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0xf0 | (self.MIN_CODE_SIZE - 1), 0, 0))
+        colors = palette + [(0, 0, 0)] * ((1 << self.MIN_CODE_SIZE) - len(palette))
+        self.file.write(b''.join(bytes(rgb) for rgb in colors))
+        self.file.write(b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')  # loop forever
+
+
+# the variable length lzw compression of gif images, the code table is cleared when it is full
+def _lzw_encode(indices, min_code_size: int) -> bytes:
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+    code_size = min_code_size + 1
+    next_code = end_code + 1
+    table = {}
+
+    out = bytearray()
+    bits = 0
+    bit_count = 0
+
+    def emit(code):
+        nonlocal bits, bit_count, code_size
+        bits |= code << bit_count
+        bit_count += code_size
+        while bit_count >= 8:
+            out.append(bits & 0xff)
+            bits >>= 8
+            bit_count -= 8
+        if next_code > (1 << code_size) - 1 and code_size < 12:
+            code_size += 1
+
+    emit(clear_code)
+    prefix = indices[0]
+    for index in indices[1:]:
+        code = table.get((prefix, index))
+        if code is not None:
+            prefix = code
+            continue
+
+        emit(prefix)
+        if next_code < 4096:
+            table[(prefix, index)] = next_code
+            next_code += 1
+        else:
+            emit(clear_code)
+            table.clear()
+            next_code = end_code + 1
+            code_size = min_code_size + 1
+        prefix = index
+    emit(prefix)
+    emit(end_code)
+
+    if bit_count > 0:
+        out.append(bits & 0xff)
+    return bytes(out)
 
 
 def _color_char_to_color_index(c: str) -> int:
@@ -307,20 +1096,22 @@ def _color_char_to_color_index(c: str) -> int:
 # checks if there is a missing color or wrong amount of tiles per color
 def check_color_distribution(board, lazy=False):
     error_msgs = []
-    amounts = dict()
-
-    for tile in board.tiles:
-        if tile.color not in amounts:
-            amounts[tile.color] = 1
-        else:
-            amounts[tile.color] += 1
-
-    if len(amounts.items()) != 5:
-        error_msgs.append("The board is missing {} color(s)".format(5 - len(amounts.items())))
+    geometry = board.geometry
+
+    # colors in the order of their first occurrence on the board
+    amounts = []
+    for color in Color.ref_list(with_white=True):
+        mask = board.get_color_mask(color)
+        if mask:
+            amounts.append((geometry.first_row_major_index(mask), color, popcount(mask)))
+    amounts.sort(key=lambda amount: amount[0])
+
+    if len(amounts) != 5:
+        error_msgs.append("The board is missing {} color(s)".format(5 - len(amounts)))
         if lazy:
             return error_msgs
 
-    for (k, v) in amounts.items():
+    for (_, k, v) in amounts:
         if v != 21:
             error_msgs.append("The color '{}' has {} tiles instead of 21".format(k, v))
             if lazy:
@@ -333,41 +1124,49 @@ def check_color_distribution(board, lazy=False):
 # also checks that all occurrences of a color are connected
 def check_columns(board, lazy=False):
     error_msgs = []
+    geometry = board.geometry
 
     for col in range(board.width):
-        colors_seen = dict(zip(Color.ref_list(), [-1 for _ in range(len(Color.ref_list()))]))
-        last_color: Color = Color.UNINITIALIZED
-        stars = 0
-
-        for y in range(board.height):
-            current_color: Color = board.get_tile_at(col, y).color
-            if colors_seen[current_color] == -1:
-                colors_seen[current_color] = y
-            else:
-                if current_color == last_color or \
-                        (col, colors_seen[current_color]) in board.get_component_coords(col, y):  # fine
-                    pass
-                else:  # not fine
-                    error_msgs.append("Column {} has multiple occurrences of color {} at row {}"
-                                      .format(col, current_color, y))
-                    if lazy:
-                        return error_msgs
-
-            if board.get_tile_at(col, y).star:
-                stars += 1
+        column_mask = geometry.column_masks[col]
+        occurrence_msgs = []
+        missing_colors = []
+
+        for color in Color.ref_list():
+            color_mask = board.get_color_mask(color)
+            in_column = color_mask & column_mask
+            if not in_column:
+                missing_colors.append(color)
+                continue
 
-            last_color = current_color
+            # every further run of this color in the column has to belong to the component of the first tile
+            first = lowest_bit(in_column)
+            first_component = None
+            for bit in iter_bits(in_column & ~(1 << first)):
+                if in_column >> (bit - 1) & 1:
+                    continue  # same color as the tile above
+
+                if first_component is None:
+                    first_component = board.get_component_mask(*geometry.coords[first])
+                if not first_component >> bit & 1:
+                    occurrence_msgs.append((bit, "Column {} has multiple occurrences of color {} at row {}"
+                                            .format(col, color, bit - col * board.height)))
+
+        occurrence_msgs.sort(key=lambda msg: msg[0])
+        for (_, msg) in occurrence_msgs:
+            error_msgs.append(msg)
+            if lazy:
+                return error_msgs
 
+        stars = popcount(board.star_mask & column_mask)
         if stars != 1:
             error_msgs.append("Column {} has {} stars instead of 1".format(col, stars))
             if lazy:
                 return error_msgs
 
-        for (k, v) in colors_seen.items():
-            if v == -1:
-                error_msgs.append("Column {} is missing the '{}' color".format(col, k))
-                if lazy:
-                    return error_msgs
+        for k in missing_colors:
+            error_msgs.append("Column {} is missing the '{}' color".format(col, k))
+            if lazy:
+                return error_msgs
 
     return error_msgs
 
@@ -377,28 +1176,32 @@ def check_components(board, lazy=False):
     error_msgs = []
 
     components = dict(zip(Color.ref_list(), [set() for _ in range(len(Color.ref_list()))]))
-    visited_coords = set()
+    seen = set()
 
+    # the components in row-major order of their first tiles
     for y in range(board.height):
         for x in range(board.width):
-            if (x, y) in visited_coords:
+            component_id = board.get_component_id(x, y)
+            if component_id < 0 or component_id in seen:
                 continue
-            else:
-                comp = board.get_component_coords(x, y)
-                visited_coords.update(comp)
+            seen.add(component_id)
 
-                if len(comp) > 6:
-                    error_msgs.append("The component at {} is too large ({} tiles)".format(comp, len(comp)))
-                    if lazy:
-                        return error_msgs
+            (color_index, comp) = board.components[component_id]
+            color = COLORS_BY_INDEX[color_index]
+            comp_size = popcount(comp)
 
-                color = board.get_tile_at(x, y).color
-                if len(comp) not in components[color]:
-                    components[color].add(len(comp))
-                else:
-                    error_msgs.append("A component of {} tiles already exists for color '{}'".format(len(comp), color))
-                    if lazy:
-                        return error_msgs
+            if comp_size > 6:
+                error_msgs.append("The component at {} is too large ({} tiles)"
+                                  .format(board.get_component_coords(x, y), comp_size))
+                if lazy:
+                    return error_msgs
+
+            if comp_size not in components[color]:
+                components[color].add(comp_size)
+            else:
+                error_msgs.append("A component of {} tiles already exists for color '{}'".format(comp_size, color))
+                if lazy:
+                    return error_msgs
 
     reference = {1, 2, 3, 4, 5, 6}
     for (k, v) in components.items():
@@ -421,16 +1224,13 @@ def check_components(board, lazy=False):
 def check_stars_per_color(board, lazy=False):
     error_msgs = []
 
-    star_counts = dict(zip(Color.ref_list(), [0 for _ in range(len(Color.ref_list()))]))
+    star_counts = []
+    for color in Color.ref_list():
+        star_counts.append((color, popcount(board.star_mask & board.get_color_mask(color))))
+    if board.star_mask & board.free_mask:
+        star_counts.append((Color.UNINITIALIZED, popcount(board.star_mask & board.free_mask)))
 
-    for tile in board.tiles:
-        if tile.star:
-            if tile.color not in star_counts:
-                star_counts[tile.color] = 1
-            else:
-                star_counts[tile.color] += 1
-
-    for (k, v) in star_counts.items():
+    for (k, v) in star_counts:
         if v != 3:
             error_msgs.append("The color '{}' has {} star(s) instead of 3".format(k, v))
             if lazy:
@@ -439,22 +1239,315 @@ def check_stars_per_color(board, lazy=False):
     return error_msgs
 
 
-# performs all checks in a single function, if lazy returns on first error
-def check_all(board, lazy=False):
-    error_msgs = check_color_distribution(board, lazy)
-    if lazy and len(error_msgs) != 0:
-        return error_msgs
+# the checks of validate in the order they are run and the codes of the errors they find
+CHECK_COLOR_DISTRIBUTION = 'color distribution'
+CHECK_STARS_PER_COLOR = 'stars per color'
+CHECK_COLUMNS = 'columns'
+CHECK_COMPONENTS = 'color components'
+VALIDATION_CHECKS = [CHECK_COLOR_DISTRIBUTION, CHECK_STARS_PER_COLOR, CHECK_COLUMNS, CHECK_COMPONENTS]
+
+ERROR_MISSING_COLORS = 'missing-colors'
+ERROR_COLOR_TILES = 'color-tiles'
+ERROR_COLOR_STARS = 'color-stars'
+ERROR_COLUMN_SPLIT_COLOR = 'column-split-color'
+ERROR_COLUMN_STARS = 'column-stars'
+ERROR_COLUMN_MISSING_COLOR = 'column-missing-color'
+ERROR_COMPONENT_TOO_LARGE = 'component-too-large'
+ERROR_DUPLICATE_COMPONENT_SIZE = 'duplicate-component-size'
+ERROR_MISSING_COMPONENT_SIZES = 'missing-component-sizes'
+ERROR_EXTRA_COMPONENT_SIZES = 'extra-component-sizes'
+VALIDATION_ERRORS = [ERROR_MISSING_COLORS, ERROR_COLOR_TILES, ERROR_COLOR_STARS, ERROR_COLUMN_SPLIT_COLOR,
+                     ERROR_COLUMN_STARS, ERROR_COLUMN_MISSING_COLOR, ERROR_COMPONENT_TOO_LARGE,
+                     ERROR_DUPLICATE_COMPONENT_SIZE, ERROR_MISSING_COMPONENT_SIZES, ERROR_EXTRA_COMPONENT_SIZES]
+
+
+# an error found by validate: the check that found it, its code, the message the check functions return for it and the
+# values the message was made of (colors by their names)
+class ValidationError:
+    def __init__(self, check: str, code: str, message: str, details: dict):
+        self.check = check
+        self.code = code
+        self.message = message
+        self.details = details
 
-    error_msgs.extend(check_stars_per_color(board, lazy))
-    if lazy and len(error_msgs) != 0:
-        return error_msgs
+    def __repr__(self):
+        return "ValidationError({!r}, {!r}, {!r}, {!r})".format(self.check, self.code, self.message, self.details)
 
-    error_msgs.extend(check_columns(board, lazy))
-    if lazy and len(error_msgs) != 0:
-        return error_msgs
 
-    error_msgs.extend(check_components(board, lazy))
-    return error_msgs
+class ValidationResult:
+    def __init__(self):
+        self.errors = []
+
+    @property
+    def valid(self):
+        return len(self.errors) == 0
+
+    @property
+    def messages(self) -> List[str]:
+        return [error.message for error in self.errors]
+
+    def errors_of(self, check: str) -> List[ValidationError]:
+        return [error for error in self.errors if error.check == check]
+
+    def add(self, check: str, code: str, message: str, **details):
+        self.errors.append(ValidationError(check, code, message, details))
+
+
+# checks the rules of check_all with a single labeling of the components, the messages are the ones check_all returns,
+# with lazy it stops at the first error
+def validate(board, lazy=False) -> ValidationResult:
+    result = ValidationResult()
+    geometry = board.geometry
+    components = board.components
+    labels = board.component_labels
+    color_masks = board.color_masks
+
+    # colors in the order of their first occurrence on the board
+    amounts = []
+    for color in Color.ref_list(with_white=True):
+        mask = board.get_color_mask(color)
+        if mask:
+            amounts.append((geometry.first_row_major_index(mask), color, popcount(mask)))
+    amounts.sort(key=lambda amount: amount[0])
+
+    if len(amounts) != 5:
+        result.add(CHECK_COLOR_DISTRIBUTION, ERROR_MISSING_COLORS,
+                   "The board is missing {} color(s)".format(5 - len(amounts)), missing=5 - len(amounts))
+        if lazy:
+            return result
+
+    for (_, k, v) in amounts:
+        if v != 21:
+            result.add(CHECK_COLOR_DISTRIBUTION, ERROR_COLOR_TILES,
+                       "The color '{}' has {} tiles instead of 21".format(k, v), color=k.name, tiles=v)
+            if lazy:
+                return result
+
+    # stars per color
+    star_counts = []
+    for color in Color.ref_list():
+        star_counts.append((color, popcount(board.star_mask & color_masks[COLOR_INDICES[color]])))
+    if board.star_mask & board.free_mask:
+        star_counts.append((Color.UNINITIALIZED, popcount(board.star_mask & board.free_mask)))
+
+    for (k, v) in star_counts:
+        if v != 3:
+            result.add(CHECK_STARS_PER_COLOR, ERROR_COLOR_STARS,
+                       "The color '{}' has {} star(s) instead of 3".format(k, v), color=k.name, stars=v)
+            if lazy:
+                return result
+
+    # columns, every run of a color in a column has to belong to the component of its first tile in the column
+    for col in range(board.width):
+        column_mask = geometry.column_masks[col]
+        split_colors = []
+        missing_colors = []
+
+        for color in Color.ref_list():
+            in_column = color_masks[COLOR_INDICES[color]] & column_mask
+            if not in_column:
+                missing_colors.append(color)
+                continue
+
+            run_starts = in_column & ~(in_column << 1)
+            first_component = components[labels[lowest_bit(in_column)]][1]
+            for bit in iter_bits(run_starts & ~first_component):
+                split_colors.append((bit, color))
+
+        split_colors.sort(key=lambda split: split[0])
+        for (bit, color) in split_colors:
+            row = bit - col * board.height
+            result.add(CHECK_COLUMNS, ERROR_COLUMN_SPLIT_COLOR,
+                       "Column {} has multiple occurrences of color {} at row {}".format(col, color, row),
+                       column=col, color=color.name, row=row)
+            if lazy:
+                return result
+
+        stars = popcount(board.star_mask & column_mask)
+        if stars != 1:
+            result.add(CHECK_COLUMNS, ERROR_COLUMN_STARS, "Column {} has {} stars instead of 1".format(col, stars),
+                       column=col, stars=stars)
+            if lazy:
+                return result
+
+        for k in missing_colors:
+            result.add(CHECK_COLUMNS, ERROR_COLUMN_MISSING_COLOR, "Column {} is missing the '{}' color".format(col, k),
+                       column=col, color=k.name)
+            if lazy:
+                return result
+
+    # components in row-major order of their first tiles
+    sizes = dict(zip(Color.ref_list(), [set() for _ in range(len(Color.ref_list()))]))
+    first_tiles = sorted((geometry.first_row_major_index(mask), component_id)
+                         for component_id, (_, mask) in enumerate(components))
+    for (first_tile, component_id) in first_tiles:
+        (color_index, comp) = components[component_id]
+        color = COLORS_BY_INDEX[color_index]
+        comp_size = popcount(comp)
+
+        if comp_size > 6:
+            coords = board.get_component_coords(first_tile % board.width, first_tile // board.width)
+            result.add(CHECK_COMPONENTS, ERROR_COMPONENT_TOO_LARGE,
+                       "The component at {} is too large ({} tiles)".format(coords, comp_size),
+                       coords=coords, tiles=comp_size)
+            if lazy:
+                return result
+
+        if comp_size not in sizes[color]:
+            sizes[color].add(comp_size)
+        else:
+            result.add(CHECK_COMPONENTS, ERROR_DUPLICATE_COMPONENT_SIZE,
+                       "A component of {} tiles already exists for color '{}'".format(comp_size, color),
+                       color=color.name, tiles=comp_size)
+            if lazy:
+                return result
+
+    reference = {1, 2, 3, 4, 5, 6}
+    for (k, v) in sizes.items():
+        if v != reference:
+            missing = reference - v
+            toomuch = v - reference
+            if len(missing) > 0:
+                result.add(CHECK_COMPONENTS, ERROR_MISSING_COMPONENT_SIZES,
+                           "The color '{}' is missing the components with {} tiles".format(k, missing),
+                           color=k.name, sizes=sorted(missing))
+                if lazy:
+                    return result
+            if len(toomuch) > 0:
+                result.add(CHECK_COMPONENTS, ERROR_EXTRA_COMPONENT_SIZES,
+                           "The color '{}' has components with {} tiles that are not allowed".format(k, toomuch),
+                           color=k.name, sizes=sorted(toomuch))
+                if lazy:
+                    return result
+
+    return result
+
+
+# performs all checks in a single function, if lazy returns on first error
+def check_all(board, lazy=False):
+    return validate(board, lazy).messages
+
+
+# --- bulk validation with numpy ---
+
+# the errors of a board in bulk validation are a bitmask, bit i stands for the code VALIDATION_ERRORS[i]
+def validation_error_mask(result: ValidationResult) -> int:
+    mask = 0
+    for error in result.errors:
+        mask |= 1 << VALIDATION_ERRORS.index(error.code)
+    return mask
+
+
+def validation_error_codes(mask: int) -> List[str]:
+    return [code for i, code in enumerate(VALIDATION_ERRORS) if mask >> i & 1]
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("The bulk validation requires the NumPy module")
+
+
+# the colors (0 for a free tile, otherwise the color index + 1) and the stars of the boards as arrays of the shape
+# (N, height, width), all boards need to have the given size
+def boards_to_arrays(boards, width=DEFAULT_BOARD_WIDTH, height=DEFAULT_BOARD_HEIGHT):
+    _require_numpy()
+    boards = list(boards)
+    for n, board in enumerate(boards):
+        if board.width != width or board.height != height:
+            raise ValueError("The board no. {} is {}x{} instead of {}x{}"
+                             .format(n, board.width, board.height, width, height))
+    return _packed_records_to_arrays(b''.join(pack_board(board) for board in boards), len(boards), width, height)
+
+
+# the colors and stars of all boards of a packed collection, decoded from the mapping without creating Board objects
+def packed_collection_to_arrays(collection: PackedBoardCollection):
+    _require_numpy()
+    return _packed_records_to_arrays(collection.records(), len(collection), collection.width, collection.height)
+
+
+def _packed_records_to_arrays(records, count, width, height):
+    mask_bytes = _packed_mask_bytes(width, height)
+    size = width * height
+    data = np.frombuffer(records, dtype=np.uint8, count=count * packed_record_size(width, height))
+    data = data.reshape(count, _PACKED_PLANES + 1, mask_bytes)
+
+    # bit i of a mask is the tile (i // height, i % height)
+    bits = np.unpackbits(data, axis=2, bitorder='little')[:, :, :size]
+    bits = bits.reshape(count, _PACKED_PLANES + 1, width, height).transpose(0, 1, 3, 2)
+    colors = np.zeros((count, height, width), dtype=np.uint8)
+    for plane in range(_PACKED_PLANES):
+        colors |= bits[:, plane] << plane
+    stars = bits[:, _PACKED_PLANES].astype(bool)
+    return colors, stars
+
+
+# the error bitmask of every board of the arrays of boards_to_arrays, with the bits of the codes validate finds for it
+def validate_bulk(colors, stars):
+    _require_numpy()
+    (count, height, width) = colors.shape
+    color_count = len(COLOR_INDICES)
+    errors = np.zeros(count, dtype=np.uint16)
+
+    def add(code, boards):
+        errors[boards] |= np.uint16(1 << VALIDATION_ERRORS.index(code))
+
+    # colors, the free tiles count as a color if there are any
+    tiles = np.stack([(colors == code).sum(axis=(1, 2)) for code in range(color_count + 1)], axis=1)
+    present = tiles > 0
+    add(ERROR_MISSING_COLORS, present.sum(axis=1) != color_count)
+    add(ERROR_COLOR_TILES, (present & (tiles != 21)).any(axis=1))
+
+    # stars per color
+    star_tiles = np.stack([((colors == code) & stars).sum(axis=(1, 2)) for code in range(color_count + 1)], axis=1)
+    add(ERROR_COLOR_STARS, (star_tiles[:, 1:] != 3).any(axis=1) | ((star_tiles[:, 0] > 0) & (star_tiles[:, 0] != 3)))
+
+    # columns
+    add(ERROR_COLUMN_STARS, (stars.sum(axis=1) != 1).any(axis=1))
+    in_column = np.stack([(colors == code).any(axis=1) for code in range(1, color_count + 1)], axis=1)
+    add(ERROR_COLUMN_MISSING_COLOR, ~in_column.all(axis=(1, 2)))
+
+    # components, the label of a tile is the index of a tile of its component in the flattened batch, the free tiles
+    # keep their own index and are ignored
+    colored = colors > 0
+    flat_size = count * height * width
+    labels = np.arange(flat_size, dtype=np.int64).reshape(count, height, width)
+    same_below = colored[:, :-1, :] & (colors[:, :-1, :] == colors[:, 1:, :])
+    same_right = colored[:, :, :-1] & (colors[:, :, :-1] == colors[:, :, 1:])
+    while True:
+        smallest = labels.copy()
+        np.minimum(smallest[:, :-1, :], np.where(same_below, labels[:, 1:, :], flat_size), out=smallest[:, :-1, :])
+        np.minimum(smallest[:, 1:, :], np.where(same_below, labels[:, :-1, :], flat_size), out=smallest[:, 1:, :])
+        np.minimum(smallest[:, :, :-1], np.where(same_right, labels[:, :, 1:], flat_size), out=smallest[:, :, :-1])
+        np.minimum(smallest[:, :, 1:], np.where(same_right, labels[:, :, :-1], flat_size), out=smallest[:, :, 1:])
+        smallest = smallest.reshape(-1)[smallest]
+        if np.array_equal(smallest, labels):
+            break
+        labels = smallest
+
+    # a color is split in a column if its tiles in the column have more than one label
+    for code in range(1, color_count + 1):
+        of_color = colors == code
+        lowest = np.where(of_color, labels, flat_size).min(axis=1)
+        highest = np.where(of_color, labels, -1).max(axis=1)
+        add(ERROR_COLUMN_SPLIT_COLOR, ((highest >= 0) & (lowest != highest)).any(axis=1))
+
+    # the number of components of every size per board and color, the components are counted at their labeled tile
+    flat_labels = labels.reshape(-1)
+    flat_colored = colored.reshape(-1)
+    sizes = np.bincount(flat_labels[flat_colored], minlength=flat_size)
+    roots = np.flatnonzero(flat_colored & (flat_labels == np.arange(flat_size)))
+    max_size = height * width
+    keys = ((roots // (height * width)) * (color_count + 1) + colors.reshape(-1)[roots]) * (max_size + 1) + sizes[roots]
+    per_size = np.bincount(keys, minlength=count * (color_count + 1) * (max_size + 1))
+    per_size = per_size.reshape(count, color_count + 1, max_size + 1)[:, 1:, :]
+
+    too_large = (per_size[:, :, MAX_COMPONENT_SIZE + 1:] > 0).any(axis=(1, 2))
+    add(ERROR_COMPONENT_TOO_LARGE, too_large)
+    add(ERROR_DUPLICATE_COMPONENT_SIZE, (per_size > 1).any(axis=(1, 2)))
+    add(ERROR_MISSING_COMPONENT_SIZES, (per_size[:, :, 1:MAX_COMPONENT_SIZE + 1] == 0).any(axis=(1, 2)))
+    add(ERROR_EXTRA_COMPONENT_SIZES, too_large)
+
+    return errors
 
 
 # --- generation functions ---
@@ -463,7 +1556,7 @@ def check_all(board, lazy=False):
 def fill_randomly(board: Board, rng: random.Random):
     for y in range(board.height):
         for x in range(board.width):
-            board.set_tile_at(x, y, Tile(rng.choice(Color.ref_list())))
+            board.set_color_at(x, y, rng.choice(Color.ref_list()))
 
 
 # fill a board a little smarter, but still randomly
@@ -480,7 +1573,7 @@ def fill_randomly_smarter(board: Board, rng: random.Random):
                 print("FATAL: Ran out of valid colors for tile {}, {} - returning prematurely.".format(x, y))
 
             c = rng.choice(possible_colors)
-            board.set_tile_at(x, y, Tile(c))
+            board.set_color_at(x, y, c)
             color_counts[c] += 1
             if color_counts[c] == 21:
                 available_colors.remove(c)
@@ -507,156 +1600,1019 @@ def create_random_fixed_color_interval_component_order(rng: random.Random) -> Li
     return components
 
 
+MAX_COMPONENT_SIZE = 6
+
+
+# every connected placement (polyomino) of the sizes 1 to max_size on a board, given as bitmasks
+# placements[size] holds all placements of a size in ascending order, by_anchor[bit][size] the ones containing bit and
+# by_lowest_bit[bit][size] the ones whose lowest bit is bit, so every placement is in exactly one of these lists
+class PlacementTable:
+    def __init__(self, geometry: BoardGeometry, max_size: int = MAX_COMPONENT_SIZE):
+        self.geometry = geometry
+        self.max_size = max_size
+        self.placements = [[] for _ in range(max_size + 1)]
+        self.by_anchor = [[[] for _ in range(max_size + 1)] for _ in range(geometry.size)]
+        self.by_lowest_bit = [[[] for _ in range(max_size + 1)] for _ in range(geometry.size)]
+        # the index of every placement in its list of by_lowest_bit
+        self.lowest_bit_index = {}
+
+        # grow every placement of the previous size by each of its free neighbours
+        current = set(1 << bit for bit in range(geometry.size))
+        for size in range(1, max_size + 1):
+            if size > 1:
+                grown = set()
+                for mask in current:
+                    for bit in iter_bits(geometry.dilate(mask) & ~mask):
+                        grown.add(mask | (1 << bit))
+                current = grown
+
+            self.placements[size] = sorted(current)
+            for mask in self.placements[size]:
+                for bit in iter_bits(mask):
+                    self.by_anchor[bit][size].append(mask)
+                placements = self.by_lowest_bit[lowest_bit(mask)][size]
+                self.lowest_bit_index[mask] = len(placements)
+                placements.append(mask)
+
+
+@lru_cache(maxsize=None)
+def get_placement_table(width=DEFAULT_BOARD_WIDTH, height=DEFAULT_BOARD_HEIGHT) -> PlacementTable:
+    return PlacementTable(get_geometry(width, height))
+
+
+# keeps track of the free space during generation and answers whether taking tiles out of it would split it
+class FreeSpaceOracle:
+    def __init__(self, geometry: BoardGeometry, free_mask: int):
+        self.geometry = geometry
+        self.free_mask = free_mask
+        # all answers rely on the free space being connected, if it is not, every check falls back to a full flood fill
+        self._connected = geometry.is_connected(free_mask)
+
+    def place(self, mask):
+        self.free_mask &= ~mask
+
+    def undo(self, mask):
+        self.free_mask |= mask
+
+    def splits(self, mask) -> bool:
+        geometry = self.geometry
+        remaining = self.free_mask & ~mask
+        if not remaining:
+            return False
+        if not self._connected:
+            return not geometry.is_connected(remaining)
+
+        # the dilation of BoardGeometry inlined, this is the innermost loop of the generator
+        h = geometry.height
+        not_first_row = geometry.not_first_row_mask
+        not_last_row = geometry.not_last_row_mask
+
+        # the free space is connected, so what remains is connected iff all free tiles bordering mask are connected
+        border = (((mask & not_first_row) >> 1) | ((mask & not_last_row) << 1) | (mask >> h) | (mask << h)) & remaining
+        reached = border & -border
+        if border == reached:
+            return False
+
+        # most of the time the border is connected in the close surroundings of mask
+        surroundings = geometry.dilate(geometry.dilate(border)) & remaining
+        while border & ~reached:
+            grown = (reached | ((reached & not_first_row) >> 1) | ((reached & not_last_row) << 1) | (reached >> h)
+                     | (reached << h)) & surroundings
+            if grown == reached:
+                break
+            reached = grown
+
+        # otherwise grow the reached part and the part of an unreached border tile in lockstep, if one of them stops
+        # growing before they meet, the free space is split (this ends as soon as the smaller part is filled)
+        while border & ~reached:
+            other = border & ~reached
+            other &= -other
+            while True:
+                grown_reached = (reached | ((reached & not_first_row) >> 1) | ((reached & not_last_row) << 1)
+                                 | (reached >> h) | (reached << h)) & remaining
+                grown_other = (other | ((other & not_first_row) >> 1) | ((other & not_last_row) << 1)
+                               | (other >> h) | (other << h)) & remaining
+                if grown_reached & grown_other:
+                    reached = grown_reached | grown_other
+                    break
+                if grown_reached == reached or grown_other == other:
+                    return True
+                reached = grown_reached
+                other = grown_other
+
+        return False
+
+
+# amount of colors in a mask of color indices (bit i is set if the color with index i is present)
+SEEN_COLOR_COUNTS = [popcount(seen) for seen in range(1 << len(COLOR_INDICES))]
+
+# marks a color in a column that was already on the board when the counters were created
+PREEXISTING_OWNER = -2
+
+
+# keeps the per column numbers the generator needs during generation, they are updated when a component is placed or
+# undone, so the capacity and the only-one-color-component-per-column checks don't have to scan the column
+class ColumnCounters:
+    def __init__(self, board: Board):
+        geometry = board.geometry
+        color_masks = board.color_masks
+        self.geometry = geometry
+        self.free = [popcount(board.free_mask & column_mask) for column_mask in geometry.column_masks]
+        self.tiles = [[popcount(mask & column_mask) for mask in color_masks] for column_mask in geometry.column_masks]
+        self.seen = [sum(1 << i for i, n in enumerate(tiles) if n) for tiles in self.tiles]
+        # index of the component (in the component order) that placed the first tile of a color in a column
+        self.owner = [[PREEXISTING_OWNER if n else -1 for n in tiles] for tiles in self.tiles]
+
+    def place(self, mask, color_index, comp_index):
+        h = self.geometry.height
+        for col in range(lowest_bit(mask) // h, (mask.bit_length() - 1) // h + 1):
+            n = popcount(mask & self.geometry.column_masks[col])
+            if not n:
+                continue
+            self.free[col] -= n
+            self.tiles[col][color_index] += n
+            self.seen[col] |= 1 << color_index
+            if self.owner[col][color_index] == -1:
+                self.owner[col][color_index] = comp_index
+
+    # placements are undone in reverse order, so the owner of a color is always the last to be undone in a column
+    def undo(self, mask, color_index, comp_index):
+        h = self.geometry.height
+        for col in range(lowest_bit(mask) // h, (mask.bit_length() - 1) // h + 1):
+            n = popcount(mask & self.geometry.column_masks[col])
+            if not n:
+                continue
+            self.free[col] += n
+            self.tiles[col][color_index] -= n
+            if not self.tiles[col][color_index]:
+                self.seen[col] &= ~(1 << color_index)
+            if self.owner[col][color_index] == comp_index:
+                self.owner[col][color_index] = -1
+
+    # same as _get_capacity_for_color_in_column
+    def capacity(self, col, color_index):
+        seen = self.seen[col]
+        capacity = self.free[col] - (len(COLOR_INDICES) - SEEN_COLOR_COUNTS[seen])
+        if not seen >> color_index & 1:
+            capacity += 1
+        return capacity
+
+    # cross-checks all counters against full scans of the board, raises an AssertionError on the first mismatch
+    def verify(self, board: Board):
+        for col, column_mask in enumerate(self.geometry.column_masks):
+            free = popcount(board.free_mask & column_mask)
+            assert self.free[col] == free, \
+                "Column {} has {} free tiles, but the counter says {}".format(col, free, self.free[col])
+
+            for color in Color.ref_list():
+                i = COLOR_INDICES[color]
+                tiles = popcount(board.get_color_mask(color) & column_mask)
+                assert self.tiles[col][i] == tiles, \
+                    "Column {} has {} tiles of color {}, but the counter says {}".format(col, tiles, color,
+                                                                                         self.tiles[col][i])
+                assert bool(self.seen[col] >> i & 1) == bool(tiles), \
+                    "Column {} has a wrong seen flag for color {}".format(col, color)
+                assert (self.owner[col][i] != -1) == bool(tiles), \
+                    "Column {} has a wrong component owner for color {}".format(col, color)
+
+                capacity = _get_capacity_for_color_in_column(board, color, col)
+                assert self.capacity(col, i) == capacity, \
+                    "Column {} has a capacity of {} for color {}, but the counters say {}".format(
+                        col, capacity, color, self.capacity(col, i))
+
+
+# how many placements the search makes between two checkpoints
+CHECKPOINT_INTERVAL = 256
+
+
+# where the sequential search is: the color masks and the component order it started with and the position of the
+# placed candidate on every level, replaying these placements leads to the same state
+class SearchPosition:
+    def __init__(self, color_masks, components, positions):
+        self.color_masks = color_masks
+        self.components = components
+        self.positions = positions
+
+
+TRACE_MAGIC = b'NMTRACE1'
+TRACE_PLACE = 0
+TRACE_UNDO = 1
+TRACE_RESTART = 2
+TRACE_EVENT_NAMES = ['place', 'undo', 'restart']
+
+# magic, width, height and number of color masks, the color masks of the board the trace starts with follow
+_TRACE_HEADER = struct.Struct('<8sBBB')
+# kind, level, component index, color index and size in one byte, lowest bit and index of the placement in the
+# PlacementTable
+_TRACE_EVENT = struct.Struct('<BBBBHH')
+TRACE_BUFFER_SIZE = 1 << 16
+
+
+# records every placement and undo of a generation as an 8 byte event in a binary file, the events are written in
+# blocks, so the trace has to be closed to write the last ones
+class GenerationTrace:
+
+    def __init__(self, filename: str, board: Board):
+        self.filename = filename
+        self.placement_table = get_placement_table(board.width, board.height)
+        self.events = 0
+        self.buffer = bytearray()
+
+        self.file = open(filename, 'wb')
+        self.file.write(_TRACE_HEADER.pack(TRACE_MAGIC, board.width, board.height, len(board.color_masks)))
+        mask_bytes = (board.geometry.size + 7) // 8
+        for mask in board.color_masks:
+            self.file.write(mask.to_bytes(mask_bytes, 'little'))
+
+    def place(self, comp_index, color_index, mask, level):
+        self._add(TRACE_PLACE, level, comp_index, color_index, mask)
+
+    def undo(self, comp_index, color_index, mask, level):
+        self._add(TRACE_UNDO, level, comp_index, color_index, mask)
+
+    def restart(self):
+        self._add(TRACE_RESTART, 0, 0, 0, 0)
+
+    def close(self):
+        self.file.write(self.buffer)
+        self.file.close()
+
+    def _add(self, kind, level, comp_index, color_index, mask):
+        if mask:
+            bit = lowest_bit(mask)
+            self.buffer += _TRACE_EVENT.pack(kind, level, comp_index, color_index << 4 | popcount(mask), bit,
+                                             self.placement_table.lowest_bit_index[mask])
+        else:
+            self.buffer += _TRACE_EVENT.pack(kind, level, comp_index, 0, 0, 0)
+        self.events += 1
+
+        if len(self.buffer) >= TRACE_BUFFER_SIZE:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+
+# yields the board, changed in place, with every event of a trace as (kind, level, component index, color, mask), the
+# counters of the state follow the events
+def replay_trace(filename: str, state: BacktrackingState = None):
+    if state is None:
+        state = BacktrackingState()
+
+    with open(filename, 'rb') as f:
+        (magic, width, height, mask_count) = _TRACE_HEADER.unpack(f.read(_TRACE_HEADER.size))
+        if magic != TRACE_MAGIC:
+            raise ValueError("'{}' is not a generation trace".format(filename))
+
+        board = Board(width, height)
+        mask_bytes = (board.geometry.size + 7) // 8
+        initial_color_masks = [int.from_bytes(f.read(mask_bytes), 'little') for _ in range(mask_count)]
+        board.color_masks[:] = initial_color_masks
+        placement_table = get_placement_table(width, height)
+
+        while True:
+            block = f.read(TRACE_BUFFER_SIZE)
+            if len(block) < _TRACE_EVENT.size:
+                return
+
+            block = block[:len(block) - len(block) % _TRACE_EVENT.size]
+            for (kind, level, comp_index, kind_byte, bit, index) in _TRACE_EVENT.iter_unpack(block):
+                state.inc_steps()
+                if kind == TRACE_RESTART:
+                    board.color_masks[:] = initial_color_masks
+                    state.inc_attempts()
+                    state.level = 0
+                    yield board, (kind, 0, comp_index, None, 0)
+                    continue
+
+                color_index = kind_byte >> 4
+                mask = placement_table.by_lowest_bit[bit][kind_byte & 0xf][index]
+                if kind == TRACE_PLACE:
+                    board.color_masks[color_index] |= mask
+                    state.inc_placements()
+                    state.level = level + 1
+                else:
+                    board.color_masks[color_index] &= ~mask
+                    state.level = level
+                yield board, (kind, level, comp_index, COLORS_BY_INDEX[color_index], mask)
+
+
+class _SmartFillContext:
+    def __init__(self, board, state, components, free_space_limit, step_writer, no_line6,
+                 only_one_comp_per_col, debug_counters=False, forward_checking=True, most_constrained_first=False,
+                 max_placements=None):
+        self.board = board
+        self.state = state
+        self.components = components
+        self.free_space_limit = free_space_limit
+        self.step_writer = step_writer
+        self.no_line6 = no_line6
+        self.only_one_comp_per_col = only_one_comp_per_col
+        self.placement_table = get_placement_table(board.width, board.height)
+        self.free_space = FreeSpaceOracle(board.geometry, board.free_mask)
+        self.column_counters = ColumnCounters(board)
+        self.debug_counters = debug_counters
+        self.forward_checking = forward_checking
+        # with this the component of every level is chosen during the search and moved to its index in components
+        self.most_constrained_first = most_constrained_first
+        # the last candidate count of every (color, size) pair, counted completely or up to where it was given up
+        self.candidate_counts = {}
+        # the search gives up when the placements of the state reach this number
+        self.max_placements = max_placements
+
+        # the last legal placement found for every (color index, size) pair, it is checked first during forward checking
+        self.witnesses = {}
+
+        # the board and the component order at the start of the search, for checkpoints
+        self.initial_color_masks = list(board.color_masks)
+        self.initial_components = list(components)
+        # called with the SearchPosition every CHECKPOINT_INTERVAL placements
+        self.checkpoint = None
+        self.next_checkpoint = 0
+        # records every placement and undo, if set
+        self.trace = None
+
+
+# fills the board by backtracking, with most_constrained_first the components are reordered in place to the order they
+# were placed in, the search gives up at max_placements and continues from a SearchPosition given as resume_from
 def fill_smart(board, state, components, free_space_limit: int = 32, write_pngs: bool = False, no_line6: bool = True,
-               only_one_comp_per_col: bool = True) -> bool:
-    folder_for_steps = "gen-board-steps-{}".format(datetime.datetime.now())
-    if write_pngs:
+               only_one_comp_per_col: bool = True, debug_counters: bool = False, forward_checking: bool = True,
+               most_constrained_first: bool = False, max_placements: int = None, checkpoint=None,
+               resume_from: 'SearchPosition' = None, step_writer: StepImageWriter = None,
+               trace: 'GenerationTrace' = None) -> bool:
+    own_step_writer = False
+    if write_pngs and step_writer is None:
         if png is None:
             print("You don't have the PyPNG module installed. To write out steps of the generation process this module "
                   "is required.", file=sys.stderr)
-            write_pngs = False
         else:
-            os.mkdir(folder_for_steps)
-
-    return _fill_smart_backtrack(board, components, 0, state, free_space_limit, write_pngs, folder_for_steps, no_line6,
-                                 only_one_comp_per_col)
-
-
-def _fill_smart_backtrack(board, components, comp_index, state: BacktrackingState, free_space_limit: int, write_pngs,
-                          folder_for_steps, no_line6: bool, only_one_comp_per_col: bool):
-    if comp_index == 5 * 6:
-        return True  # done
-
-    component_color = components[comp_index][0]
-    component_size = components[comp_index][1]
-
-    free_space = _get_free_tiles(board)
-    for (fx, fy) in free_space[:free_space_limit]:
-        free_space_component = _get_connected_coords(free_space, (fx, fy))[0]
-        combinations = get_all_graphs_of_size(free_space_component, (fx, fy), component_size)
-        for combi in combinations:
-            if _combination_is_placeable(board, combi, component_color, free_space, no_line6, only_one_comp_per_col):
-                # place combination
-                for (x, y) in combi:
-                    board.set_tile_at(x, y, Tile(component_color))
-                state.inc_placements()
-
-                # use with caution: write state to image file
-                if write_pngs:
-                    write_board_to_png(board, '{}/try{:0>7}-lvl{:0>2}.png'.format(folder_for_steps, state.placements,
-                                                                                  state.level))
-
-                # continue with next component
-                state.inc_level()
-                if _fill_smart_backtrack(board, components, comp_index + 1, state, free_space_limit, write_pngs,
-                                         folder_for_steps, no_line6, only_one_comp_per_col):
-                    return True
-                else:
-                    for (x, y) in combi:
-                        board.set_tile_at(x, y, Tile())
+            step_writer = StepImageWriter("gen-board-steps-{}".format(datetime.datetime.now()))
+            own_step_writer = True
+
+    if resume_from is not None:
+        board.color_masks[:] = resume_from.color_masks
+        components[:] = resume_from.components
+
+    ctx = _SmartFillContext(board, state, components, free_space_limit, step_writer, no_line6,
+                            only_one_comp_per_col, debug_counters, forward_checking, most_constrained_first,
+                            max_placements)
+    ctx.checkpoint = checkpoint
+    ctx.next_checkpoint = state.placements + CHECKPOINT_INTERVAL
+    ctx.trace = trace
+    # the board and the component order at the start of the search, the positions lead to where it stopped
+    positions = resume_from.positions if resume_from is not None else ()
+    try:
+        for _ in _iter_solutions(ctx, positions):
+            return True
+        return False
+    finally:
+        if own_step_writer:
+            step_writer.close()
+
+
+# yields every solution of the smart fill as a new board with stars that passes check_all, the given components are not
+# changed, no board comes twice: a board splits into its components in one way and the component of every level only
+# depends on the state, so every state of the search is reached by one path
+def iter_boards(components, rng: random.Random, width: int = DEFAULT_BOARD_WIDTH, height: int = DEFAULT_BOARD_HEIGHT,
+                state: BacktrackingState = None, free_space_limit: int = 32, no_line6: bool = True,
+                only_one_comp_per_col: bool = True, forward_checking: bool = True,
+                most_constrained_first: bool = False, max_placements: int = None,
+                trace: 'GenerationTrace' = None):
+    board = Board(width, height)
+    if state is None:
+        state = BacktrackingState()
+
+    ctx = _SmartFillContext(board, state, list(components), free_space_limit, None, no_line6,
+                            only_one_comp_per_col, forward_checking=forward_checking,
+                            most_constrained_first=most_constrained_first, max_placements=max_placements)
+    ctx.trace = trace
+    for _ in _iter_solutions(ctx):
+        result = Board(width, height)
+        result.color_masks[:] = board.color_masks
+        if distribute_stars(result, rng, assume_no_stars=True):
+            continue
+        if not check_all(result, lazy=True):
+            yield result
 
-    state.dec_level()
-    return False
 
+# the backtracking search with an explicit stack, every frame holds the component index, the candidates, the position of
+# the placed candidate of a level and the index the component of the level came from, the search continues from the
+# given positions if there are any
+# yields whenever the board is filled with all components and continues with the next candidate when it is resumed
+def _iter_solutions(ctx: _SmartFillContext, positions=()):
+    if len(ctx.components) == 0:
+        yield  # done
+        return
 
-def _get_free_tiles(board):
-    free_tiles = []
+    board = ctx.board
+    state = ctx.state
+
+    (candidates, chosen_index) = _get_level_candidates(ctx, 0)
+    frames = [[0, candidates, -1, chosen_index]]
+    for position in positions:
+        frame = frames[-1]
+        frame[2] = position
+        state.level = len(frames) - 1  # the level the placement was made on, for the trace
+        _place_combination(ctx, frame[0], frame[1][position])
+        (candidates, chosen_index) = _get_level_candidates(ctx, frame[0] + 1)
+        frames.append([frame[0] + 1, candidates, -1, chosen_index])
+    if positions:
+        state.level = len(frames) - 1
+
+    while frames:
+        frame = frames[-1]
+        comp_index, candidates, position, chosen_index = frame
+        if position >= 0:
+            _undo_combination(ctx, comp_index, candidates[position])
+
+        position += 1
+        frame[2] = position
+        if position >= len(candidates):
+            _restore_component_order(ctx, comp_index, chosen_index)
+            frames.pop()
+            state.dec_level()
+            continue
 
-    for x in range(15):
-        for y in range(7):
-            if board.get_tile_at(x, y).color == Color.UNINITIALIZED:
-                free_tiles.append((x, y))
+        if ctx.max_placements is not None and state.placements >= ctx.max_placements:
+            return
+
+        _place_combination(ctx, comp_index, candidates[position])
+        state.inc_placements()
+
+        if not _forward_check(ctx, comp_index + 1):
+            continue  # the placement is undone with the next candidate
+
+        # hand the state over to the writer of the step images
+        if ctx.step_writer is not None:
+            ctx.step_writer.offer(board, state.placements, state.level)
+
+        # continue with next component
+        state.inc_level()
+        if comp_index + 1 == len(ctx.components):
+            yield
+            state.dec_level()
+            continue  # the placement is undone with the next candidate
+
+        if ctx.checkpoint is not None and state.placements >= ctx.next_checkpoint:
+            ctx.next_checkpoint = state.placements + CHECKPOINT_INTERVAL
+            ctx.checkpoint(SearchPosition(ctx.initial_color_masks, ctx.initial_components,
+                                          [frame[2] for frame in frames]))
+
+        (candidates, chosen_index) = _get_level_candidates(ctx, comp_index + 1)
+        frames.append([comp_index + 1, candidates, -1, chosen_index])
+
+
+# yields the masks of all placements of a component that satisfy the constraints on the current board, in the order the
+# search tries them, the board has to be the same whenever the next candidate is requested
+def _iter_candidates(ctx: _SmartFillContext, comp_index):
+    (color, size) = ctx.components[comp_index]
+    anchors = list(iter_bits(ctx.free_space.free_mask))[:ctx.free_space_limit]
+    return _iter_candidates_at(ctx, COLOR_INDICES[color], size, anchors)
+
+
+# yields every placement once, at the first of the anchors it contains, if the anchors are the lowest free tiles in
+# ascending order this is the lowest bit of the placement (every tile below it is taken), so the placements can be taken
+# from by_lowest_bit, otherwise the placements seen at earlier anchors have to be collected in seen
+def _iter_candidates_at(ctx: _SmartFillContext, color_index, size, anchors, splits_cache=None, seen=None):
+    board = ctx.board
+    free_space = ctx.free_space
+    column_counters = ctx.column_counters
+    placements = ctx.placement_table.by_lowest_bit if seen is None else ctx.placement_table.by_anchor
+
+    # the tiles the color can't take for sure: taken tiles, neighbours of the color and the columns that can't take
+    # another component or tile of it, the placements left are checked completely
+    geometry = board.geometry
+    free_mask = free_space.free_mask
+    blocked = ~free_mask | geometry.dilate(board.color_masks[color_index])
+    for col in range(board.width):
+        if ctx.only_one_comp_per_col and column_counters.owner[col][color_index] != -1 or \
+                column_counters.capacity(col, color_index) < 1:
+            blocked |= geometry.column_masks[col]
 
-    return free_tiles
+    for anchor in anchors:
+        for combi_mask in placements[anchor][size]:
+            if combi_mask & blocked:
+                continue
 
+            if seen is not None:
+                if combi_mask in seen:
+                    continue
+                seen.add(combi_mask)
 
-def _combination_is_placeable(board, combination, color, free_space, no_line6: bool, only_one_comp_per_col: bool):
-    result = True
+            if not _combination_is_placeable(board, column_counters, combi_mask, color_index, ctx.no_line6,
+                                             ctx.only_one_comp_per_col):
+                continue
 
-    # line6-constraint
-    # to avoid having 6 tiles of the same color in a row this constraint is applied
-    if no_line6 and len(combination) == 6:
-        _, first_y = list(combination)[0]
-        all_the_same = True
+            # check if combination separates free space into multiple components
+            if splits_cache is None:
+                if free_space.splits(combi_mask):
+                    continue
+            else:
+                if combi_mask not in splits_cache:
+                    splits_cache[combi_mask] = free_space.splits(combi_mask)
+                if splits_cache[combi_mask]:
+                    continue
+
+            yield combi_mask
+
+
+# the free tiles with the fewest free neighbours first, ties are broken by the column-major order
+def _get_most_constrained_anchors(ctx: _SmartFillContext):
+    free_mask = ctx.free_space.free_mask
+    neighbour_masks = ctx.board.geometry.neighbour_masks
+    anchors = sorted(iter_bits(free_mask), key=lambda bit: (popcount(neighbour_masks[bit] & free_mask), bit))
+    return anchors[:ctx.free_space_limit]
+
+
+# finds the remaining component with the fewest candidates and moves it to comp_index in the components, the relative
+# order of the others stays the same, returns its candidates and the index it came from
+# a candidate is counted once for every anchor it contains, the way they were counted when every anchor yielded its own
+# copy of it, so the same component is chosen
+# the components are counted in the order of their last counts, so a small count is found early and the counting of
+# the others is given up as soon as they can't beat it, ties still go to the earlier component
+def _choose_most_constrained_component(ctx: _SmartFillContext, comp_index):
+    components = ctx.components
+    counts = ctx.candidate_counts
+    anchors = _get_most_constrained_anchors(ctx)
+    anchor_mask = sum(1 << anchor for anchor in anchors)
+    splits_cache = {}  # the connectivity check does not depend on the color
+
+    # the first index of every (color, size) pair
+    first_indices = {}
+    for i in range(comp_index, len(components)):
+        first_indices.setdefault(components[i], i)
+
+    best = None  # (candidates, index, count)
+    for (kind, i) in sorted(first_indices.items(), key=lambda item: (counts.get(item[0], 0), item[1])):
+        if best is not None and best[2] == 0 and i > best[1]:
+            continue
 
-        for (_, y) in combination:
-            if first_y != y:
-                all_the_same = False
+        (color, size) = kind
+        candidates = []
+        count = 0
+        for combi_mask in _iter_candidates_at(ctx, COLOR_INDICES[color], size, anchors, splits_cache, set()):
+            count += popcount(combi_mask & anchor_mask)
+            if best is not None and (count > best[2] or count == best[2] and i > best[1]):
                 break
+            candidates.append(combi_mask)
+        else:
+            best = (candidates, i, count)
+        counts[kind] = count
+
+    (candidates, chosen_index, _) = best
+    components.insert(comp_index, components.pop(chosen_index))
+    return candidates, chosen_index
+
+
+def _restore_component_order(ctx: _SmartFillContext, comp_index, chosen_index):
+    if chosen_index != comp_index:
+        ctx.components.insert(chosen_index, ctx.components.pop(comp_index))
+
+
+# the candidates of a level as a list and the index its component came from
+# the component of a level only depends on the placements before it and a board splits into its components in one way,
+# so every state of the search is reached by one path and a table of failed states would never be hit
+def _get_level_candidates(ctx: _SmartFillContext, comp_index):
+    if ctx.most_constrained_first:
+        return _choose_most_constrained_component(ctx, comp_index)
+    return list(_iter_candidates(ctx, comp_index)), comp_index
+
+
+def _place_combination(ctx: _SmartFillContext, comp_index, combi_mask):
+    color_index = COLOR_INDICES[ctx.components[comp_index][0]]
+    ctx.board.color_masks[color_index] |= combi_mask
+    ctx.free_space.place(combi_mask)
+    ctx.column_counters.place(combi_mask, color_index, comp_index)
+    if ctx.trace is not None:
+        ctx.trace.place(comp_index, color_index, combi_mask, ctx.state.level)
+
+    if ctx.debug_counters:
+        ctx.column_counters.verify(ctx.board)
+
+
+def _undo_combination(ctx: _SmartFillContext, comp_index, combi_mask):
+    color_index = COLOR_INDICES[ctx.components[comp_index][0]]
+    ctx.board.color_masks[color_index] &= ~combi_mask
+    ctx.free_space.undo(combi_mask)
+    ctx.column_counters.undo(combi_mask, color_index, comp_index)
+    if ctx.trace is not None:
+        ctx.trace.undo(comp_index, color_index, combi_mask, ctx.state.level)
+
+    if ctx.debug_counters:
+        ctx.column_counters.verify(ctx.board)
+
+
+# checks if the remaining components can still be placed after a placement, this catches dead branches right away
+# instead of many levels below, only conditions that hold for every completion are checked, so no solution is lost
+def _forward_check(ctx: _SmartFillContext, comp_index) -> bool:
+    if not ctx.forward_checking or comp_index == len(ctx.components):
+        return True
+
+    board = ctx.board
+    state = ctx.state
+    geometry = board.geometry
+    column_counters = ctx.column_counters
+    free_mask = ctx.free_space.free_mask
+
+    # the tiles per color and the distinct (color index, size) pairs of the remaining components
+    remaining_tiles = [0 for _ in range(len(COLOR_INDICES))]
+    remaining_kinds = []
+    for (color, size) in ctx.components[comp_index:]:
+        kind = (COLOR_INDICES[color], size)
+        remaining_tiles[kind[0]] += size
+        if kind not in remaining_kinds:
+            remaining_kinds.append(kind)
+
+    free_tiles = popcount(free_mask)
+    remaining = sum(remaining_tiles)
+    if remaining > free_tiles:
+        state.inc_prunes(PRUNE_FREE_SPACE)
+        return False
+    # if the remaining components fill the board, every column needs all colors and every free tile a color
+    fills_board = remaining == free_tiles
+
+    # for a full board there have to be tiles left for the colors every column is missing (one per column and color at
+    # least), that every column still has room for them is already kept by the capacity check of every placement
+    if fills_board:
+        missing_columns = [0 for _ in range(len(COLOR_INDICES))]
+        for col in range(board.width):
+            seen = column_counters.seen[col]
+            for i in range(len(COLOR_INDICES)):
+                if not seen >> i & 1:
+                    missing_columns[i] += 1
+        for i in range(len(COLOR_INDICES)):
+            if missing_columns[i] > remaining_tiles[i]:
+                state.inc_prunes(PRUNE_COLUMNS)
+                return False
 
-        if all_the_same:
+    # every free tile has to be able to take some color of the remaining components
+    if fills_board:
+        color_masks = board.color_masks
+        allowed = 0
+        for i in range(len(COLOR_INDICES)):
+            if not remaining_tiles[i]:
+                continue
+            allowed_for_color = free_mask & ~geometry.dilate(color_masks[i])
+            if ctx.only_one_comp_per_col:
+                for col in range(board.width):
+                    if column_counters.seen[col] >> i & 1:
+                        allowed_for_color &= ~geometry.column_masks[col]
+            allowed |= allowed_for_color
+        if free_mask & ~allowed:
+            state.inc_prunes(PRUNE_FREE_SPACE)
             return False
 
-    for (x, y) in combination:
-        if _tile_color_is_placeable_at(board, color, x, y, only_one_comp_per_col, True, combination):
-            board.set_tile_at(x, y, Tile(color))
-        else:
-            result = False
-            break
+    # every remaining component needs at least one legal placement, placements only get fewer as the board fills, so
+    # this ignores the free space limit and the free space connectivity
+    for kind in remaining_kinds:
+        if not _has_legal_placement(ctx, kind, free_mask):
+            state.inc_prunes(PRUNE_COMPONENTS)
+            return False
 
-    if result:
-        # check if combination separates free space into multiple components
-        for coord in combination:
-            if coord in free_space:
-                free_space.remove(coord)
+    return True
 
-        if len(_get_connected_coords(free_space)) > 1:
-            result = False
 
-    # remove combination
-    for (x, y) in combination:
-        board.set_tile_at(x, y, Tile())
+def _has_legal_placement(ctx: _SmartFillContext, kind, free_mask) -> bool:
+    (color_index, size) = kind
+    board = ctx.board
+    column_counters = ctx.column_counters
 
-    return result
+    witness = ctx.witnesses.get(kind)
+    if witness is not None and not witness & ~free_mask and \
+            _combination_is_placeable(board, column_counters, witness, color_index, ctx.no_line6,
+                                      ctx.only_one_comp_per_col):
+        return True
+
+    by_lowest_bit = ctx.placement_table.by_lowest_bit
+    for anchor in iter_bits(free_mask):
+        for combi_mask in by_lowest_bit[anchor][size]:
+            if combi_mask & ~free_mask:
+                continue
+            if _combination_is_placeable(board, column_counters, combi_mask, color_index, ctx.no_line6,
+                                         ctx.only_one_comp_per_col):
+                ctx.witnesses[kind] = combi_mask
+                return True
 
+    return False
 
-def _tile_color_is_placeable_at(board, color, x, y, only_one_comp_per_col: bool, check_neighbours=False,
-                                do_not_check_these_coords=None):
-    tile = board.get_tile_at(x, y)
 
-    # fail if already initialized
-    if tile.color != Color.UNINITIALIZED:
-        return False
+# --- restarts ---
 
-    if do_not_check_these_coords is None:
-        do_not_check_these_coords = set()
+RESTART_POLICIES = ['none', 'luby', 'geometric']
 
-    # fail if a neighbour already has this color
-    if check_neighbours:
-        for (ox, oy) in OFFSETS:
-            xox = x + ox
-            yoy = y + oy
-            if (xox, yoy) in do_not_check_these_coords:
+
+# the i-th element (starting at 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+def luby(i: int) -> int:
+    while True:
+        k = i.bit_length()
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+
+
+# yields the placement budgets of the attempts of a restart policy, the only attempt of 'none' is unbounded (None)
+def iter_restart_budgets(policy: str, base_budget: int, factor: float = 2.0):
+    if policy == 'none':
+        yield None
+    elif policy == 'luby':
+        i = 1
+        while True:
+            yield base_budget * luby(i)
+            i += 1
+    elif policy == 'geometric':
+        budget = float(base_budget)
+        while True:
+            yield int(budget)
+            budget *= factor
+    else:
+        raise ValueError("Unknown restart policy '{}'".format(policy))
+
+
+# --- parallel generation ---
+
+# the search tree is split into subtrees, a subtree is given by the color masks of the board after the placements that
+# lead to it, the index of the next component, the component order and its path (the positions of these placements in
+# the candidate lists of their levels), the sequential search visits the subtrees in the order of their paths
+class SearchTask:
+    def __init__(self, path, color_masks, comp_index, components):
+        self.path = path
+        self.color_masks = color_masks
+        self.comp_index = comp_index
+        self.components = components
+
+    def __lt__(self, other):
+        return self.path < other.path
+
+
+# how many placements a worker makes between two checks for idle workers
+STEAL_CHECK_INTERVAL = 256
+# how many placements a worker makes between two progress reports
+PROGRESS_INTERVAL = 4096
+
+
+# the search of fill_smart split over processes, the board is filled with the solution the sequential search finds
+# first, or with any_solution with the first one any process finds
+def fill_smart_parallel(board, state, components, processes: int = None, split_depth: int = 1,
+                        any_solution: bool = False, free_space_limit: int = 32, no_line6: bool = True,
+                        only_one_comp_per_col: bool = True, forward_checking: bool = True,
+                        most_constrained_first: bool = False) -> bool:
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    settings = (board.width, board.height, free_space_limit, no_line6, only_one_comp_per_col, forward_checking,
+                most_constrained_first)
+    ctx = _SmartFillContext(board, BacktrackingState(), components, free_space_limit, None, no_line6,
+                            only_one_comp_per_col, forward_checking=forward_checking,
+                            most_constrained_first=most_constrained_first)
+
+    pending = list(_split_search_tree(ctx, 0, (), split_depth))
+    heapq.heapify(pending)
+    _add_counters(state, ctx.state)
+
+    result_queue = multiprocessing.Queue()
+    task_queues = [multiprocessing.Queue() for _ in range(processes)]
+    steal_requested = multiprocessing.Event()
+    workers = [multiprocessing.Process(target=_parallel_search_worker,
+                                       args=(i, settings, task_queues[i], result_queue, steal_requested), daemon=True)
+               for i in range(processes)]
+    for worker in workers:
+        worker.start()
+
+    running = [None for _ in range(processes)]  # path of the task every worker is working on
+    idle = []
+    best = None  # the solution with the lowest path so far as (path, (color masks, component order))
+    try:
+        while True:
+            message = result_queue.get()
+            kind, worker_id = message[0], message[1]
+            if kind == 'progress':
+                _add_counters(state, message[2])
                 continue
+            elif kind == 'donate':
+                for task in message[2]:
+                    heapq.heappush(pending, task)
+            elif kind == 'done':
+                _, _, path, solution, counters = message
+                _add_counters(state, counters)
+                running[worker_id] = None
+                idle.append(worker_id)
+                if solution is not None and (best is None or path < best[0]):
+                    best = (path, solution)
+            elif kind == 'idle':
+                idle.append(worker_id)
+
+            if best is not None:
+                if any_solution:
+                    break
+
+                # subtrees behind the best solution are not needed anymore
+                pending = [task for task in pending if task.path < best[0]]
+                heapq.heapify(pending)
+                if all(path is None or path > best[0] for path in running) and not pending:
+                    break
+
+            while idle and pending:
+                worker_id = idle.pop()
+                task = heapq.heappop(pending)
+                running[worker_id] = task.path
+                task_queues[worker_id].put(task)
+
+            if all(path is None for path in running):
+                break  # no work left
+
+            if idle:
+                steal_requested.set()
+            else:
+                steal_requested.clear()
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+
+    if best is None:
+        return False
+
+    board.color_masks[:] = best[1][0]
+    components[:] = best[1][1]
+    state.level = len(components)
+    return True
+
+
+# yields the tasks of all subtrees depth levels below comp_index in the order of the sequential search
+def _split_search_tree(ctx: _SmartFillContext, comp_index, path, depth):
+    if depth == 0 or comp_index == len(ctx.components):
+        yield SearchTask(path, list(ctx.board.color_masks), comp_index, list(ctx.components))
+        return
+
+    (candidates, chosen_index) = _get_level_candidates(ctx, comp_index)
+    for position, combi_mask in enumerate(candidates):
+        _place_combination(ctx, comp_index, combi_mask)
+        ctx.state.inc_placements()
+        if _forward_check(ctx, comp_index + 1):
+            yield from _split_search_tree(ctx, comp_index + 1, path + (position,), depth - 1)
+        _undo_combination(ctx, comp_index, combi_mask)
+    _restore_component_order(ctx, comp_index, chosen_index)
+
+
+def _parallel_search_worker(worker_id, settings, task_queue, result_queue, steal_requested):
+    # the main process is the one to handle interrupts
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    (width, height, free_space_limit, no_line6, only_one_comp_per_col, forward_checking,
+     most_constrained_first) = settings
+    result_queue.put(('idle', worker_id))
+    while True:
+        task = task_queue.get()
+        board = Board(width, height)
+        board.color_masks[:] = task.color_masks
+        state = BacktrackingState()
+        ctx = _SmartFillContext(board, state, task.components, free_space_limit, None, no_line6,
+                                only_one_comp_per_col, forward_checking=forward_checking,
+                                most_constrained_first=most_constrained_first)
+
+        # the counters are sent as the difference to the last report
+        reported = BacktrackingState()
+
+        def counters_since_report():
+            counters = BacktrackingState()
+            counters.placements = state.placements - reported.placements
+            for reason in PRUNE_REASONS:
+                counters.prunes[reason] = state.prunes[reason] - reported.prunes[reason]
+            _add_counters(reported, counters)
+            return counters
+
+        def report_progress():
+            result_queue.put(('progress', worker_id, counters_since_report()))
+
+        def donate(tasks):
+            result_queue.put(('donate', worker_id, tasks))
+            steal_requested.clear()
+
+        solution = None
+        if _search_subtree(ctx, task, steal_requested, donate, report_progress):
+            solution = (list(board.color_masks), list(ctx.components))
+        result_queue.put(('done', worker_id, task.path, solution, counters_since_report()))
+
+
+def _add_counters(state: BacktrackingState, counters: BacktrackingState):
+    state.placements += counters.placements
+    for reason in PRUNE_REASONS:
+        state.prunes[reason] += counters.prunes[reason]
+
+
+# the same search as _iter_solutions, but the untried placements of a level can be handed over to other processes
+def _search_subtree(ctx: _SmartFillContext, task: SearchTask, steal_requested, donate, report_progress) -> bool:
+    if task.comp_index == len(ctx.components):
+        return True
+
+    state = ctx.state
+    # every frame holds the component index, the candidates, the position of the placed candidate of a level and the
+    # index the component of the level came from
+    (candidates, chosen_index) = _get_level_candidates(ctx, task.comp_index)
+    frames = [[task.comp_index, candidates, -1, chosen_index]]
+    while frames:
+        frame = frames[-1]
+        comp_index, candidates, position, chosen_index = frame
+        if position >= 0:
+            _undo_combination(ctx, comp_index, candidates[position])
+
+        position += 1
+        frame[2] = position
+        if position >= len(candidates):
+            _restore_component_order(ctx, comp_index, chosen_index)
+            frames.pop()
+            continue
+
+        _place_combination(ctx, comp_index, candidates[position])
+        state.inc_placements()
+        if comp_index + 1 == len(ctx.components):
+            return True
+        if not _forward_check(ctx, comp_index + 1):
+            continue  # the placement is undone with the next candidate
+
+        if state.placements % STEAL_CHECK_INTERVAL == 0 and steal_requested.is_set():
+            tasks = _split_off_untried(ctx, task.path, frames)
+            if tasks:
+                donate(tasks)
+        if state.placements % PROGRESS_INTERVAL == 0:
+            report_progress()
+
+        (next_candidates, next_chosen_index) = _get_level_candidates(ctx, comp_index + 1)
+        frames.append([comp_index + 1, next_candidates, -1, next_chosen_index])
+
+    return False
 
-            tile = board.get_tile_at(xox, yoy)
-            if tile and tile.color == color:
+
+# removes the untried candidates of the lowest level that has some from the frames and returns them as tasks
+def _split_off_untried(ctx: _SmartFillContext, path, frames):
+    for level, (comp_index, candidates, position, _) in enumerate(frames):
+        if position + 1 >= len(candidates):
+            continue
+
+        # the color masks before the placement of this level and the component order after its component was chosen
+        color_masks = list(ctx.board.color_masks)
+        for (deeper_index, deeper_candidates, deeper_position, _) in frames[level:]:
+            if deeper_position >= 0:
+                color_masks[COLOR_INDICES[ctx.components[deeper_index][0]]] &= ~deeper_candidates[deeper_position]
+        components = list(ctx.components)
+        for (deeper_index, _, _, deeper_chosen_index) in reversed(frames[level + 1:]):
+            if deeper_chosen_index != deeper_index:
+                components.insert(deeper_chosen_index, components.pop(deeper_index))
+
+        prefix = path + tuple(frame[2] for frame in frames[:level])
+        color_index = COLOR_INDICES[ctx.components[comp_index][0]]
+        tasks = []
+        for i in range(position + 1, len(candidates)):
+            task_masks = list(color_masks)
+            task_masks[color_index] |= candidates[i]
+            tasks.append(SearchTask(prefix + (i,), task_masks, comp_index + 1, components))
+
+        del candidates[position + 1:]
+        return tasks
+
+    return []
+
+
+# checks the tiles of a combination (given as mask of free tiles) against the constraints for the given color
+def _combination_is_placeable(board, column_counters: ColumnCounters, combination, color_index, no_line6: bool,
+                              only_one_comp_per_col: bool):
+    geometry = board.geometry
+    color_mask = board.color_masks[color_index]
+    size = popcount(combination)
+
+    # line6-constraint
+    # to avoid having 6 tiles of the same color in a row this constraint is applied
+    if no_line6 and size == 6:
+        for row_mask in geometry.row_masks:
+            if combination & row_mask == combination:
                 return False
 
-    # fail if there is not enough capacity in the column for this color
-    if _get_capacity_for_color_in_column(board, color, x) < 1:
+    # fail if a neighbour already has this color
+    if geometry.dilate(combination) & color_mask:
         return False
 
-    # only-one-color-component-per-column-constraint
-    # fail if there is already a tile of this color in this column which is not of the current component
-    if only_one_comp_per_col:
-        for col in range(7):
-            tile = board.get_tile_at(x, col)
-            if tile and tile.color == color and not (x, col) in do_not_check_these_coords:
-                return False
+    h = geometry.height
+    for col in range(lowest_bit(combination) // h, (combination.bit_length() - 1) // h + 1):
+        in_column = combination & geometry.column_masks[col]
+        if not in_column:
+            continue
+
+        # only-one-color-component-per-column-constraint
+        # fail if there is already a tile of this color in this column which is not of the current component
+        if only_one_comp_per_col and column_counters.owner[col][color_index] != -1:
+            return False
+
+        # fail if there is not enough capacity in the column for this color, the free tiles left in the column after
+        # the placement have to be enough for the colors still missing in the column
+        if popcount(in_column) > column_counters.capacity(col, color_index):
+            return False
 
     return True
 
 
 def _get_capacity_for_color_in_column(board, color, col):
-    colors_seen = set()
-    free_in_col = 0
-    for row in range(board.height):
-        current_color = board.get_tile_at(col, row).color
-        if current_color == Color.UNINITIALIZED:
-            free_in_col += 1
-        else:
-            colors_seen.add(current_color)
+    column_mask = board.geometry.column_masks[col]
+    free_in_col = popcount(board.free_mask & column_mask)
+    colors_seen = set(c for c in Color.ref_list() if board.get_color_mask(c) & column_mask)
 
     amount_of_missing_colors = len(Color.ref_set()) - len(colors_seen)
     capacity = free_in_col - amount_of_missing_colors
@@ -709,90 +2665,113 @@ def _get_connected_coords(coordinates, anchor=None):
     return components
 
 
-# distribute stars in the board
-def distribute_stars(board, rng: random.Random, assume_no_stars=False):
-    if not assume_no_stars:
-        for y in range(board.height):
-            for x in range(board.width):
-                tile = board.get_tile_at(x, y)
-                if tile.star:
-                    tile.star = False
-                    board.set_tile_at(x, y, tile)
-
-    stars_per_color = dict(zip(Color.ref_list(), [set() for _ in range(len(Color.ref_list()))]))
-    _place_stars_backtrack(board, stars_per_color, 0, rng)
+STARS_PER_COLOR = 3
 
 
-def _place_stars_backtrack(board: Board, stars_per_color, col: int, rng: random.Random):
-    if col == board.width:
-        return True  # done
+# distribute stars in the board: one per column, at most one per component and STARS_PER_COLOR per color
+# this is a flow from the columns through the components in them to the colors, the rng decides the order in which the
+# augmenting paths try the edges and the tile a star gets within its component and column
+# returns error messages that explain why the stars can't be distributed, the board has no new stars then
+def distribute_stars(board, rng: random.Random, assume_no_stars=False):
+    if not assume_no_stars:
+        board.clear_stars()
 
-    row_indices = [i for i in range(board.height)]
-    rng.shuffle(row_indices)
-    for row in row_indices:
-        if _star_is_placeable_at(board, stars_per_color, col, row):
-            board.set_star_at(col, row)
-            stars_per_color[board.get_tile_at(col, row).color].add((col, row))
+    error_msgs = _check_star_distribution_is_possible(board)
+    if len(error_msgs) != 0:
+        return error_msgs
 
-            if _place_stars_backtrack(board, stars_per_color, col + 1, rng):
-                return True
-            else:
-                board.set_star_at(col, row, False)
-                stars_per_color[board.get_tile_at(col, row).color].remove((col, row))
+    geometry = board.geometry
+    components = board.components
 
-    return False
+    # nodes: source, columns, components, colors, sink
+    source = 0
+    first_component = 1 + board.width
+    first_color = first_component + len(components)
+    sink = first_color + len(COLOR_INDICES)
 
+    capacity = {}
+    edges = [[] for _ in range(sink + 1)]
 
-def _star_is_placeable_at(board, stars_per_color, x, y):
-    tile = board.get_tile_at(x, y)
-    color = tile.color
+    def add_edge(u, v, cap):
+        capacity[(u, v)] = cap
+        capacity[(v, u)] = 0
+        edges[u].append(v)
+        edges[v].append(u)
 
-    # check amount of stars for this color
-    if len(stars_per_color[color]) >= 3:
-        return False
+    for col in range(board.width):
+        add_edge(source, 1 + col, 1)
+    for k, (color_index, mask) in enumerate(components):
+        for col in range(board.width):
+            if mask & geometry.column_masks[col]:
+                add_edge(1 + col, first_component + k, 1)
+        add_edge(first_component + k, first_color + color_index, 1)
+    for color_index in range(len(COLOR_INDICES)):
+        add_edge(first_color + color_index, sink, STARS_PER_COLOR)
+    for neighbours in edges:
+        rng.shuffle(neighbours)
+
+    flow = 0
+    while flow < board.width:
+        # breadth first search for an augmenting path
+        parents = {source: None}
+        queue = [source]
+        i = 0
+        while i < len(queue) and sink not in parents:
+            u = queue[i]
+            i += 1
+            for v in edges[u]:
+                if v not in parents and capacity[(u, v)] > 0:
+                    parents[v] = u
+                    queue.append(v)
+        if sink not in parents:
+            break
 
-    # check component for star
-    for (cx, cy) in board.get_component_coords(x, y):
-        ctile = board.get_tile_at(cx, cy)
-        if ctile and ctile.star:
-            return False
+        v = sink
+        while parents[v] is not None:
+            u = parents[v]
+            capacity[(u, v)] -= 1
+            capacity[(v, u)] += 1
+            v = u
+        flow += 1
 
-    return True
+    if flow < board.width:
+        # the columns still reachable from the source form the bottleneck
+        columns = sorted(u - 1 for u in parents if 1 <= u < first_component)
+        return ["Only {} of the {} columns can get a star, the columns {} have too few components or colors to choose "
+                "from".format(flow, board.width, columns)]
 
+    for col in range(board.width):
+        for k in range(len(components)):
+            if capacity.get((1 + col, first_component + k)) == 0:  # the edge is used by the flow
+                bits = list(iter_bits(components[k][1] & geometry.column_masks[col]))
+                board.set_star_at(*geometry.coords[rng.choice(bits)])
+                break
 
-# returns the set of all subgraphs with size amount of nodes given a graph and a start node
-def get_all_graphs_of_size(coords, start, size):
-    solutions = []  # this will have sets of frozensets as elements
+    return []
 
-    if len(coords) == 0 or start not in coords:
-        return set()
 
-    for i in range(size):
-        if i == 0:
-            solutions.append({frozenset((start,))})
-            if size == 1:
-                return solutions[0]
-            else:
-                continue
-        else:
-            solutions.append(set())
+# the conditions the board has to fulfil before stars can be distributed
+def _check_star_distribution_is_possible(board):
+    error_msgs = []
 
-        # here every subgraph found in the previous solution set is processed
-        for subgraph in solutions[i - 1]:  # subgraph is a set of nodes
-            # get all possible neighbours of this subgraph
-            neighbours = set()
-            for node in subgraph:
-                neighbours.update(get_neighbours(node, coords))
+    if board.width != STARS_PER_COLOR * len(COLOR_INDICES):
+        error_msgs.append("A board with {} columns can't have one star per column and {} stars for each of the {} "
+                          "colors".format(board.width, STARS_PER_COLOR, len(COLOR_INDICES)))
 
-            # remove the nodes from the subgraph from the set of all possible neighbours
-            neighbours = neighbours - subgraph
+    for col, column_mask in enumerate(board.geometry.column_masks):
+        if not column_mask & ~board.free_mask:
+            error_msgs.append("The column {} has no colored tile for a star".format(col))
 
-            # add each combination of the subgraph and one of the found neighbours into the set of new solutions
-            for true_neighbour in neighbours:
-                new_subgraph = subgraph | {true_neighbour}
-                solutions[i].add(frozenset(new_subgraph))
+    components_per_color = [0 for _ in range(len(COLOR_INDICES))]
+    for (color_index, _) in board.components:
+        components_per_color[color_index] += 1
+    for color in Color.ref_list():
+        n = components_per_color[COLOR_INDICES[color]]
+        if n < STARS_PER_COLOR:
+            error_msgs.append("The color '{}' has {} component(s), but needs {} stars in different components"
+                              .format(color, n, STARS_PER_COLOR))
 
-    return solutions[-1]
+    return error_msgs
 
 
 # gets all neighbours of a coordinate.
@@ -0,0 +1,326 @@
+import random
+from functools import lru_cache
+from typing import List, Tuple
+
+import libnochmal as ln
+from libnochmal import Color
+
+TOSSES = 30
+JOKERS = 8
+MAX_CROSSES = 5
+COLOR_BONUS = 5
+STAR_PENALTY = 2
+
+# the number dice show 1 to 5 and a question mark, the color dice the five colors and a white joker
+JOKER_NUMBER = 6
+JOKER_COLOR = Color.WHITE
+DICE_NUMBERS = [1, 2, 3, 4, 5, JOKER_NUMBER]
+DICE_COLORS = Color.ref_list(True)
+
+
+class IllegalMoveError(ValueError):
+    pass
+
+
+# the jokers a toss needs for a color or a number of crosses are looked up by the move generator for every toss, so they
+# are worked out once, None if the toss doesn't allow it at all
+class Toss:
+    __slots__ = ('colors', 'numbers', 'color_costs', 'size_costs')
+
+    def __init__(self, colors, numbers):
+        self.colors = tuple(colors)
+        self.numbers = tuple(numbers)
+        self.color_costs = [0 if color in self.colors else 1 if JOKER_COLOR in self.colors else None
+                            for color in ln.COLORS_BY_INDEX]
+        self.size_costs = [(size, 0 if size in self.numbers else 1) for size in range(1, MAX_CROSSES + 1)
+                           if size in self.numbers or JOKER_NUMBER in self.numbers]
+
+    def __eq__(self, other):
+        return isinstance(other, Toss) and self.colors == other.colors and self.numbers == other.numbers
+
+    def __hash__(self):
+        return hash((self.colors, self.numbers))
+
+    def __repr__(self):
+        return "Toss({}, {})".format([color.name for color in self.colors], list(self.numbers))
+
+
+# every possible toss, a roll picks one of them with a single random number instead of rolling four dice
+ALL_TOSSES = [Toss((color_1, color_2), (number_1, number_2))
+              for color_1 in DICE_COLORS for color_2 in DICE_COLORS
+              for number_1 in DICE_NUMBERS for number_2 in DICE_NUMBERS]
+
+
+# two color dice and two number dice, the same seed rolls the same tosses
+class Dice:
+    def __init__(self, seed=None):
+        self._random = random.Random(seed).random
+
+    def roll(self) -> Toss:
+        return ALL_TOSSES[int(self._random() * len(ALL_TOSSES))]
+
+
+# the rules of the single player challenge on the bitmasks of a board, a move is the set of tiles crossed for a toss
+# given as a mask or as coordinates, an empty move passes
+class SinglePlayerGame:
+    def __init__(self, board: ln.Board, jokers: int = JOKERS, tosses: int = TOSSES):
+        if board.free_mask:
+            raise ValueError("The board has tiles without a color")
+
+        self.board = board
+        self.geometry = board.geometry
+        self.tosses = tosses
+        self.joker_count = jokers
+        self.toss_counter = 0
+        self.crossed_mask = 0
+        self.stars_crossed = 0
+        self.colors_crossed = [0 for _ in range(len(ln.COLOR_INDICES))]
+        self.columns_crossed = [0 for _ in range(board.width)]
+
+        # column H, the middle column, can always be crossed
+        self.middle_column_mask = self.geometry.column_masks[board.width // 2]
+
+        # the tiles that are not crossed yet and can be crossed next: the middle column and the neighbours of the
+        # crosses, all crosses are connected to the middle column, so a move is reachable if one of its tiles is
+        self.reachable_mask = self.middle_column_mask
+        self._labels = board.component_labels
+        self._components = board.components
+        self._components_by_color = [[component for (color_index, component) in self._components
+                                      if color_index == i] for i in range(len(ln.COLOR_INDICES))]
+        self._color_masks = list(board.color_masks)
+        self._star_mask = board.star_mask
+        self._color_sizes = [ln.popcount(mask) for mask in board.color_masks]
+
+    @property
+    def finished(self) -> bool:
+        return self.toss_counter >= self.tosses
+
+    def get_color_index_at(self, x: int, y: int) -> int:
+        return self._components[self._labels[self.geometry.to_bit(x, y)]][0]
+
+    def is_crossed(self, x: int, y: int) -> bool:
+        return bool(self.crossed_mask >> self.geometry.to_bit(x, y) & 1)
+
+    # raises an IllegalMoveError if the tile (x, y) can't be added to the tiles selected for the toss so far, the
+    # selection as a whole is checked by apply_move
+    def check_cross(self, toss: Toss, selection: int, x: int, y: int):
+        bit = self.geometry.to_bit(x, y)
+        if self.crossed_mask >> bit & 1:
+            raise IllegalMoveError("Cannot uncross this tile")
+
+        if ln.popcount(selection) >= min(max(toss.numbers), MAX_CROSSES):
+            raise IllegalMoveError("No more tiles can be crossed")
+
+        component_id = self._labels[bit]
+        if JOKER_COLOR not in toss.colors and \
+                ln.COLORS_BY_INDEX[self._components[component_id][0]] not in toss.colors:
+            raise IllegalMoveError("This color wasn't tossed")
+
+        if selection and self._labels[ln.lowest_bit(selection)] != component_id:
+            raise IllegalMoveError("You can't cross tiles from multiple components")
+
+        # the tile can also be reached through the tiles selected before
+        if not self.reachable_mask >> bit & 1 and \
+                not self.geometry.flood(1 << bit, selection | 1 << bit) & self.reachable_mask:
+            raise IllegalMoveError("This tile is not reachable")
+
+    # returns the number of jokers the move costs or raises an IllegalMoveError with the first rule it breaks
+    def move_cost(self, toss: Toss, move: int) -> int:
+        size = ln.popcount(move)
+        if size == 0:
+            return 0
+
+        if move & self.crossed_mask:
+            raise IllegalMoveError("Cannot uncross this tile")
+
+        jokers = 0
+        if size > MAX_CROSSES or size not in toss.numbers:
+            if size > MAX_CROSSES or JOKER_NUMBER not in toss.numbers:
+                raise IllegalMoveError("{0} tiles were crossed, but the dices rolled {1[0]} and {1[1]}"
+                                       .format(size, toss.numbers))
+            jokers += 1
+
+        (color_index, component) = self._components[self._labels[ln.lowest_bit(move)]]
+        if move & ~component:
+            raise IllegalMoveError("You can't cross tiles from multiple components")
+
+        if ln.COLORS_BY_INDEX[color_index] not in toss.colors:
+            if JOKER_COLOR not in toss.colors:
+                raise IllegalMoveError("This color wasn't tossed")
+            jokers += 1
+
+        if jokers > self.joker_count:
+            raise IllegalMoveError("Not enough jokers left")
+
+        unreachable = move & ~self.geometry.flood(move & self.reachable_mask, move)
+        if unreachable:
+            (x, y) = self.geometry.coords[ln.lowest_bit(unreachable)]
+            raise IllegalMoveError("Invalid selection, tile ({}, {}) is not reachable".format(chr(x + 65), y + 1))
+
+        if not self.geometry.is_connected(move):
+            raise IllegalMoveError("Invalid selection, the placed crosses are not fully connected")
+
+        return jokers
+
+    # every legal move for the toss as its mask and the number of jokers it costs, passing is always legal and not
+    # listed, the moves are the connected subsets of the tiles of a component not crossed yet that touch the reachable
+    # tiles
+    def legal_moves(self, toss: Toss) -> List[Tuple[int, int]]:
+        if self.finished:
+            return []
+
+        jokers = self.joker_count
+        crossed = self.crossed_mask
+        reachable = self.reachable_mask
+        geometry = self.geometry
+        moves = []
+        for (color_index, color_cost) in enumerate(toss.color_costs):
+            if color_cost is None or color_cost > jokers:
+                continue
+
+            for component in self._components_by_color[color_index]:
+                touched = component & reachable
+                if not touched:
+                    continue
+
+                subsets = reachable_subsets(geometry, component & ~crossed, touched)
+                for (size, size_cost) in toss.size_costs:
+                    cost = color_cost + size_cost
+                    if cost <= jokers and subsets[size]:
+                        moves.extend([(subset, cost) for subset in subsets[size]])
+
+        return moves
+
+    # a random legal move for the toss with the jokers it costs, None if there is none, the move grows from a reachable
+    # tile by random neighbours, so the moves don't need to be listed, but not every move is equally likely
+    def random_move(self, toss: Toss, rng: random.Random):
+        if self.finished:
+            return None
+
+        jokers = self.joker_count
+        starts = 0
+        for (color_index, color_cost) in enumerate(toss.color_costs):
+            if color_cost is not None and color_cost <= jokers:
+                starts |= self._color_masks[color_index]
+        starts &= self.reachable_mask
+
+        # random tiles are tried until one of them has room for a move the toss allows
+        geometry = self.geometry
+        while starts:
+            bit = random_bit(starts, rng)
+            starts &= ~(1 << bit)
+            (color_index, component) = self._components[self._labels[bit]]
+            color_cost = toss.color_costs[color_index]
+            tiles = component & ~self.crossed_mask
+            room = ln.popcount(geometry.flood(1 << bit, tiles))
+            sizes = [(size, color_cost + size_cost) for (size, size_cost) in toss.size_costs
+                     if size <= room and color_cost + size_cost <= jokers]
+            if not sizes:
+                continue
+
+            (size, cost) = sizes[int(rng.random() * len(sizes))]
+            move = 1 << bit
+            for _ in range(size - 1):
+                move |= 1 << random_bit(geometry.dilate(move) & tiles & ~move, rng)
+            return move, cost
+
+        return None
+
+    # crosses the tiles of the move for the toss and returns the number of jokers it cost, an illegal move raises an
+    # IllegalMoveError and leaves the game as it was
+    def apply_move(self, toss: Toss, cells) -> int:
+        if self.finished:
+            raise IllegalMoveError("The game is over")
+
+        move = cells if isinstance(cells, int) else self.geometry.to_mask(cells)
+        jokers = self.move_cost(toss, move)
+        if move:
+            self._cross(move, jokers)
+        self.toss_counter += 1
+        return jokers
+
+    # crosses a move of legal_moves or random_move with the jokers it costs without checking it again, 0 passes
+    def apply_legal_move(self, move: int, jokers: int):
+        if self.finished:
+            raise IllegalMoveError("The game is over")
+
+        if move:
+            self._cross(move, jokers)
+        self.toss_counter += 1
+
+    def _cross(self, move: int, jokers: int):
+        self.joker_count -= jokers
+        self.crossed_mask |= move
+        self.reachable_mask = (self.reachable_mask | self.geometry.dilate(move)) & ~self.crossed_mask
+        self.colors_crossed[self._components[self._labels[ln.lowest_bit(move)]][0]] += ln.popcount(move)
+        self.stars_crossed += ln.popcount(move & self._star_mask)
+        height = self.geometry.height
+        for bit in ln.iter_bits(move):
+            self.columns_crossed[bit // height] += 1
+
+    # color bonus, column bonus, joker bonus and star penalty
+    def score(self) -> List[int]:
+        return [sum(COLOR_BONUS for (crossed, size) in zip(self.colors_crossed, self._color_sizes) if crossed == size),
+                sum(ln.POINTS_PER_COLUMN[x] for x in range(self.board.width)
+                    if self.columns_crossed[x] == self.board.height),
+                self.joker_count,
+                -STAR_PENALTY * (self.board.width - self.stars_crossed)]
+
+    def total_score(self) -> int:
+        return sum(self.score())
+
+
+# a random bit of the mask, the first one from a random position on, so the bits after a gap are more likely
+def random_bit(mask: int, rng: random.Random) -> int:
+    start = int(rng.random() * mask.bit_length())
+    higher = mask >> start
+    if higher:
+        return start + ln.lowest_bit(higher)
+    return ln.lowest_bit(mask)
+
+
+# the connected subsets of the tiles of a component per size up to MAX_CROSSES, every subset of one size grows into the
+# subsets of the next size by one neighbour of the component
+@lru_cache(maxsize=4096)
+def connected_subsets(geometry: ln.BoardGeometry, component: int) -> Tuple[Tuple[int, ...], ...]:
+    subsets = [()]
+    level = set(1 << bit for bit in ln.iter_bits(component))
+    while len(subsets) <= MAX_CROSSES:
+        subsets.append(tuple(sorted(level)))
+        grown = set()
+        for subset in level:
+            for bit in ln.iter_bits(geometry.dilate(subset) & component & ~subset):
+                grown.add(subset | 1 << bit)
+        level = grown
+    return tuple(subsets)
+
+
+# the connected subsets of the tiles per size that contain at least one of the reachable tiles
+@lru_cache(maxsize=65536)
+def reachable_subsets(geometry: ln.BoardGeometry, tiles: int, reachable: int) -> Tuple[Tuple[int, ...], ...]:
+    return tuple(tuple(subset for subset in subsets if subset & reachable)
+                 for subsets in connected_subsets(geometry, tiles))
+
+
+# plays a whole game, choose_move(game, toss) returns the move for every toss, the game is returned with its score
+def play(board: ln.Board, choose_move, seed=None) -> SinglePlayerGame:
+    game = SinglePlayerGame(board)
+    dice = Dice(seed)
+    while not game.finished:
+        toss = dice.roll()
+        game.apply_move(toss, choose_move(game, toss))
+    return game
+
+
+# like play, but choose_move returns a move of legal_moves or random_move with its jokers or None to pass, the move is
+# not checked again
+def play_legal(board: ln.Board, choose_move, seed=None) -> SinglePlayerGame:
+    game = SinglePlayerGame(board)
+    dice = Dice(seed)
+    while not game.finished:
+        move = choose_move(game, dice.roll())
+        if move is None:
+            game.apply_legal_move(0, 0)
+        else:
+            game.apply_legal_move(*move)
+    return game
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import argparse
+
+import libnochmal as ln
+
+
+def main():
+    cli_parser = argparse.ArgumentParser(description='Replay the trace of a generation written by generateboard.py '
+                                                     '--trace.')
+    commands = cli_parser.add_subparsers(dest='command', required=True)
+
+    stats_parser = commands.add_parser('stats', help='Print statistics of the generation')
+    stats_parser.add_argument('trace', help='The trace file')
+
+    board_parser = commands.add_parser('board', help='Rebuild the board after an event of the trace')
+    board_parser.add_argument('-e', '--event', type=int, default=None, metavar='<event_number>',
+                              help='The number of events to replay, starting at 1 (default is all of them)')
+    board_parser.add_argument('trace', help='The trace file')
+    board_parser.add_argument('outfile', nargs='?', default=None, help='The file name to save the board to')
+
+    render_parser = commands.add_parser('render', help='Render the placements of the trace')
+    render_parser.add_argument('--output', type=str, default=None, choices=ln.STEP_IMAGE_OUTPUTS,
+                               help='A folder of png files (requires PyPNG), a zip archive of them (requires PyPNG), '
+                                    'an animated png or an animated gif (default is taken from the extension of the '
+                                    'output path: .zip, .png, .gif or a folder)')
+    render_parser.add_argument('--every', type=int, default=1, metavar='<n>',
+                               help='Only render every <n>th placement (default is 1)')
+    render_parser.add_argument('--new-max-level', action='store_true',
+                               help='Only render placements that reach a level no earlier placement reached')
+    render_parser.add_argument('--first', type=int, default=1, metavar='<event_number>',
+                               help='Start rendering at this event (default is 1)')
+    render_parser.add_argument('--last', type=int, default=None, metavar='<event_number>',
+                               help='Stop rendering after this event (default is the last one)')
+    render_parser.add_argument('--scale', type=int, default=40, metavar='<pixels>',
+                               help='The size of a tile in pixels (default is 40)')
+    render_parser.add_argument('--frame-delay', type=float, default=0.1, metavar='<seconds>',
+                               help='The time every frame of an animation is shown (default is 0.1)')
+    render_parser.add_argument('trace', help='The trace file')
+    render_parser.add_argument('path', help='The folder, archive or animation to write the images to')
+
+    args = cli_parser.parse_args()
+
+    try:
+        if args.command == 'stats':
+            print_stats(args.trace)
+        elif args.command == 'board':
+            rebuild_board(args.trace, args.event, args.outfile)
+        else:
+            render(args)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+
+
+def print_stats(trace: str):
+    state = ln.BacktrackingState()
+    events = [0 for _ in range(len(ln.TRACE_EVENT_NAMES))]
+    placements_per_level = {}
+    placements_per_component = {}
+    max_level = 0
+    for (board, (kind, level, comp_index, color, mask)) in ln.replay_trace(trace, state):
+        events[kind] += 1
+        if kind == ln.TRACE_PLACE:
+            placements_per_level[level] = placements_per_level.get(level, 0) + 1
+            component = "{}{}".format(color.value.upper(), ln.popcount(mask))
+            placements_per_component[component] = placements_per_component.get(component, 0) + 1
+            max_level = max(max_level, state.level)
+
+    print("Trace:          {} ({} bytes)".format(trace, os.path.getsize(trace)))
+    print("Events:         {}".format(state.steps))
+    print("Attempts:       {}".format(events[ln.TRACE_RESTART] + 1))
+    print("Placements:     {}".format(events[ln.TRACE_PLACE]))
+    print("Undos:          {}".format(events[ln.TRACE_UNDO]))
+    print("Max. level:     {}".format(max_level))
+    print("Final level:    {}".format(state.level))
+
+    print("\nPlacements per level:")
+    for level in sorted(placements_per_level):
+        print("  lvl. {:0>2}: {}".format(level, placements_per_level[level]))
+
+    print("\nPlacements per component:")
+    for component in sorted(placements_per_component, key=placements_per_component.get, reverse=True):
+        print("  {}: {}".format(component, placements_per_component[component]))
+
+
+def rebuild_board(trace: str, event: int, outfile: str):
+    state = ln.BacktrackingState()
+    board = None
+    for (board, _) in ln.replay_trace(trace, state):
+        if state.steps == event:
+            break
+    if board is None:
+        raise ValueError("The trace '{}' has no events".format(trace))
+    if event is not None and state.steps < event:
+        raise ValueError("The trace '{}' only has {} events".format(trace, state.steps))
+
+    print("Board after event {}, attempt {}, lvl. {:0>2}, placement no. {}".format(state.steps, state.attempts + 1,
+                                                                                   state.level, state.placements))
+    print(board)
+
+    if outfile is not None:
+        ln.write_board_to_file(board, outfile, "This board was rebuilt from the generation trace {}\n"
+                                               "Event:               {}\n"
+                                               "Level:               {}\n"
+                                               "Total placements:    {}".format(trace, state.steps, state.level,
+                                                                                state.placements))
+
+
+def render(args: argparse.Namespace):
+    output = args.output if args.output is not None else output_for_path(args.path)
+    if ln.png is None and output in ('folder', 'zip'):
+        raise ValueError("You don't have the PyPNG module installed. To write png files this module is required.")
+
+    state = ln.BacktrackingState()
+    writer = ln.StepImageWriter(args.path, output, every=args.every, new_max_level_only=args.new_max_level,
+                                frame_delay=args.frame_delay, scale=args.scale, drop_when_full=False)
+    try:
+        for (board, (kind, level, comp_index, color, mask)) in ln.replay_trace(args.trace, state):
+            if args.last is not None and state.steps > args.last:
+                break
+            if kind == ln.TRACE_PLACE and state.steps >= args.first:
+                writer.offer(board, state.placements, state.level)
+    finally:
+        writer.close()
+
+    print("{} images written to {}".format(writer.written, args.path))
+
+
+def output_for_path(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.zip':
+        return 'zip'
+    elif ext == '.png':
+        return 'apng'
+    elif ext == '.gif':
+        return 'gif'
+    return 'folder'
+
+
+if __name__ == "__main__":
+    main()
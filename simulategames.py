@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+import sys
+import argparse
+import random
+import time
+
+import libnochmal as ln
+import libsingleplayer as sp
+
+
+def main():
+    cli_parser = argparse.ArgumentParser(description='Play single player games on boards without the GUI and print the '
+                                                     'scores and how many games were played per second.')
+    cli_parser.add_argument('-n', '--games', type=int, default=1000, metavar='<games>',
+                            help='The number of games per board (default is 1000)')
+    cli_parser.add_argument('-s', '--seed', type=int, default=0, metavar='<seed_as_integer>',
+                            help='The seed of the first game, the games of a board use the seeds from this one on')
+    cli_parser.add_argument('--player', type=str, default='random', choices=['random', 'greedy', 'pass'],
+                            help='random: a random legal move. greedy: the legal move with the most tiles and the '
+                                 'fewest jokers. pass: always pass. (default is random)')
+    cli_parser.add_argument('paths', nargs='+', metavar='<path>',
+                            help='Board, collection or packed collection files, directories or glob patterns')
+    args = cli_parser.parse_args()
+
+    player = PLAYERS[args.player]
+    try:
+        for filename in ln.find_board_files(args.paths):
+            for (n, board) in enumerate(ln.read_boards_from_collection(filename)):
+                if board is None:
+                    print("{}#{}: could not be read".format(filename, n), file=sys.stderr)
+                    continue
+                simulate(board, "{}#{}".format(filename, n), player, args.games, args.seed)
+    except (OSError, ValueError, IndexError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+
+
+def simulate(board: ln.Board, name: str, player, games: int, first_seed: int):
+    rng = random.Random(first_seed)
+    scores = []
+    crosses = 0
+    started = time.perf_counter()
+    for seed in range(first_seed, first_seed + games):
+        game = sp.play_legal(board, lambda game, toss: player(game, toss, rng), seed)
+        scores.append(game.total_score())
+        crosses += sum(game.columns_crossed)
+    elapsed = time.perf_counter() - started
+
+    print("{}: mean score {:.2f}, min {}, max {}, {:.1f} crosses per game, {:.0f} games/s"
+          .format(name, sum(scores) / games, min(scores), max(scores), crosses / games, games / elapsed))
+
+
+# the players return a legal move with the jokers it costs or None to pass
+
+def random_player(game: sp.SinglePlayerGame, toss: sp.Toss, rng: random.Random):
+    return game.random_move(toss, rng)
+
+
+def greedy_player(game: sp.SinglePlayerGame, toss: sp.Toss, rng: random.Random):
+    moves = game.legal_moves(toss)
+    if not moves:
+        return None
+    return max(moves, key=lambda move: (ln.popcount(move[0]), -move[1]))
+
+
+def pass_player(game: sp.SinglePlayerGame, toss: sp.Toss, rng: random.Random):
+    return None
+
+
+PLAYERS = {'random': random_player, 'greedy': greedy_player, 'pass': pass_player}
+
+if __name__ == '__main__':
+    main()
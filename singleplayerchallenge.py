@@ -9,6 +9,7 @@ import tkinter.messagebox as msgbox
 import tkinter.filedialog as tkfd
 
 import libnochmal as ln
+import libsingleplayer as sp
 from libnochmal import Color
 
 
@@ -77,42 +78,24 @@ class ColorButton(tk.Button):
         self.set_color(self.color)
 
 
+# the state of the GUI around the game engine: the board, the current toss and the tiles selected for it
 class SinglePlayerGameState:
     def __init__(self):
         self.board = None
-        self.joker_count = 8
-        self.toss_counter = 0
-        self.tossed = False
+        self.game = None
+        self.dice = sp.Dice()
         self.started = False
-        self.rolled_numbers = [-1, -1]
-        self.rolled_colors = [Color.UNINITIALIZED, Color.UNINITIALIZED]
-        self.crossed_tiles = []
-        self.crossed_tiles_to_commit = []
-        self.stars_crossed = 0
-        self.columns_crossed = []
-        self.colors_crossed = dict(zip(Color.ref_list(), [0 for _ in range(len(Color.ref_list()))]))
+        self.tossed = False
+        self.toss = None
+        self.selection = 0
 
     def start(self):
+        self.game = sp.SinglePlayerGame(self.board)
         self.started = True
-        self.columns_crossed = [0 for _ in range(self.board.width)]
 
     def finish(self):
         self.started = False
 
-    def inc_toss_count(self):
-        if not self.started or self.tossed:
-            return
-
-        self.toss_counter += 1
-        self.tossed = True
-
-    def use_joker(self, n=1) -> bool:
-        if self.joker_count < n:
-            return False
-        else:
-            self.joker_count -= n
-            return True
-
 
 class Application(tk.Frame):
     STAR_IMAGE = None
@@ -271,7 +254,11 @@ class Application(tk.Frame):
             self.clear_game()
             self._load_board(board)
 
-        self.game_state.start()
+        try:
+            self.game_state.start()
+        except ValueError as e:
+            self.update_statusbar(str(e))
+            return
         self.update_statusbar()
         self.toss()
         self.update_statusbar()
@@ -289,79 +276,52 @@ class Application(tk.Frame):
         self.number_dice_2['text'] = '0'
         self.update_statusbar()
 
+    # the dice are rolled by the game engine, the faces shown before are only for the animation
     def toss(self):
         if not self.game_state.started or self.game_state.tossed:
             return
 
-        for i in range(random.randint(11, 17)):
-            self.game_state.rolled_numbers[0] = random.randint(1, 6)
-            self.game_state.rolled_numbers[1] = random.randint(1, 6)
-            self.game_state.rolled_colors[0] = random.choice(Color.ref_list(True))
-            self.game_state.rolled_colors[1] = random.choice(Color.ref_list(True))
+        rolls = random.randint(11, 17)
+        for i in range(rolls):
+            if i < rolls - 1:
+                toss = sp.Toss((random.choice(sp.DICE_COLORS), random.choice(sp.DICE_COLORS)),
+                               (random.choice(sp.DICE_NUMBERS), random.choice(sp.DICE_NUMBERS)))
+            else:
+                toss = self.game_state.dice.roll()
 
-            self.color_dice_1.set_color(self.game_state.rolled_colors[0])
-            self.color_dice_2.set_color(self.game_state.rolled_colors[1])
-            self.number_dice_1['text'] = str(self.game_state.rolled_numbers[0]).replace('6', '?')
-            self.number_dice_2['text'] = str(self.game_state.rolled_numbers[1]).replace('6', '?')
+            self.color_dice_1.set_color(toss.colors[0])
+            self.color_dice_2.set_color(toss.colors[1])
+            self.number_dice_1['text'] = str(toss.numbers[0]).replace('6', '?')
+            self.number_dice_2['text'] = str(toss.numbers[1]).replace('6', '?')
             self.update()
 
             time.sleep(0.075 + 0.125 * (i/17))
 
-        self.game_state.inc_toss_count()
+        self.game_state.toss = toss
+        self.game_state.tossed = True
 
     def commit(self):
         if not self.game_state.started or not self.game_state.tossed:
             self.update_statusbar("Game not started yet")
             return
 
-        jokers_used = 0
-
-        if len(self.game_state.crossed_tiles_to_commit) == 0:
+        if self.game_state.selection == 0:
             if not msgbox.askyesno(title="Pass?", message="Would you like to pass this turn?"):
                 return
-        else:
-            if len(self.game_state.crossed_tiles_to_commit) not in self.game_state.rolled_numbers:
-                if 6 in self.game_state.rolled_numbers:
-                    jokers_used += 1
-                else:
-                    self.update_statusbar("{0} tiles were crossed, but the dices rolled {1[0]} and {1[1]}"
-                                          .format(len(self.game_state.crossed_tiles_to_commit), self.game_state.rolled_numbers))
-                    return  # invalid set of crosses
-
-            if self.game_state.board.get_color_at(self.game_state.crossed_tiles_to_commit[0][0], self.game_state.crossed_tiles_to_commit[0][1]) not in self.game_state.rolled_colors:
-                jokers_used += 1
-
-            if not self.game_state.use_joker(jokers_used):
-                self.update_statusbar("Not enough jokers left")
-                return
-
-        # check if all tiles to commit are reachable
-        for (x, y) in self.game_state.crossed_tiles_to_commit:
-            if not self._tile_is_reachable(x, y):
-                self.update_statusbar("Invalid selection, tile ({}, {}) is not reachable".format(chr(x + 65), y+1))
-                return
 
-        # check if component in itself is fully connected
-        if len(ln._get_connected_coords(self.game_state.crossed_tiles_to_commit)) > 1:
-            self.update_statusbar("Invalid selection, the placed crosses are not fully connected")
+        try:
+            self.game_state.game.apply_move(self.game_state.toss, self.game_state.selection)
+        except sp.IllegalMoveError as e:
+            self.update_statusbar(str(e))
             return
 
-        # all checks passed, update game state
-        for (x, y) in self.game_state.crossed_tiles_to_commit:
+        for (x, y) in self.game_state.game.geometry.to_coords(self.game_state.selection):
             self.board_buttons[x][y].commit()
-            tile = self.game_state.board.get_tile_at(x, y)
-            self.game_state.colors_crossed[tile.color] += 1
-            self.game_state.columns_crossed[x] += 1
-            if tile.star:
-                self.game_state.stars_crossed += 1
-
-        # reset tiles to commit list
-        self.game_state.crossed_tiles.extend(self.game_state.crossed_tiles_to_commit)
-        self.game_state.crossed_tiles_to_commit = []
+        self.game_state.selection = 0
 
         self.update_statusbar()
 
-        if self.game_state.toss_counter == 30:
+        if self.game_state.game.finished:
             score = self.calc_score()
             msgbox.showinfo("Game Over", "Game over, final score:\n\n"
                                          "Color bonus:\t{1[0]:>3}\n"
@@ -383,81 +343,41 @@ class Application(tk.Frame):
             self.update_statusbar("Game not started yet")
             return False
 
-        # no already committed cross
-        if (x, y) in self.game_state.crossed_tiles:
-            self.update_statusbar("Cannot uncross this tile")
-            return False
+        bit = 1 << self.game_state.game.geometry.to_bit(x, y)
 
         # always be able to remove a cross to commit
-        if (x, y) in self.game_state.crossed_tiles_to_commit:
-            self.game_state.crossed_tiles_to_commit.remove((x, y))
+        if self.game_state.selection & bit:
+            self.game_state.selection &= ~bit
             self.update_statusbar()
             return True
 
-        # Xs left to place?
-        if len(self.game_state.crossed_tiles_to_commit) >= min(max(self.game_state.rolled_numbers), 5):
-            self.update_statusbar("No more tiles can be crossed")
-            return False
-
-        # color was tossed?
-        if Color.UNINITIALIZED not in self.game_state.rolled_colors and self.game_state.board.get_color_at(x, y) not in self.game_state.rolled_colors:
-            self.update_statusbar("This color wasn't tossed")
-            return False
-
-        # only one component
-        if len(self.game_state.crossed_tiles_to_commit) > 0:
-            component = self.game_state.board.get_component_coords(self.game_state.crossed_tiles_to_commit[0][0], self.game_state.crossed_tiles_to_commit[0][1])
-            if (x, y) not in component:
-                self.update_statusbar("You can't cross tiles from multiple components")
-                return False
-
-        # column 7 (H, the middle) reachable?
-        if not self._tile_is_reachable(x, y):
-            self.update_statusbar("This tile is not reachable")
+        try:
+            self.game_state.game.check_cross(self.game_state.toss, self.game_state.selection, x, y)
+        except sp.IllegalMoveError as e:
+            self.update_statusbar(str(e))
             return False
 
         # all checks passed
-        self.game_state.crossed_tiles_to_commit.append((x, y))
+        self.game_state.selection |= bit
         self.update_statusbar()
         return True
 
     def toggle_reachable_tiles(self):
-        reachable_coords = set()
-
         if self.reachable_tiles_toggled:
             for (x, y) in [(x, y) for x in range(ln.DEFAULT_BOARD_WIDTH) for y in range(ln.DEFAULT_BOARD_HEIGHT)]:
                 self.board_buttons[x][y]['highlightbackground'] = '#D9D9D9'
             for (x, y) in [(7, y) for y in range(ln.DEFAULT_BOARD_HEIGHT)]:
                 self.board_buttons[x][y]['highlightbackground'] = '#808080'
         else:
-            all_coords = set([(x, y) for x in range(ln.DEFAULT_BOARD_WIDTH) for y in range(ln.DEFAULT_BOARD_HEIGHT)])
-            reached_coords = set(self.game_state.crossed_tiles)
-
-            for coord in reached_coords:
-                reachable_coords = reachable_coords.union(ln.get_neighbours(coord, all_coords))
-
-            reachable_coords = reachable_coords - reached_coords
-            reachable_coords = reachable_coords.union([(7, y) for y in range(ln.DEFAULT_BOARD_HEIGHT)])
+            if self.game_state.game is None:
+                return
 
-            for (x, y) in reachable_coords:
+            game = self.game_state.game
+            for (x, y) in game.geometry.to_coords(game.reachable_mask | game.middle_column_mask):
                 self.board_buttons[x][y]['highlightbackground'] = '#000000'
 
         self.reachable_tiles_toggled = not self.reachable_tiles_toggled
 
-    def _tile_is_reachable(self, x, y):
-        if x == 7:
-            return True
-
-        coords = set(self.game_state.crossed_tiles).union(set(self.game_state.crossed_tiles_to_commit))
-        coords.add((x, y))
-        reachable_coords = ln._get_connected_coords(coords, (x, y))[0]
-
-        for i in range(self.game_state.board.height):
-            if (7, i) in reachable_coords:
-                return True
-
-        return False
-
     def update_statusbar(self, error_msg=None):
         state = self.game_state
 
@@ -469,20 +389,16 @@ class Application(tk.Frame):
             self.statusbar['text'] = "Game not started yet"
             return
 
-        turn = "Turn {:>2}/30".format(state.toss_counter)
-        jokers = "Jokers left: " + str(state.joker_count)
+        # after the last toss the counter is already past it
+        turn = "Turn {:>2}/{}".format(min(state.game.toss_counter + 1, state.game.tosses), state.game.tosses)
+        jokers = "Jokers left: " + str(state.game.joker_count)
         score = "Score: " + str(sum(self.calc_score()))
 
         self.statusbar['text'] = "{} {} {}".format(turn, jokers, score)
         self.update_column_finished_indicators()
 
     def calc_score(self):
-        state = self.game_state
-        return [sum([5 if v == 21 else 0 for v in state.colors_crossed.values()]),  # color bonus
-                sum([ln.POINTS_PER_COLUMN[i] if v == 7 else 0 for i, v in
-                     zip(range(state.board.width), state.columns_crossed)]),  # column bonus
-                state.joker_count,  # joker bonus
-                (-2) * (state.board.width - state.stars_crossed)]  # star penalty
+        return self.game_state.game.score()
 
     def get_game_over_msg(self, score=None):
         if score is None:
@@ -501,7 +417,7 @@ class Application(tk.Frame):
 
     def update_column_finished_indicators(self):
         for i in range(len(self.board_column_point_labels)):
-            if self.game_state.columns_crossed[i] == self.game_state.board.height:
+            if self.game_state.game.columns_crossed[i] == self.game_state.board.height:
                 self.board_column_point_labels[i]['bg'] = 'green'
 
 
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+# times validate against the separate check functions on the boards in boards/ and perturbed copies of them, after
+# making sure both find the same errors: python tests/benchmark_validate.py [<repetitions>]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libnochmal as ln
+from test_validate import check_separately, perturbed_boards, read_boards
+
+
+# the boards keep the labels of their components, so every repetition gets new copies of them
+def best_time(function, boards, repetitions: int) -> float:
+    times = []
+    for _ in range(repetitions):
+        copies = [copy_board(board) for board in boards]
+        started = time.perf_counter()
+        for board in copies:
+            function(board)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def copy_board(board):
+    copy = ln.Board(board.width, board.height)
+    copy.color_masks[:] = board.color_masks
+    copy.star_mask = board.star_mask
+    return copy
+
+
+def main():
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rng = random.Random(0)
+    valid_boards = read_boards()
+    perturbed = [copy for board in valid_boards for copy in perturbed_boards(board, rng, 50)]
+
+    for (name, boards) in (('boards/', valid_boards), ('perturbed', perturbed)):
+        for board in boards:
+            assert ln.validate(board).messages == check_separately(board), str(board)
+
+        separate = best_time(check_separately, boards, repetitions)
+        single = best_time(lambda board: ln.validate(board).messages, boards, repetitions)
+        print("{:<10} {:>4} boards: check_* {:8.3f} ms/board, validate {:8.3f} ms/board, {:.1f}x"
+              .format(name, len(boards), 1000 * separate / len(boards), 1000 * single / len(boards),
+                      separate / single))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libnochmal as ln
+
+
+# a search with most_constrained_first from a shuffled component order, the search and the component order it ends with
+# and the checkpoints it took with a copy of the counters at that time
+def run_search(seed: int, max_placements: int, resume_from: ln.SearchPosition = None, counters: dict = None):
+    board = ln.Board()
+    state = ln.BacktrackingState()
+    if counters is not None:
+        (state.level, state.placements, state.steps, state.attempts) = counters['values']
+        state.prunes.update(counters['prunes'])
+    components = ln.create_descending_component_order()
+    random.Random(seed).shuffle(components)
+
+    checkpoints = []
+
+    def checkpoint(position: ln.SearchPosition):
+        checkpoints.append((position, {'values': (state.level, state.placements, state.steps, state.attempts),
+                                       'prunes': dict(state.prunes)}))
+
+    success = ln.fill_smart(board, state, components, no_line6=False, only_one_comp_per_col=False,
+                            most_constrained_first=True, max_placements=max_placements, checkpoint=checkpoint,
+                            resume_from=resume_from)
+    return success, board, state, components, checkpoints
+
+
+class ResumeTest(unittest.TestCase):
+    # the search is stopped early and resumed from its last checkpoint, it has to end like the search that wasn't
+    # stopped, also in the order the components were placed in
+    def test_resumed_search_matches_uninterrupted(self):
+        for seed in (3, 5):
+            (success, board, state, components, _) = run_search(seed, 600)
+            (_, _, _, _, checkpoints) = run_search(seed, 400)
+            (position, counters) = checkpoints[-1]
+            self.assertLess(counters['values'][1], 400)
+
+            (resumed_success, resumed_board, resumed_state, resumed_components, _) = \
+                run_search(seed, 600, position, counters)
+            self.assertEqual(resumed_success, success)
+            self.assertEqual(resumed_board.color_masks, board.color_masks, seed)
+            self.assertEqual(resumed_components, components, seed)
+            self.assertEqual((resumed_state.placements, resumed_state.level, resumed_state.prunes),
+                             (state.placements, state.level, state.prunes), seed)
+
+    def test_resumed_search_finds_same_board(self):
+        def search(max_placements, resume_from=None, placements=0):
+            board = ln.Board()
+            state = ln.BacktrackingState()
+            state.placements = placements
+            checkpoints = []
+            success = ln.fill_smart(board, state, ln.create_descending_component_order(), free_space_limit=1,
+                                    no_line6=False, only_one_comp_per_col=False, max_placements=max_placements,
+                                    checkpoint=lambda position: checkpoints.append((position, state.placements)),
+                                    resume_from=resume_from)
+            return success, board, state, checkpoints
+
+        (success, board, state, _) = search(None)
+        self.assertTrue(success)
+        (stopped, _, _, checkpoints) = search(state.placements // 2)
+        self.assertFalse(stopped)
+        (resumed, resumed_board, resumed_state, _) = search(None, *checkpoints[-1])
+        self.assertTrue(resumed)
+        self.assertEqual(resumed_board.color_masks, board.color_masks)
+        self.assertEqual(resumed_state.placements, state.placements)
+
+
+# the boards the search of generateboard.py with its default settings and the RFCI order of a seed has placed after 300
+# placements, with the level and the prunes, so a change of the search order shows up here
+PINNED_SEARCHES = [
+    (0, 20, {ln.PRUNE_COLUMNS: 122, ln.PRUNE_COMPONENTS: 124, ln.PRUNE_FREE_SPACE: 3},
+     ['yygyyrggggo____',
+      'yygybbbobgo____',
+      'yygybobrboo_bb_',
+      'ooorrobrbobbb__',
+      'rrrooorrrrggg__',
+      'bbbboyyyyy_g___',
+      'ggy____________']),
+    (1, 18, {ln.PRUNE_COLUMNS: 18, ln.PRUNE_COMPONENTS: 126, ln.PRUNE_FREE_SPACE: 96},
+     ['yy_yyyrbb_yy___',
+      'yy__yrrbb______',
+      'yyg_yoooggg____',
+      'ggg____________',
+      'b____byyyy_b___',
+      'r_og_bgrooobbb_',
+      'ooobbbgroobb___']),
+    (2, 20, {ln.PRUNE_COLUMNS: 199, ln.PRUNE_COMPONENTS: 44, ln.PRUNE_FREE_SPACE: 24},
+     ['ygrrrroyooo_r__',
+      'ogyyrooyoo_____',
+      'ggyyrbbbgggg___',
+      'gyybbyggr______',
+      'gbbbyygrrbbb___',
+      'boooogrrbbb____',
+      'rrgggg_________']),
+]
+
+# the board of the generation in the README: DESC order, -l 1, --line6 and --multiple-comp-per-col
+README_BOARD = ['rrrooooogggyyyb',
+                'rroyyyyygbbbrrb',
+                'rooorrggobrroor',
+                'oorrrggooorgggo',
+                'yyyyyygyyyybbby',
+                'ggggggbbbbboyyg',
+                'bbbbbbrrrrooggb']
+
+
+class RegressionTest(unittest.TestCase):
+    def test_pinned_searches(self):
+        for (seed, level, prunes, rows) in PINNED_SEARCHES:
+            board = ln.Board()
+            state = ln.BacktrackingState()
+            components = ln.create_random_fixed_color_interval_component_order(random.Random(seed))
+            self.assertFalse(ln.fill_smart(board, state, components, max_placements=300))
+            self.assertEqual(state.placements, 300, seed)
+            self.assertEqual(state.level, level, seed)
+            self.assertEqual(state.prunes, prunes, seed)
+            self.assertEqual(str(board), "\n".join(rows), seed)
+
+    def test_readme_generation(self):
+        board = ln.Board()
+        state = ln.BacktrackingState()
+        self.assertTrue(ln.fill_smart(board, state, ln.create_descending_component_order(), free_space_limit=1,
+                                      no_line6=False, only_one_comp_per_col=False))
+        self.assertEqual(state.placements, 2604)
+        self.assertEqual(str(board), "\n".join(README_BOARD))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libnochmal as ln
+
+BOARDS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'boards')
+
+
+def read_boards():
+    return [ln.read_board_from_file(os.path.join(BOARDS, filename)) for filename in sorted(os.listdir(BOARDS))]
+
+
+# the board mirrored along its middle column, tile by tile
+def mirrored(board):
+    copy = ln.Board(board.width, board.height)
+    for x in range(board.width):
+        for y in range(board.height):
+            copy.set_color_at(board.width - 1 - x, y, board.get_color_at(x, y))
+            copy.set_star_at(board.width - 1 - x, y, board.get_star_at(x, y))
+    return copy
+
+
+# the board with its colors swapped according to the permutation of the color indices
+def relabeled(board, permutation):
+    copy = ln.Board(board.width, board.height)
+    for (i, mask) in enumerate(board.color_masks):
+        copy.color_masks[permutation[i]] = mask
+    copy.star_mask = board.star_mask
+    return copy
+
+
+# the board with the star of the first column moved to another tile of that column
+def star_moved(board):
+    copy = relabeled(board, list(range(len(board.color_masks))))
+    y = next(y for y in range(board.height) if board.get_star_at(0, y))
+    copy.set_star_at(0, y, False)
+    copy.set_star_at(0, (y + 1) % board.height, True)
+    return copy
+
+
+class FingerprintTest(unittest.TestCase):
+    def test_mirror_and_relabeling(self):
+        rng = random.Random(0)
+        for board in read_boards():
+            for with_stars in (False, True):
+                fingerprint = ln.board_fingerprint(board, with_stars)
+                self.assertEqual(len(fingerprint), ln.FINGERPRINT_SIZE)
+                self.assertEqual(ln.board_fingerprint(mirrored(board), with_stars), fingerprint)
+                for _ in range(5):
+                    permutation = list(range(len(board.color_masks)))
+                    rng.shuffle(permutation)
+                    copy = relabeled(board, permutation)
+                    self.assertEqual(ln.board_fingerprint(copy, with_stars), fingerprint)
+                    self.assertEqual(ln.board_fingerprint(mirrored(copy), with_stars), fingerprint)
+
+    def test_different_boards(self):
+        boards = read_boards()
+        fingerprints = set(ln.board_fingerprint(board) for board in boards)
+        self.assertEqual(len(fingerprints), len(boards))
+
+        # a single tile of another color makes another board
+        board = boards[0]
+        copy = relabeled(board, list(range(len(board.color_masks))))
+        copy.set_color_at(0, 0, ln.Color.RED if board.get_color_at(0, 0) != ln.Color.RED else ln.Color.BLUE)
+        self.assertNotEqual(ln.board_fingerprint(copy), ln.board_fingerprint(board))
+
+    def test_stars_only_count_with_stars(self):
+        for board in read_boards():
+            copy = star_moved(board)
+            self.assertEqual(ln.board_fingerprint(copy), ln.board_fingerprint(board))
+            self.assertNotEqual(ln.board_fingerprint(copy, with_stars=True),
+                                ln.board_fingerprint(board, with_stars=True))
+            self.assertEqual(ln.board_fingerprint(mirrored(copy), with_stars=True),
+                             ln.board_fingerprint(copy, with_stars=True))
+
+
+class FingerprintIndexTest(unittest.TestCase):
+    def test_reopened_index(self):
+        boards = read_boards()
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'boards.idx')
+            with ln.FingerprintIndex(filename) as index:
+                self.assertEqual(len(index), 0)
+                for board in boards[:-1]:
+                    self.assertTrue(index.add_board(board))
+                self.assertFalse(index.add_board(mirrored(boards[0])))
+                self.assertEqual(len(index), len(boards) - 1)
+
+            with ln.FingerprintIndex(filename) as index:
+                self.assertEqual(len(index), len(boards) - 1)
+                for board in boards[:-1]:
+                    self.assertTrue(index.contains_board(board))
+                    self.assertIn(ln.board_fingerprint(board), index)
+                self.assertFalse(index.contains_board(boards[-1]))
+                self.assertTrue(index.add_board(boards[-1]))
+
+            # a fingerprint cut off by an interruption is dropped when the index is opened
+            with open(filename, 'ab') as f:
+                f.write(b'\x01' * (ln.FINGERPRINT_SIZE // 2))
+            with ln.FingerprintIndex(filename) as index:
+                self.assertEqual(len(index), len(boards))
+                self.assertTrue(all(index.contains_board(board) for board in boards))
+                self.assertFalse(index.add_board(relabeled(boards[-1], [4, 3, 2, 1, 0])))
+            self.assertEqual(os.path.getsize(filename),
+                             len(ln.FINGERPRINT_INDEX_MAGIC) + 1 + len(boards) * ln.FINGERPRINT_SIZE)
+
+    def test_index_with_stars(self):
+        board = read_boards()[0]
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'boards.idx')
+            with ln.FingerprintIndex(filename, with_stars=True) as index:
+                self.assertTrue(index.add_board(board))
+                self.assertTrue(index.add_board(star_moved(board)))
+
+            with self.assertRaisesRegex(ValueError, 'are made with the stars'):
+                ln.FingerprintIndex(filename)
+            with ln.FingerprintIndex(filename, with_stars=True) as index:
+                self.assertEqual(len(index), 2)
+
+    def test_not_an_index(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'board.dat')
+            ln.write_board_to_file(read_boards()[0], filename)
+            with self.assertRaisesRegex(ValueError, 'is not a fingerprint index'):
+                ln.FingerprintIndex(filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generateboard
+import libnochmal as ln
+
+GENERATEBOARD = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'generateboard.py')
+
+
+def run_generateboard(*args):
+    return subprocess.run([sys.executable, GENERATEBOARD] + list(args), capture_output=True, text=True, timeout=60)
+
+
+class SearchProcessesTest(unittest.TestCase):
+    # the workers of --seeds and -j are daemonic and can't start the processes of --search-processes
+    def test_rejected_with_seeds_and_jobs(self):
+        with tempfile.TemporaryDirectory() as folder:
+            outfile = os.path.join(folder, 'out.dat')
+            for args in (['--seeds', '0-1', '-j', '2'], ['--seeds', '0-1'], ['-j', '2']):
+                result = run_generateboard(*args, '--search-processes', '2', outfile)
+                self.assertEqual(result.returncode, 2, args)
+                self.assertIn('--search-processes cannot be combined with --seeds or -j', result.stderr)
+                self.assertEqual(os.listdir(folder), [])
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.args = getattr(generateboard, 'ARGS', None)
+
+    def tearDown(self):
+        generateboard.ARGS = self.args
+
+    # the checkpoint of a search stopped on the way is written and read back into a new rng, state and ARGS
+    def test_checkpoint_round_trip(self):
+        args = {'seed': 7, 'limit_free_space': 5, 'line6': True, 'multiple_comp_per_col': True,
+                'no_forward_checking': False, 'order': 'RAND', 'restarts': 'luby', 'restart_budget': 300,
+                'restart_factor': 1.5, 'max_attempts': 4}
+        self.assertEqual(sorted(args), sorted(generateboard.RESUMED_ARGS))
+        generateboard.ARGS = argparse.Namespace(**args)
+
+        rng = random.Random(7)
+        components = generateboard.create_component_order('RAND', rng)
+        state = ln.BacktrackingState()
+        state.attempts = 2
+        positions = []
+        ln.fill_smart(ln.Board(), state, components, free_space_limit=5, no_line6=False, only_one_comp_per_col=False,
+                      max_placements=300, checkpoint=positions.append)
+        position = positions[-1]
+
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'checkpoint.json.gz')
+            generateboard.write_checkpoint(filename, position, state, rng, 1000, timedelta(seconds=12.5))
+            self.assertEqual(os.listdir(folder), ['checkpoint.json.gz'])
+
+            generateboard.ARGS = argparse.Namespace(**{name: None for name in args})
+            resumed_rng = random.Random(0)
+            resumed_state = ln.BacktrackingState()
+            (resume, elapsed) = generateboard.read_checkpoint(filename, resumed_rng, resumed_state)
+
+        self.assertEqual(vars(generateboard.ARGS), args)
+        self.assertEqual(resumed_rng.getstate(), rng.getstate())
+        self.assertEqual([resumed_rng.random() for _ in range(5)], [rng.random() for _ in range(5)])
+        self.assertEqual((resumed_state.level, resumed_state.placements, resumed_state.steps, resumed_state.attempts,
+                          resumed_state.prunes),
+                         (state.level, state.placements, state.steps, state.attempts, state.prunes))
+        self.assertEqual(resume['max_placements'], 1000)
+        self.assertEqual(resume['position'].color_masks, position.color_masks)
+        self.assertEqual(resume['position'].components, position.components)
+        self.assertEqual(resume['position'].positions, position.positions)
+        self.assertEqual(elapsed, timedelta(seconds=12.5))
+
+    def test_checkpoint_of_other_version_is_rejected(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'checkpoint.json.gz')
+            with generateboard.gzip.open(filename, 'wt') as f:
+                generateboard.json.dump({'version': generateboard.CHECKPOINT_VERSION + 1}, f)
+            with self.assertRaisesRegex(ValueError, 'is not a checkpoint of this version'):
+                generateboard.read_checkpoint(filename, random.Random(), ln.BacktrackingState())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libnochmal as ln
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOARDS = os.path.join(ROOT, 'boards')
+CONVERTBOARDS = os.path.join(ROOT, 'convertboards.py')
+
+
+def read_boards():
+    return [ln.read_board_from_file(os.path.join(BOARDS, filename)) for filename in sorted(os.listdir(BOARDS))]
+
+
+def run_convertboards(*args):
+    return subprocess.run([sys.executable, CONVERTBOARDS] + list(args), capture_output=True, text=True, timeout=60)
+
+
+class PackedCollectionTest(unittest.TestCase):
+    def assertBoardEqual(self, board, expected):
+        self.assertEqual((board.width, board.height), (expected.width, expected.height))
+        self.assertEqual(board.color_masks, expected.color_masks)
+        self.assertEqual(board.star_mask, expected.star_mask)
+
+    def test_round_trip(self):
+        boards = read_boards()
+        # a board with free tiles and without stars is packed as well
+        partial = ln.Board()
+        partial.set_color_at(0, 0, ln.Color.RED)
+        partial.set_color_at(14, 6, ln.Color.BLUE)
+        boards.append(partial)
+
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'boards' + ln.PACKED_EXTENSION)
+            self.assertEqual(ln.write_packed_boards(filename, boards), len(boards))
+            self.assertTrue(ln.is_packed_collection(filename))
+            self.assertEqual(os.path.getsize(filename),
+                             len(ln.PACKED_MAGIC) + 3 + len(boards) * ln.packed_record_size())
+
+            with ln.PackedBoardCollection(filename) as collection:
+                self.assertEqual(len(collection), len(boards))
+                for (board, expected) in zip(collection, boards):
+                    self.assertBoardEqual(board, expected)
+                for n in range(len(boards)):
+                    self.assertBoardEqual(collection[n], boards[n])
+                    self.assertEqual(bytes(collection.record(n)), ln.pack_board(boards[n]))
+                self.assertEqual(bytes(collection.records()), b''.join(ln.pack_board(board) for board in boards))
+
+            for (board, expected) in zip(ln.read_boards_from_collection(filename), boards):
+                self.assertBoardEqual(board, expected)
+
+    def test_negative_index(self):
+        boards = read_boards()
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'boards' + ln.PACKED_EXTENSION)
+            ln.write_packed_boards(filename, boards)
+            with ln.PackedBoardCollection(filename) as collection:
+                for n in range(1, len(boards) + 1):
+                    self.assertBoardEqual(collection[-n], boards[-n])
+                for n in (len(boards), -len(boards) - 1):
+                    with self.assertRaises(IndexError):
+                        collection[n]
+
+    def test_empty_collection(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'empty' + ln.PACKED_EXTENSION)
+            self.assertEqual(ln.write_packed_boards(filename, []), 0)
+            with ln.PackedBoardCollection(filename) as collection:
+                self.assertEqual(len(collection), 0)
+                self.assertEqual(list(collection), [])
+                self.assertEqual(bytes(collection.records()), b'')
+                with self.assertRaises(IndexError):
+                    collection[0]
+                with self.assertRaises(IndexError):
+                    collection[-1]
+            self.assertEqual(list(ln.read_boards_from_collection(filename)), [])
+
+    # an incomplete record at the end is left out
+    def test_incomplete_record(self):
+        boards = read_boards()[:2]
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'boards' + ln.PACKED_EXTENSION)
+            ln.write_packed_boards(filename, boards)
+            with open(filename, 'ab') as file:
+                file.write(ln.pack_board(boards[0])[:10])
+            with ln.PackedBoardCollection(filename) as collection:
+                self.assertEqual(len(collection), 2)
+                self.assertBoardEqual(collection[-1], boards[1])
+
+    def test_not_a_packed_collection(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'board.dat')
+            ln.write_board_to_file(read_boards()[0], filename)
+            self.assertFalse(ln.is_packed_collection(filename))
+            with self.assertRaisesRegex(ValueError, 'is not a packed board collection'):
+                ln.PackedBoardCollection(filename)
+
+    def test_boards_of_other_size_are_rejected(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'boards' + ln.PACKED_EXTENSION)
+            with self.assertRaisesRegex(ValueError, 'instead of 15x7'):
+                ln.write_packed_boards(filename, read_boards()[:1] + [ln.Board(9, 7)])
+
+
+class ConvertBoardsTest(unittest.TestCase):
+    def test_pack_and_unpack(self):
+        boards = read_boards()
+        with tempfile.TemporaryDirectory() as folder:
+            packed = os.path.join(folder, 'boards' + ln.PACKED_EXTENSION)
+            result = run_convertboards('pack', packed, BOARDS)
+            self.assertEqual(result.returncode, 0, result.stderr)
+
+            collection = os.path.join(folder, 'boards.dat')
+            result = run_convertboards('unpack', '--first', '1', '--count', '2', packed, collection)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            unpacked = list(ln.read_boards_from_collection(collection))
+            self.assertEqual([board.color_masks for board in unpacked], [board.color_masks for board in boards[1:3]])
+            self.assertEqual([board.star_mask for board in unpacked], [board.star_mask for board in boards[1:3]])
+
+    def test_negative_first_and_count_are_rejected(self):
+        with tempfile.TemporaryDirectory() as folder:
+            packed = os.path.join(folder, 'boards' + ln.PACKED_EXTENSION)
+            ln.write_packed_boards(packed, read_boards())
+            for (args, message) in ((['--first', '-1'], '--first cannot be negative'),
+                                    (['--count', '-2'], '--count cannot be negative')):
+                result = run_convertboards('unpack', *args, packed, folder)
+                self.assertEqual(result.returncode, 2, args)
+                self.assertIn(message, result.stderr)
+            self.assertEqual(os.listdir(folder), ['boards' + ln.PACKED_EXTENSION])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,362 @@
+import itertools
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libnochmal as ln
+import libsingleplayer as sp
+
+BOARDS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'boards')
+
+# a toss that allows every color and every number, so only the crossed and the reachable tiles limit a move
+ANY_TOSS = sp.Toss((sp.JOKER_COLOR, sp.JOKER_COLOR), (sp.JOKER_NUMBER, sp.JOKER_NUMBER))
+
+
+def read_boards():
+    return [ln.read_board_from_file(os.path.join(BOARDS, filename)) for filename in sorted(os.listdir(BOARDS))]
+
+
+# the states of seeded games on every board, a random legal move is played for most tosses
+def iter_game_states(games_per_board: int):
+    for (i, board) in enumerate(read_boards()):
+        for seed in range(games_per_board):
+            rng = random.Random(i * games_per_board + seed)
+            game = sp.SinglePlayerGame(board, jokers=rng.randrange(sp.JOKERS + 1))
+            dice = sp.Dice(seed)
+            while not game.finished:
+                toss = dice.roll()
+                yield game, toss
+                moves = game.legal_moves(toss)
+                game.apply_move(toss, rng.choice(moves)[0] if moves and rng.random() < 0.8 else 0)
+            yield game, None
+
+
+# --- reference implementation ---
+
+# the reachable tiles and the reachability of a tile worked out from the coordinates of the crosses, like the GUI did
+# before the game kept the reachable mask
+
+def reference_reachable_coords(game: sp.SinglePlayerGame) -> set:
+    all_coords = set(game.geometry.coords)
+    reached_coords = set(game.geometry.to_coords(game.crossed_mask))
+
+    reachable_coords = set()
+    for coord in reached_coords:
+        reachable_coords = reachable_coords.union(ln.get_neighbours(coord, all_coords))
+
+    reachable_coords = reachable_coords.union(game.geometry.to_coords(game.middle_column_mask))
+    return reachable_coords - reached_coords
+
+
+def reference_tile_is_reachable(game: sp.SinglePlayerGame, selection: int, x: int, y: int) -> bool:
+    middle = game.board.width // 2
+    if x == middle:
+        return True
+
+    coords = set(game.geometry.to_coords(game.crossed_mask)).union(game.geometry.to_coords(selection))
+    coords.add((x, y))
+    reachable_coords = ln._get_connected_coords(coords, (x, y))[0]
+
+    for i in range(game.board.height):
+        if (middle, i) in reachable_coords:
+            return True
+
+    return False
+
+
+def cross_is_accepted(game: sp.SinglePlayerGame, selection: int, x: int, y: int) -> bool:
+    try:
+        game.check_cross(ANY_TOSS, selection, x, y)
+        return True
+    except sp.IllegalMoveError:
+        return False
+
+
+class ReachableTest(unittest.TestCase):
+    def test_reachable_mask_matches_reference(self):
+        for (game, _) in iter_game_states(3):
+            self.assertEqual(set(game.geometry.to_coords(game.reachable_mask)), reference_reachable_coords(game))
+
+    def test_single_cross_matches_reference(self):
+        for (game, _) in iter_game_states(2):
+            for (x, y) in game.geometry.coords:
+                expected = not game.is_crossed(x, y) and reference_tile_is_reachable(game, 0, x, y)
+                self.assertEqual(cross_is_accepted(game, 0, x, y), expected, (x, y))
+
+    # a move without one of its tiles is the selection, every other tile of its component that is not crossed is checked
+    def test_cross_with_selection_matches_reference(self):
+        rng = random.Random(0)
+        unreachable = 0
+        for (game, toss) in iter_game_states(2):
+            if toss is None:
+                continue
+            moves = [move for (move, _) in game.legal_moves(ANY_TOSS) if ln.popcount(move) > 1]
+            for move in rng.sample(moves, min(len(moves), 5)):
+                component = game.board.components[game.board.component_labels[ln.lowest_bit(move)]][1]
+                selection = move & ~(1 << rng.choice(list(ln.iter_bits(move))))
+                for bit in ln.iter_bits(component & ~game.crossed_mask & ~selection):
+                    (x, y) = game.geometry.coords[bit]
+                    expected = reference_tile_is_reachable(game, selection, x, y)
+                    unreachable += not expected
+                    self.assertEqual(cross_is_accepted(game, selection, x, y), expected, (move, x, y))
+        self.assertGreater(unreachable, 0)
+
+
+# every move of up to MAX_CROSSES tiles of a component that are not crossed with the jokers it costs, tried one by one
+def brute_force_moves(game: sp.SinglePlayerGame, toss: sp.Toss) -> dict:
+    moves = {}
+    for (_, component) in game.board.components:
+        bits = list(ln.iter_bits(component & ~game.crossed_mask))
+        for size in range(1, min(len(bits), sp.MAX_CROSSES) + 1):
+            for combination in itertools.combinations(bits, size):
+                move = sum(1 << bit for bit in combination)
+                try:
+                    moves[move] = game.move_cost(toss, move)
+                except sp.IllegalMoveError:
+                    pass
+    return moves
+
+
+class LegalMovesTest(unittest.TestCase):
+    def test_legal_moves_match_brute_force(self):
+        costs = set()
+        for (game, toss) in iter_game_states(2):
+            if toss is None:
+                self.assertEqual(game.legal_moves(ANY_TOSS), [])
+                continue
+            moves = game.legal_moves(toss)
+            self.assertEqual(len(moves), len(set(move for (move, _) in moves)), toss)
+            self.assertEqual(dict(moves), brute_force_moves(game, toss), toss)
+            costs.update(cost for (_, cost) in moves)
+        self.assertEqual(costs, {0, 1, 2})
+
+    def test_toss_costs(self):
+        toss = sp.Toss((ln.Color.RED, sp.JOKER_COLOR), (2, sp.JOKER_NUMBER))
+        self.assertEqual(toss.color_costs, [0 if color == ln.Color.RED else 1 for color in ln.COLORS_BY_INDEX])
+        self.assertEqual(toss.size_costs, [(1, 1), (2, 0), (3, 1), (4, 1), (5, 1)])
+
+        toss = sp.Toss((ln.Color.RED, ln.Color.BLUE), (3, 1))
+        self.assertEqual(toss.color_costs, [0 if color in (ln.Color.RED, ln.Color.BLUE) else None
+                                            for color in ln.COLORS_BY_INDEX])
+        self.assertEqual(toss.size_costs, [(1, 0), (3, 0)])
+
+        toss = sp.Toss((ln.Color.GREEN, ln.Color.GREEN), (5, 5))
+        self.assertEqual(toss.color_costs, [0 if color == ln.Color.GREEN else None for color in ln.COLORS_BY_INDEX])
+        self.assertEqual(toss.size_costs, [(5, 0)])
+
+        self.assertEqual(ANY_TOSS.color_costs, [1 for _ in ln.COLORS_BY_INDEX])
+        self.assertEqual(ANY_TOSS.size_costs, [(size, 1) for size in range(1, sp.MAX_CROSSES + 1)])
+
+    def test_no_moves_without_jokers_for_joker_costs(self):
+        board = read_boards()[0]
+        game = sp.SinglePlayerGame(board, jokers=0)
+        self.assertEqual(game.legal_moves(ANY_TOSS), [])
+        game = sp.SinglePlayerGame(board, jokers=1)
+        self.assertEqual(game.legal_moves(ANY_TOSS), [])
+        game = sp.SinglePlayerGame(board, jokers=2)
+        moves = game.legal_moves(ANY_TOSS)
+        self.assertTrue(moves)
+        self.assertEqual(dict(moves), brute_force_moves(game, ANY_TOSS))
+        self.assertTrue(all(cost == 2 for (_, cost) in moves))
+
+
+class RandomMoveTest(unittest.TestCase):
+    def test_random_move_is_legal(self):
+        rng = random.Random(0)
+        moves = 0
+        for (game, toss) in iter_game_states(2):
+            if toss is None:
+                self.assertIsNone(game.random_move(ANY_TOSS, rng))
+                continue
+            legal = dict(game.legal_moves(toss))
+            for _ in range(5):
+                move = game.random_move(toss, rng)
+                if not legal:
+                    self.assertIsNone(move)
+                    break
+                self.assertIn(move[0], legal, toss)
+                self.assertEqual(move[1], legal[move[0]], toss)
+                self.assertEqual(game.move_cost(toss, move[0]), move[1], toss)
+                moves += 1
+        self.assertGreater(moves, 0)
+
+    def test_random_bit(self):
+        rng = random.Random(0)
+        for mask in (1, 0b1010, 1 << 104 | 1 << 3, (1 << 105) - 1):
+            bits = set(sp.random_bit(mask, rng) for _ in range(2000))
+            self.assertEqual(bits, set(ln.iter_bits(mask)))
+
+    def test_play_legal_matches_play(self):
+        board = read_boards()[0]
+        for seed in range(5):
+            rng = random.Random(seed)
+            legal_game = sp.play_legal(board, lambda game, toss: game.random_move(toss, rng), seed)
+            rng = random.Random(seed)
+            game = sp.play(board, lambda game, toss: (game.random_move(toss, rng) or (0, 0))[0], seed)
+            self.assertEqual(legal_game.crossed_mask, game.crossed_mask)
+            self.assertEqual(legal_game.joker_count, game.joker_count)
+            self.assertEqual(legal_game.score(), game.score())
+
+
+# a component that touches the middle column with at least three tiles outside of it and the game on the first board
+def middle_component():
+    board = read_boards()[0]
+    game = sp.SinglePlayerGame(board)
+    for (color_index, component) in board.components:
+        if component & game.middle_column_mask and ln.popcount(component & ~game.middle_column_mask) >= 3:
+            return game, color_index, component
+    raise AssertionError("The board has no component for the test")
+
+
+class ApplyMoveTest(unittest.TestCase):
+    def test_apply_move_updates_game(self):
+        (game, color_index, component) = middle_component()
+        start = component & game.middle_column_mask
+        move = 1 << ln.lowest_bit(start)
+        move |= 1 << ln.lowest_bit(game.geometry.dilate(move) & component & ~move)
+        color = ln.COLORS_BY_INDEX[color_index]
+
+        self.assertEqual(game.apply_move(sp.Toss((color, color), (2, 2)), move), 0)
+        self.assertEqual(game.crossed_mask, move)
+        self.assertEqual(game.joker_count, sp.JOKERS)
+        self.assertEqual(game.toss_counter, 1)
+        self.assertEqual(game.colors_crossed[color_index], 2)
+        self.assertEqual(sum(game.colors_crossed), 2)
+        self.assertEqual(game.stars_crossed, ln.popcount(move & game.board.star_mask))
+        for x in range(game.board.width):
+            self.assertEqual(game.columns_crossed[x], ln.popcount(move & game.geometry.column_masks[x]))
+        self.assertEqual(game.reachable_mask,
+                         (game.middle_column_mask | game.geometry.dilate(move)) & ~move)
+
+        self.assertEqual(game.apply_move(ANY_TOSS, game.geometry.to_coords(game.reachable_mask & component)[:1]), 2)
+        self.assertEqual(game.joker_count, sp.JOKERS - 2)
+        self.assertEqual(game.toss_counter, 2)
+        self.assertEqual(game.colors_crossed[color_index], 3)
+
+        self.assertEqual(game.apply_move(ANY_TOSS, 0), 0)
+        self.assertEqual(game.toss_counter, 3)
+        self.assertEqual(ln.popcount(game.crossed_mask), 3)
+
+    def test_move_cost_errors(self):
+        (game, color_index, component) = middle_component()
+        color = ln.COLORS_BY_INDEX[color_index]
+        other_color = ln.COLORS_BY_INDEX[(color_index + 1) % len(ln.COLORS_BY_INDEX)]
+        start = 1 << ln.lowest_bit(component & game.middle_column_mask)
+        pair = start | 1 << ln.lowest_bit(game.geometry.dilate(start) & component & ~start)
+        triple = pair | 1 << ln.lowest_bit(game.geometry.dilate(pair) & component & ~pair)
+        other = next(component for (i, component) in game.board.components
+                     if i != color_index and component & game.geometry.dilate(start))
+        toss = sp.Toss((color, color), (1, 2))
+
+        errors = [
+            (toss, start | 1 << ln.lowest_bit(other), "You can't cross tiles from multiple components"),
+            (toss, triple, "3 tiles were crossed, but the dices rolled 1 and 2"),
+            (sp.Toss((other_color, other_color), (1, 1)), start, "This color wasn't tossed"),
+            (toss, 1 << ln.lowest_bit(game.board.color_masks[color_index] & ~component & ~game.reachable_mask),
+             "is not reachable"),
+        ]
+        for (error_toss, move, message) in errors:
+            with self.assertRaises(sp.IllegalMoveError, msg=message) as raised:
+                game.move_cost(error_toss, move)
+            self.assertIn(message, str(raised.exception))
+
+        game.apply_move(toss, start)
+        with self.assertRaisesRegex(sp.IllegalMoveError, "Cannot uncross this tile"):
+            game.move_cost(toss, pair)
+
+        poor_game = sp.SinglePlayerGame(game.board, jokers=1)
+        with self.assertRaisesRegex(sp.IllegalMoveError, "Not enough jokers left"):
+            poor_game.move_cost(ANY_TOSS, start)
+
+    # two reachable tiles of a component that are not neighbours are a move of reachable tiles that is not connected
+    def test_move_cost_error_not_connected(self):
+        moves = 0
+        for (game, _) in iter_game_states(1):
+            for (color_index, component) in game.board.components:
+                reachable = list(ln.iter_bits(component & game.reachable_mask))
+                for (first, second) in itertools.combinations(reachable, 2):
+                    if game.geometry.dilate(1 << first) >> second & 1:
+                        continue
+                    color = ln.COLORS_BY_INDEX[color_index]
+                    with self.assertRaisesRegex(sp.IllegalMoveError, "the placed crosses are not fully connected"):
+                        game.move_cost(sp.Toss((color, color), (2, 2)), 1 << first | 1 << second)
+                    moves += 1
+        self.assertGreater(moves, 0)
+
+    def test_illegal_move_leaves_game_unchanged(self):
+        for (game, toss) in iter_game_states(1):
+            if toss is None:
+                with self.assertRaisesRegex(sp.IllegalMoveError, "The game is over"):
+                    game.apply_move(ANY_TOSS, 0)
+                with self.assertRaisesRegex(sp.IllegalMoveError, "The game is over"):
+                    game.apply_legal_move(0, 0)
+                continue
+            legal = set(move for (move, _) in game.legal_moves(toss))
+            illegal = next((1 << bit for bit in ln.iter_bits(~game.crossed_mask & (1 << len(game.geometry.coords)) - 1)
+                            if 1 << bit not in legal), None)
+            if illegal is None:
+                continue
+            state = (game.crossed_mask, game.reachable_mask, game.joker_count, game.toss_counter,
+                     list(game.colors_crossed), list(game.columns_crossed), game.stars_crossed)
+            with self.assertRaises(sp.IllegalMoveError):
+                game.apply_move(toss, illegal)
+            self.assertEqual((game.crossed_mask, game.reachable_mask, game.joker_count, game.toss_counter,
+                              list(game.colors_crossed), list(game.columns_crossed), game.stars_crossed), state)
+
+
+class ScoreTest(unittest.TestCase):
+    def test_score_of_new_game(self):
+        game = sp.SinglePlayerGame(read_boards()[0])
+        self.assertEqual(game.score(), [0, 0, sp.JOKERS, -sp.STAR_PENALTY * game.board.width])
+        self.assertEqual(game.total_score(), sp.JOKERS - sp.STAR_PENALTY * game.board.width)
+
+    # a whole color and the first column are crossed component by component without checking the moves
+    def test_score_of_crossed_color_and_column(self):
+        board = read_boards()[0]
+        game = sp.SinglePlayerGame(board, tosses=len(board.components))
+        for (color_index, component) in board.components:
+            if color_index == 0:
+                game.apply_legal_move(component, 0)
+        for (_, component) in board.components:
+            move = component & board.geometry.column_masks[0] & ~game.crossed_mask
+            if move:
+                game.apply_legal_move(move, 1)
+
+        self.assertEqual(game.colors_crossed[0], ln.popcount(board.color_masks[0]))
+        self.assertEqual(game.columns_crossed[0], board.height)
+        stars = ln.popcount((board.color_masks[0] | board.geometry.column_masks[0]) & board.star_mask)
+        jokers = sp.JOKERS - sum(1 for (_, component) in board.components
+                                 if component & board.geometry.column_masks[0] & ~board.color_masks[0])
+        columns = sum(ln.POINTS_PER_COLUMN[x] for x in range(board.width)
+                      if not board.geometry.column_masks[x] & ~game.crossed_mask)
+        self.assertEqual(game.score(), [sp.COLOR_BONUS, columns, jokers, -sp.STAR_PENALTY * (board.width - stars)])
+        self.assertGreaterEqual(columns, ln.POINTS_PER_COLUMN[0])
+
+
+class DiceTest(unittest.TestCase):
+    def test_same_seed_rolls_same_tosses(self):
+        for seed in range(5):
+            (dice, again) = (sp.Dice(seed), sp.Dice(seed))
+            self.assertEqual([dice.roll() for _ in range(100)], [again.roll() for _ in range(100)])
+        self.assertNotEqual([sp.Dice(0).roll() for _ in range(100)], [sp.Dice(1).roll() for _ in range(100)])
+
+    def test_rolls_cover_all_tosses(self):
+        self.assertEqual(len(sp.ALL_TOSSES), len(sp.DICE_COLORS) ** 2 * len(sp.DICE_NUMBERS) ** 2)
+        self.assertEqual(len(set(sp.ALL_TOSSES)), len(sp.ALL_TOSSES))
+        dice = sp.Dice(0)
+        self.assertEqual(set(dice.roll() for _ in range(20000)), set(sp.ALL_TOSSES))
+
+    def test_same_seed_plays_same_game(self):
+        board = read_boards()[0]
+
+        def first_move(game, toss):
+            return (game.legal_moves(toss) or [(0, 0)])[0][0]
+
+        self.assertEqual(sp.play(board, first_move, 3).crossed_mask, sp.play(board, first_move, 3).crossed_mask)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libnochmal as ln
+
+BOARDS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'boards')
+
+
+def read_boards():
+    return [ln.read_board_from_file(os.path.join(BOARDS, filename)) for filename in sorted(os.listdir(BOARDS))]
+
+
+# a board with one color per column, column 14 is split into green and blue, red fills four columns that are not
+# neighbours, so it has enough components, but these four columns can only give red a star
+def board_with_too_many_red_columns():
+    board = ln.Board()
+    for (x, value) in enumerate('roryrgrboygboy'):
+        for y in range(board.height):
+            board.set_color_at(x, y, ln.Color(value))
+    for y in range(board.height):
+        board.set_color_at(board.width - 1, y, ln.Color.GREEN if y < 4 else ln.Color.BLUE)
+    return board
+
+
+class DistributeStarsTest(unittest.TestCase):
+    def assertStarsDistributed(self, board):
+        stars = list(ln.iter_bits(board.star_mask))
+        self.assertEqual(len(stars), board.width)
+        for column_mask in board.geometry.column_masks:
+            self.assertEqual(ln.popcount(board.star_mask & column_mask), 1)
+        for (_, component) in board.components:
+            self.assertLessEqual(ln.popcount(board.star_mask & component), 1)
+        for mask in board.color_masks:
+            self.assertEqual(ln.popcount(board.star_mask & mask), ln.STARS_PER_COLOR)
+        self.assertEqual(ln.check_stars_per_color(board), [])
+
+    def test_stars_of_boards(self):
+        for board in read_boards():
+            for seed in range(10):
+                self.assertEqual(ln.distribute_stars(board, random.Random(seed)), [])
+                self.assertStarsDistributed(board)
+
+    def test_seeds_give_different_stars(self):
+        board = read_boards()[0]
+        star_masks = []
+        for seed in range(10):
+            ln.distribute_stars(board, random.Random(seed))
+            star_masks.append(board.star_mask)
+        self.assertGreater(len(set(star_masks)), 5)
+
+        ln.distribute_stars(board, random.Random(3))
+        self.assertEqual(board.star_mask, star_masks[3])
+
+    def test_column_without_colors(self):
+        board = read_boards()[0]
+        board.clear_stars()
+        for y in range(board.height):
+            board.set_color_at(0, y, ln.Color.UNINITIALIZED)
+        messages = ln.distribute_stars(board, random.Random(0))
+        self.assertIn("The column 0 has no colored tile for a star", messages)
+        self.assertEqual(board.star_mask, 0)
+
+    def test_infeasible_flow(self):
+        board = board_with_too_many_red_columns()
+        self.assertEqual(ln._check_star_distribution_is_possible(board), [])
+        messages = ln.distribute_stars(board, random.Random(0))
+        self.assertEqual(len(messages), 1)
+        self.assertIn("Only 14 of the 15 columns can get a star", messages[0])
+        self.assertEqual(board.star_mask, 0)
+
+    def test_too_few_components(self):
+        board = board_with_too_many_red_columns()
+        for y in range(board.height):
+            board.set_color_at(board.width - 1, y, ln.Color.GREEN)
+        messages = ln.distribute_stars(board, random.Random(0))
+        self.assertEqual(messages, ["The color '{}' has 2 component(s), but needs 3 stars in different components"
+                                    .format(ln.Color.BLUE)])
+        self.assertEqual(board.star_mask, 0)
+
+    def test_other_width(self):
+        board = ln.Board(10, 7)
+        for x in range(board.width):
+            for y in range(board.height):
+                board.set_color_at(x, y, ln.Color.ref_list()[(x + y) % 5])
+        messages = ln.distribute_stars(board, random.Random(0))
+        self.assertIn("A board with 10 columns can't have one star per column and 3 stars for each of the 5 colors",
+                      messages)
+        self.assertEqual(board.star_mask, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
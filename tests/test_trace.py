@@ -0,0 +1,156 @@
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libnochmal as ln
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+REPLAYTRACE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'replaytrace.py')
+
+
+# a search of the DESC order with free_space_limit 1 that is given up after 300 placements, restarted and run to the
+# end, the board, the state and the number of events written to the trace
+def record_generation(filename: str):
+    board = ln.Board()
+    state = ln.BacktrackingState()
+    trace = ln.GenerationTrace(filename, board)
+    try:
+        for max_placements in (300, None):
+            if state.attempts > 0:
+                board.clear()
+                state.level = 0
+                trace.restart()
+            state.inc_attempts()
+            success = ln.fill_smart(board, state, ln.create_descending_component_order(), free_space_limit=1,
+                                    no_line6=False, only_one_comp_per_col=False, max_placements=max_placements,
+                                    trace=trace)
+    finally:
+        trace.close()
+    return success, board, state, trace.events
+
+
+class TraceTest(unittest.TestCase):
+    def test_replay_ends_with_final_board(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'generation.trace')
+            (success, board, state, events) = record_generation(filename)
+            self.assertTrue(success)
+
+            replayed_state = ln.BacktrackingState()
+            kinds = [0 for _ in ln.TRACE_EVENT_NAMES]
+            for (replayed_board, (kind, _, _, _, _)) in ln.replay_trace(filename, replayed_state):
+                kinds[kind] += 1
+
+        self.assertEqual(replayed_board.color_masks, board.color_masks)
+        self.assertEqual(replayed_state.steps, events)
+        self.assertEqual(replayed_state.placements, state.placements)
+        self.assertEqual(replayed_state.level, state.level)
+        self.assertEqual(kinds[ln.TRACE_RESTART], 1)
+        self.assertEqual(kinds[ln.TRACE_PLACE], state.placements)
+        self.assertEqual(sum(kinds), events)
+
+    # the board after the 300 placements of the first attempt, the restart clears it to the board the trace started with
+    def test_replay_of_restart(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'generation.trace')
+            record_generation(filename)
+            state = ln.BacktrackingState()
+            for (board, (kind, _, _, _, _)) in ln.replay_trace(filename, state):
+                if kind == ln.TRACE_RESTART:
+                    break
+        self.assertEqual(state.placements, 300)
+        self.assertEqual(board.color_masks, ln.Board().color_masks)
+
+    def test_stats(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'generation.trace')
+            (_, _, state, events) = record_generation(filename)
+            result = subprocess.run([sys.executable, REPLAYTRACE, 'stats', filename], capture_output=True, text=True,
+                                    timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        stats = dict(line.split(':', 1) for line in result.stdout.splitlines() if line.startswith(
+            ('Events:', 'Attempts:', 'Placements:', 'Undos:', 'Final level:')))
+        stats = {name: int(value) for (name, value) in stats.items()}
+        self.assertEqual(stats['Events'], events)
+        self.assertEqual(stats['Attempts'], 2)
+        self.assertEqual(stats['Placements'], state.placements)
+        self.assertEqual(stats['Events'], stats['Placements'] + stats['Undos'] + stats['Attempts'] - 1)
+        self.assertEqual(stats['Final level'], state.level)
+
+
+# the lzw decoder of a gif image following the specification, the codes grow to 12 bits and the table is cleared with
+# the clear code
+def lzw_decode(data: bytes, min_code_size: int):
+    clear_code = 1 << min_code_size
+    end_code = clear_code + 1
+    code_size = min_code_size + 1
+    position = 0
+    indices = []
+    table = None
+    previous = None
+    while True:
+        code = 0
+        for i in range(code_size):
+            byte = data[(position + i) // 8]
+            code |= (byte >> ((position + i) % 8) & 1) << i
+        position += code_size
+
+        if code == clear_code:
+            table = [[i] for i in range(clear_code)] + [None, None]
+            code_size = min_code_size + 1
+            previous = None
+            continue
+        if code == end_code:
+            return indices
+
+        if previous is None:
+            entry = table[code]
+        else:
+            entry = table[code] if code < len(table) else previous + previous[:1]
+            table.append(previous + entry[:1])
+        indices.extend(entry)
+        previous = entry
+        if len(table) == 1 << code_size and code_size < 12:
+            code_size += 1
+
+
+class LzwTest(unittest.TestCase):
+    def test_round_trip(self):
+        rng = random.Random(0)
+        cases = [[0], [5, 5], [1] * 1000, [rng.randrange(8) for _ in range(20000)],
+                 [i % 8 for i in range(5000)], [rng.choice((0, 0, 0, 1)) for _ in range(30000)]]
+        for indices in cases:
+            self.assertEqual(lzw_decode(ln._lzw_encode(indices, 3), 3), indices)
+
+    @unittest.skipIf(Image is None, "Pillow is not installed")
+    def test_gif_opens_in_pillow(self):
+        rng = random.Random(0)
+        frames = [[[rng.randrange(6) for _ in range(120)] for _ in range(50)] for _ in range(3)]
+        frames.append([[0] * 120 for _ in range(50)])
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'steps.gif')
+            writer = ln._AnimatedGifWriter(filename, 0.1)
+            for rows in frames:
+                writer.add_frame(rows)
+            writer.close()
+
+            # pillow converts the frames after the first one to rgb, so the colors are compared
+            with Image.open(filename) as image:
+                self.assertEqual(image.n_frames, len(frames))
+                for (n, rows) in enumerate(frames):
+                    image.seek(n)
+                    self.assertEqual(image.convert('RGB').tobytes(),
+                                     b''.join(bytes(ln.palette[index]) for row in rows for index in row), n)
+
+
+if __name__ == '__main__':
+    unittest.main()
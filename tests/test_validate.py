@@ -0,0 +1,79 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import libnochmal as ln
+
+BOARDS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'boards')
+
+
+# the messages of the separate checks, in the order check_all ran them before it used validate
+def check_separately(board, lazy=False):
+    error_msgs = []
+    for check in (ln.check_color_distribution, ln.check_stars_per_color, ln.check_columns, ln.check_components):
+        error_msgs.extend(check(board, lazy))
+        if lazy and error_msgs:
+            break
+    return error_msgs
+
+
+def read_boards():
+    return [ln.read_board_from_file(os.path.join(BOARDS, filename)) for filename in sorted(os.listdir(BOARDS))]
+
+
+# copies of the board with a few tiles changed to another color or left free and a few stars moved
+def perturbed_boards(board, rng: random.Random, count: int):
+    colors = ln.Color.ref_list(with_white=False) + [ln.Color.UNINITIALIZED]
+    for _ in range(count):
+        copy = ln.Board(board.width, board.height)
+        copy.color_masks[:] = board.color_masks
+        copy.star_mask = board.star_mask
+        for _ in range(rng.randint(1, 3)):
+            copy.set_color_at(rng.randrange(board.width), rng.randrange(board.height), rng.choice(colors))
+        for _ in range(rng.randint(0, 2)):
+            (x, y) = (rng.randrange(board.width), rng.randrange(board.height))
+            copy.set_star_at(x, y, not copy.get_star_at(x, y))
+        yield copy
+
+
+class ValidateTest(unittest.TestCase):
+    def test_boards_match_separate_checks(self):
+        for board in read_boards():
+            for lazy in (False, True):
+                self.assertEqual(ln.validate(board, lazy).messages, check_separately(board, lazy))
+
+    def test_perturbed_boards_match_separate_checks(self):
+        rng = random.Random(0)
+        failing = 0
+        for board in read_boards():
+            for copy in perturbed_boards(board, rng, 50):
+                expected = check_separately(copy)
+                failing += bool(expected)
+                self.assertEqual(ln.validate(copy).messages, expected, str(copy))
+                self.assertEqual(ln.validate(copy, lazy=True).messages, check_separately(copy, lazy=True), str(copy))
+        self.assertGreater(failing, 0)
+
+
+@unittest.skipIf(ln.np is None, "The bulk validation requires the NumPy module")
+class ValidateBulkTest(unittest.TestCase):
+    def assert_bulk_matches_validate(self, boards):
+        errors = ln.validate_bulk(*ln.boards_to_arrays(boards))
+        self.assertEqual(len(errors), len(boards))
+        for (board, mask) in zip(boards, errors):
+            self.assertEqual(int(mask), ln.validation_error_mask(ln.validate(board)), str(board))
+
+    def test_boards_match_validate(self):
+        self.assert_bulk_matches_validate(read_boards())
+
+    def test_perturbed_boards_match_validate(self):
+        rng = random.Random(0)
+        boards = [copy for board in read_boards() for copy in perturbed_boards(board, rng, 50)]
+        self.assert_bulk_matches_validate(boards)
+        self.assertTrue(any(ln.validate(board).messages for board in boards))
+
+
+if __name__ == '__main__':
+    unittest.main()